@@ -0,0 +1,117 @@
+"""
+Process-wide cache of the categories table.
+
+The table is tiny and only changes through manual maintenance, so it is loaded at
+startup (see app.main lifespan) and served from memory to GET /categories, the fraud
+MCC lookups and /fraud/history. Each worker reloads it on the first lookup after
+CATEGORY_CACHE_MAX_AGE_SECONDS (default 300), which bounds how long an edit made
+directly in the database stays invisible; invalidate() forces a reload in this process.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Category
+
+CATEGORY_CACHE_MAX_AGE_SECONDS = float(os.getenv("CATEGORY_CACHE_MAX_AGE_SECONDS", "300"))
+
+
+class _Snapshot(NamedTuple):
+    categories: list        # [{id, name, mcc_code, description}] ordered by name
+    by_name: dict
+    names_by_mcc_code: dict
+    etag: str
+    loaded_at: float        # time.monotonic() of the load
+
+
+# Replaced as a whole on reload, so readers always see a consistent snapshot
+_snapshot: Optional[_Snapshot] = None
+
+
+def _set_snapshot(rows) -> _Snapshot:
+    global _snapshot
+
+    categories = [
+        {
+            "id": cat.id,
+            "name": cat.name,
+            "mcc_code": cat.mcc_code,
+            "description": cat.description
+        }
+        for cat in rows
+    ]
+    names_by_mcc_code = {}
+    for cat in categories:
+        names_by_mcc_code.setdefault(cat["mcc_code"], []).append(cat["name"])
+    digest = hashlib.sha1(json.dumps(categories, sort_keys=True).encode("utf-8")).hexdigest()
+
+    _snapshot = _Snapshot(
+        categories=categories,
+        by_name={cat["name"]: cat for cat in categories},
+        names_by_mcc_code=names_by_mcc_code,
+        etag=f'"{digest}"',
+        loaded_at=time.monotonic(),
+    )
+    return _snapshot
+
+
+def load(db: Session) -> _Snapshot:
+    """(Re)load all categories from the database."""
+    return _set_snapshot(db.query(Category).order_by(Category.name).all())
+
+
+async def load_async(db: AsyncSession) -> _Snapshot:
+    """load() on an async session."""
+    return _set_snapshot((await db.scalars(select(Category).order_by(Category.name))).all())
+
+
+def _is_fresh(snapshot: Optional[_Snapshot]) -> bool:
+    return snapshot is not None and (time.monotonic() - snapshot.loaded_at) <= CATEGORY_CACHE_MAX_AGE_SECONDS
+
+
+def _current(db: Session) -> _Snapshot:
+    snapshot = _snapshot
+    return snapshot if _is_fresh(snapshot) else load(db)
+
+
+async def _current_async(db: AsyncSession) -> _Snapshot:
+    snapshot = _snapshot
+    return snapshot if _is_fresh(snapshot) else await load_async(db)
+
+
+def invalidate() -> None:
+    """Drop the cached table; it is reloaded on next use."""
+    global _snapshot
+    _snapshot = None
+
+
+def get_categories(db: Session) -> tuple:
+    """Return (categories, etag)."""
+    snapshot = _current(db)
+    return snapshot.categories, snapshot.etag
+
+
+async def get_categories_async(db: AsyncSession) -> tuple:
+    """get_categories() on an async session."""
+    snapshot = await _current_async(db)
+    return snapshot.categories, snapshot.etag
+
+
+async def get_categories_by_name_async(db: AsyncSession) -> dict:
+    """{name: category} for looking up many categories at once."""
+    return (await _current_async(db)).by_name
+
+
+def get_category(name: str, db: Session) -> Optional[dict]:
+    return _current(db).by_name.get(name)
+
+
+def names_for_mcc_code(mcc_code: str, db: Session) -> list:
+    """Names of categories whose mcc_code equals `mcc_code` exactly."""
+    return _current(db).names_by_mcc_code.get(mcc_code, [])
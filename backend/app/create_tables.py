@@ -1,11 +1,11 @@
 from app.database import Base, engine
-from app.models import User, FinancialData, FraudDetection  # Import all models
+from app.models import User, FinancialData, FraudDetection, UserTransactionStats, FinanceImportJob, FinanceMonthlyRollup, FinanceMonthlyCategoryCount, SocialPostSnapshot  # Import all models
 
 def create_tables():
     # Create all tables defined in models
     Base.metadata.create_all(bind=engine)
     print("Tables created successfully!")
-    print("Created tables: users, financial_data, fraud_detections")
+    print("Created tables: users, financial_data, fraud_detections, user_transaction_stats, finance_import_jobs, finance_monthly_rollups, finance_monthly_category_counts, social_post_snapshots")
 
 if __name__ == "__main__":
     create_tables()
@@ -1,6 +1,34 @@
+"""
+Database engines and session dependencies.
+
+Two engines share DATABASE_URL (a plain postgresql:// URL):
+  - engine / SessionLocal / get_db: synchronous psycopg2, used by the sync routes,
+    background jobs, scripts and migrations.
+  - async_engine / AsyncSessionLocal / get_async_db: asyncpg, used by the hot read
+    endpoints (finance data, fraud history, categories, connection status), which run
+    on the event loop instead of Starlette's threadpool. The URL is rewritten to
+    postgresql+asyncpg:// (sslmode=... becomes asyncpg's ssl argument).
+
+Config (env), applied to each engine's pool separately:
+  DB_POOL_SIZE           persistent connections of the sync pool (default 5)
+  DB_MAX_OVERFLOW        extra connections the sync pool may open under load (default 10)
+  DB_ASYNC_POOL_SIZE     persistent connections of the async pool (default 10)
+  DB_ASYNC_MAX_OVERFLOW  extra connections of the async pool (default 20)
+  DB_POOL_TIMEOUT        seconds to wait for a free connection (default 30)
+  DB_POOL_RECYCLE        reconnect connections older than this many seconds (default 1800, -1 off)
+  DB_POOL_PRE_PING       test connections on checkout and replace ones the server closed
+                         (default false: it costs round trips on every checkout, three on
+                         asyncpg; enable it if idle connections get dropped before DB_POOL_RECYCLE)
+  DB_ASYNC_STATEMENT_CACHE_SIZE  prepared statements cached per async connection (default 100);
+                         set 0 behind PgBouncer in transaction mode, which also gives every
+                         prepared statement a unique name
+"""
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+from uuid import uuid4
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,12 +36,62 @@ load_dotenv()
 # Your DATABASE_URL from .env
 DATABASE_URL =os.getenv("DATABASE_URL")
 
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_ASYNC_STATEMENT_CACHE_SIZE = int(os.getenv("DB_ASYNC_STATEMENT_CACHE_SIZE", "100"))
+
+
+def _pool_options(url, pool_size: int, max_overflow: int) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() != "sqlite":  # local sqlite uses its own non-queue pools
+        options.update(pool_size=pool_size, max_overflow=max_overflow,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    return options
+
+
+def _async_url(url):
+    """(url, connect_args) for the async driver of the same database."""
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+
+    # SQLAlchemy's and asyncpg's own statement caches
+    connect_args = {
+        "prepared_statement_cache_size": DB_ASYNC_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": DB_ASYNC_STATEMENT_CACHE_SIZE,
+    }
+    if DB_ASYNC_STATEMENT_CACHE_SIZE == 0:
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)  # libpq option; asyncpg takes the same modes as `ssl`
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+_url = make_url(DATABASE_URL)
+
 # Create synchronous engine with echo only in debug/dev mode
-engine = create_engine(DATABASE_URL, echo=os.getenv("SQL_ECHO", "false").lower() == "true")
+engine = create_engine(_url, echo=SQL_ECHO, **_pool_options(_url, DB_POOL_SIZE, DB_MAX_OVERFLOW))
 
 # Create a session local class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_database_url, _async_connect_args = _async_url(_url)
+async_engine = create_async_engine(
+    _async_database_url, echo=SQL_ECHO, connect_args=_async_connect_args,
+    **_pool_options(_async_database_url, DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW),
+)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (awaited) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -24,3 +102,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency for async FastAPI routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,476 @@
+"""
+Incrementally maintained aggregates over finance_data.
+
+Insert paths flush their new FinancialData rows and then call
+record_inserted_transactions() and record_inserted_months() before committing,
+so the aggregates are committed atomically with the rows they describe.
+
+  user_transaction_stats            count / sum / sum of squares per user (fraud features)
+  finance_monthly_rollups           expense sum / count / online count per user and month
+  finance_monthly_category_counts   transactions per user, month and category (forecast)
+
+Rebuild / backfill from the raw table:
+  python -m app.migrate_add_user_transaction_stats
+  python -m app.migrate_add_finance_monthly_rollups
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import Date, case, cast, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import (
+    FinanceMonthlyCategoryCount,
+    FinanceMonthlyRollup,
+    FinancialData,
+    UserTransactionStats,
+)
+
+_STATS_COLUMNS = ["user_id", "tx_count", "amount_sum", "amount_sum_sq", "last_tx_at", "updated_at"]
+
+
+def _stats_from_finance_data(user_uuid: Optional[UUID] = None):
+    """SELECT producing one user_transaction_stats row per user straight from finance_data."""
+    query = select(
+        FinancialData.user_id,
+        func.count(FinancialData.id),
+        func.coalesce(func.sum(FinancialData.amount), 0),
+        func.coalesce(func.sum(FinancialData.amount * FinancialData.amount), 0),
+        func.max(FinancialData.date),
+        func.now(),
+    ).where(FinancialData.user_id.isnot(None))
+    if user_uuid is not None:
+        query = query.where(FinancialData.user_id == user_uuid)
+    return query.group_by(FinancialData.user_id)
+
+
+def _seed_user_stats(db: Session, user_uuid: UUID) -> bool:
+    """Create the stats row for a user from their existing finance_data rows."""
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = (
+            pg_insert(UserTransactionStats)
+            .from_select(_STATS_COLUMNS, _stats_from_finance_data(user_uuid))
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+    else:
+        stmt = insert(UserTransactionStats).from_select(_STATS_COLUMNS, _stats_from_finance_data(user_uuid))
+    return db.execute(stmt).rowcount > 0
+
+
+def _increment_user_stats(
+    db: Session,
+    user_uuid: UUID,
+    count: int,
+    amount_sum: Decimal,
+    amount_sum_sq: Decimal,
+    last_tx_at: datetime,
+) -> bool:
+    stmt = (
+        update(UserTransactionStats)
+        .where(UserTransactionStats.user_id == user_uuid)
+        .values(
+            tx_count=UserTransactionStats.tx_count + count,
+            data_version=UserTransactionStats.data_version + 1,
+            amount_sum=UserTransactionStats.amount_sum + amount_sum,
+            amount_sum_sq=UserTransactionStats.amount_sum_sq + amount_sum_sq,
+            last_tx_at=case(
+                (
+                    or_(UserTransactionStats.last_tx_at.is_(None), UserTransactionStats.last_tx_at < last_tx_at),
+                    last_tx_at,
+                ),
+                else_=UserTransactionStats.last_tx_at,
+            ),
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).rowcount > 0
+
+
+def record_inserted_transactions(
+    db: Session,
+    user_uuid: UUID,
+    amounts: Iterable[float],
+    last_tx_at: datetime,
+) -> None:
+    """
+    Fold freshly inserted (and already flushed) transactions into the user's stats row.
+    `last_tx_at` is the latest date among the inserted rows.
+    """
+    # Amounts are stored as NUMERIC(15, 2); aggregate the stored values exactly
+    stored_amounts = [Decimal(f"{abs(float(amount)):.2f}") for amount in amounts]
+    if not stored_amounts:
+        return
+
+    count = len(stored_amounts)
+    amount_sum = sum(stored_amounts, Decimal(0))
+    amount_sum_sq = sum((amount * amount for amount in stored_amounts), Decimal(0))
+
+    if _increment_user_stats(db, user_uuid, count, amount_sum, amount_sum_sq, last_tx_at):
+        return
+    # No stats row yet: seed it from finance_data, which already includes the flushed rows.
+    # If a concurrent request seeded it first, our rows were not visible to it - add them.
+    if not _seed_user_stats(db, user_uuid):
+        _increment_user_stats(db, user_uuid, count, amount_sum, amount_sum_sq, last_tx_at)
+
+
+def get_history_before(db: Session, user_uuid: UUID, before: datetime) -> tuple:
+    """
+    Return (count, amount_sum, amount_sum_sq, last_tx_at) over the user's transactions
+    dated strictly before `before`.
+
+    When the whole history precedes `before` (the usual case for new transactions) this
+    is a primary-key lookup on user_transaction_stats. Backdated transactions, and users
+    without a stats row, fall back to a single SQL aggregate - rows are never loaded.
+    """
+    stats = db.query(
+        UserTransactionStats.tx_count,
+        UserTransactionStats.amount_sum,
+        UserTransactionStats.amount_sum_sq,
+        UserTransactionStats.last_tx_at,
+    ).filter(UserTransactionStats.user_id == user_uuid).first()
+
+    if stats is not None and (stats.last_tx_at is None or stats.last_tx_at < before):
+        count, amount_sum, amount_sum_sq, last_tx_at = stats
+    else:
+        count, amount_sum, amount_sum_sq, last_tx_at = db.query(
+            func.count(FinancialData.id),
+            func.sum(FinancialData.amount),
+            func.sum(FinancialData.amount * FinancialData.amount),
+            func.max(FinancialData.date),
+        ).filter(
+            FinancialData.user_id == user_uuid,
+            FinancialData.date < before,
+        ).one()
+
+    return (
+        int(count or 0),
+        float(amount_sum or 0.0),
+        float(amount_sum_sq or 0.0),
+        last_tx_at,
+    )
+
+
+# Most transactions get_stored_histories() subtracts from the stats row before it
+# falls back to one aggregate per row (far backdated rows)
+STORED_HISTORY_TAIL_MAX = 10000
+
+
+def get_stored_histories(db: Session, user_uuid: UUID, dates: list) -> list:
+    """
+    get_history_before(db, user_uuid, date) for each date of the user's transactions
+    that are already stored, and so already counted in user_transaction_stats.
+
+    The stats row minus the user's transactions dated on or after the earliest date:
+    a primary-key lookup, a short range scan and an index probe for the last date,
+    however many dates. Users without a stats row, or with more than
+    STORED_HISTORY_TAIL_MAX transactions in that range, use get_history_before per date.
+    """
+    # FOR SHARE: a concurrent insert cannot change the stats between the two reads
+    stats = db.query(
+        UserTransactionStats.tx_count,
+        UserTransactionStats.amount_sum,
+        UserTransactionStats.amount_sum_sq,
+    ).filter(UserTransactionStats.user_id == user_uuid).with_for_update(read=True).first()
+
+    window_start = min(dates)
+    tail = [] if stats is None else db.query(FinancialData.date, FinancialData.amount).filter(
+        FinancialData.user_id == user_uuid,
+        FinancialData.date >= window_start,
+    ).order_by(FinancialData.date.desc()).limit(STORED_HISTORY_TAIL_MAX + 1).all()
+    if stats is None or len(tail) > STORED_HISTORY_TAIL_MAX:
+        return [get_history_before(db, user_uuid, date) for date in dates]
+
+    tail.reverse()
+    tail_dates = [row.date for row in tail]
+    # suffix_*[i]: aggregate over tail[i:], i.e. the transactions dated >= tail_dates[i]
+    suffix_sum = [Decimal(0)] * (len(tail) + 1)
+    suffix_sum_sq = [Decimal(0)] * (len(tail) + 1)
+    for i in range(len(tail) - 1, -1, -1):
+        amount = tail[i].amount or Decimal(0)
+        suffix_sum[i] = suffix_sum[i + 1] + amount
+        suffix_sum_sq[i] = suffix_sum_sq[i + 1] + amount * amount
+
+    last_before_window = None
+    histories = []
+    for date in dates:
+        position = bisect_left(tail_dates, date)
+        if position > 0:
+            last_tx_at = tail_dates[position - 1]
+        else:
+            if last_before_window is None:
+                last_before_window = (db.query(func.max(FinancialData.date)).filter(
+                    FinancialData.user_id == user_uuid,
+                    FinancialData.date < window_start,
+                ).scalar(),)
+            last_tx_at = last_before_window[0]
+        histories.append((
+            int(stats.tx_count) - (len(tail) - position),
+            float(stats.amount_sum - suffix_sum[position]),
+            float(stats.amount_sum_sq - suffix_sum_sq[position]),
+            last_tx_at,
+        ))
+    return histories
+
+
+def get_data_version(db: Session, user_uuid: UUID) -> Optional[int]:
+    """
+    Counter bumped by every insert for the user (None before their first stats row).
+    Cached results derived from a user's transactions are keyed on it.
+    """
+    return db.query(UserTransactionStats.data_version).filter(
+        UserTransactionStats.user_id == user_uuid
+    ).scalar()
+
+
+async def get_data_version_async(db: AsyncSession, user_uuid: UUID) -> Optional[int]:
+    """get_data_version() on an async session."""
+    return await db.scalar(
+        select(UserTransactionStats.data_version).where(UserTransactionStats.user_id == user_uuid)
+    )
+
+
+def rebuild_user_transaction_stats(db: Session, user_uuid: Optional[UUID] = None) -> int:
+    """
+    Recompute user_transaction_stats from finance_data for one user, or for everyone.
+    Rows are rewritten in place and their data_version bumped, so caches keyed on it
+    never see an old version again; users left without transactions get zeroed stats.
+    Returns the number of stats rows written. The caller commits.
+    """
+    insert_stats = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert_stats(UserTransactionStats).from_select(_STATS_COLUMNS, _stats_from_finance_data(user_uuid))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "tx_count": stmt.excluded.tx_count,
+            "amount_sum": stmt.excluded.amount_sum,
+            "amount_sum_sq": stmt.excluded.amount_sum_sq,
+            "last_tx_at": stmt.excluded.last_tx_at,
+            "data_version": UserTransactionStats.data_version + 1,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    written = db.execute(stmt).rowcount
+
+    # Stats rows whose transactions are all gone (the upsert above does not reach them)
+    orphaned = (
+        update(UserTransactionStats)
+        .where(~select(FinancialData.id).where(FinancialData.user_id == UserTransactionStats.user_id).exists())
+        .values(
+            tx_count=0,
+            amount_sum=0,
+            amount_sum_sq=0,
+            last_tx_at=None,
+            data_version=UserTransactionStats.data_version + 1,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if user_uuid is not None:
+        orphaned = orphaned.where(UserTransactionStats.user_id == user_uuid)
+    return written + db.execute(orphaned).rowcount
+
+
+# ---------------------------------------------------------------------------
+# Monthly rollups (forecast input)
+# ---------------------------------------------------------------------------
+
+ONLINE_USE_CHIP = "Online Transaction"
+UNKNOWN_CATEGORY = "Unknown"  # Same label the forecast gives rows without a category
+
+_ROLLUP_COLUMNS = ["user_id", "month", "amount_sum", "tx_count", "online_count", "updated_at"]
+_CATEGORY_COUNT_COLUMNS = ["user_id", "month", "category", "tx_count"]
+
+
+def _month_of(db: Session, column):
+    """SQL expression for the first day of the month of a timestamp column."""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc("month", column), Date)
+    return func.date(column, "start of month")  # SQLite
+
+
+def _rollups_from_finance_data(db: Session, user_uuid: Optional[UUID] = None):
+    """SELECTs producing finance_monthly_rollups / finance_monthly_category_counts rows from finance_data."""
+    month = _month_of(db, FinancialData.date)
+    category = func.coalesce(func.nullif(FinancialData.category, ""), UNKNOWN_CATEGORY)
+    filters = [FinancialData.user_id.isnot(None), FinancialData.transaction_type == "expense"]
+    if user_uuid is not None:
+        filters.append(FinancialData.user_id == user_uuid)
+
+    rollups = select(
+        FinancialData.user_id,
+        month,
+        func.coalesce(func.sum(FinancialData.amount), 0),
+        func.count(FinancialData.id),
+        func.count(case((FinancialData.use_chip == ONLINE_USE_CHIP, 1))),
+        func.now(),
+    ).where(*filters).group_by(FinancialData.user_id, month)
+
+    category_counts = select(
+        FinancialData.user_id,
+        month,
+        category,
+        func.count(FinancialData.id),
+    ).where(*filters).group_by(FinancialData.user_id, month, category)
+
+    return rollups, category_counts
+
+
+def _seed_user_months(db: Session, user_uuid: UUID) -> bool:
+    """Create a user's monthly rollups from their existing finance_data rows."""
+    rollups, category_counts = _rollups_from_finance_data(db, user_uuid)
+    if db.get_bind().dialect.name == "postgresql":
+        seeded = db.execute(
+            pg_insert(FinanceMonthlyRollup)
+            .from_select(_ROLLUP_COLUMNS, rollups)
+            .on_conflict_do_nothing(index_elements=["user_id", "month"])
+        ).rowcount > 0
+        if seeded:
+            db.execute(
+                pg_insert(FinanceMonthlyCategoryCount)
+                .from_select(_CATEGORY_COUNT_COLUMNS, category_counts)
+                .on_conflict_do_nothing(index_elements=["user_id", "month", "category"])
+            )
+        return seeded
+
+    seeded = db.execute(insert(FinanceMonthlyRollup).from_select(_ROLLUP_COLUMNS, rollups)).rowcount > 0
+    if seeded:
+        db.execute(insert(FinanceMonthlyCategoryCount).from_select(_CATEGORY_COUNT_COLUMNS, category_counts))
+    return seeded
+
+
+def _add_to_rows(db: Session, model, key_columns: list, rows: list, extra: Optional[dict] = None) -> None:
+    """
+    Add each row's non-key values to the existing row with the same key, creating
+    missing rows. `extra` values (e.g. updated_at) are set as-is.
+    """
+    extra = extra or {}
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = pg_insert(model).values([{**row, **extra} for row in rows])
+        increments = [name for name in rows[0] if name not in key_columns]
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={**{name: getattr(model, name) + getattr(stmt.excluded, name) for name in increments}, **extra},
+        ))
+        return
+
+    for row in rows:
+        key = {name: row[name] for name in key_columns}
+        increments = {name: value for name, value in row.items() if name not in key_columns}
+        updated = db.execute(
+            update(model)
+            .where(*(getattr(model, name) == value for name, value in key.items()))
+            .values(**{name: getattr(model, name) + value for name, value in increments.items()}, **extra)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.execute(insert(model).values(**row, **extra))
+
+
+def _has_monthly_rollups(db: Session, user_uuid: UUID) -> bool:
+    return db.query(FinanceMonthlyRollup.month).filter(FinanceMonthlyRollup.user_id == user_uuid).first() is not None
+
+
+def record_inserted_months(
+    db: Session,
+    user_uuid: UUID,
+    dates: Iterable[datetime],
+    amounts: Iterable[float],
+    categories: Iterable[Optional[str]],
+    use_chips: Iterable[Optional[str]],
+) -> None:
+    """
+    Fold freshly inserted (and already flushed) expense rows into the user's monthly
+    rollups. A user without rollups yet is seeded from finance_data instead, which
+    already includes the flushed rows.
+    """
+    months = defaultdict(lambda: [Decimal(0), 0, 0])
+    month_categories = defaultdict(int)
+    for tx_date, amount, category, use_chip in zip(dates, amounts, categories, use_chips):
+        month = date(tx_date.year, tx_date.month, 1)
+        totals = months[month]
+        totals[0] += Decimal(f"{abs(float(amount)):.2f}")
+        totals[1] += 1
+        totals[2] += 1 if use_chip == ONLINE_USE_CHIP else 0
+        month_categories[(month, category if isinstance(category, str) and category else UNKNOWN_CATEGORY)] += 1
+    if not months:
+        return
+
+    # If a concurrent request seeded first, our rows were not visible to it - add them
+    if not _has_monthly_rollups(db, user_uuid) and _seed_user_months(db, user_uuid):
+        return
+
+    _add_to_rows(
+        db, FinanceMonthlyRollup, ["user_id", "month"],
+        [
+            {"user_id": user_uuid, "month": month, "amount_sum": amount_sum,
+             "tx_count": count, "online_count": online_count}
+            for month, (amount_sum, count, online_count) in sorted(months.items())
+        ],
+        {"updated_at": datetime.utcnow()},
+    )
+    _add_to_rows(
+        db, FinanceMonthlyCategoryCount, ["user_id", "month", "category"],
+        [
+            {"user_id": user_uuid, "month": month, "category": category, "tx_count": count}
+            for (month, category), count in sorted(month_categories.items())
+        ],
+    )
+
+
+def get_monthly_rollups(db: Session, user_uuid: UUID) -> Optional[list]:
+    """
+    The user's materialized months, oldest first, as
+    (month, amount_sum, tx_count, online_count, category_diversity) tuples.
+    Returns None when the user has no rollups yet (never inserted since the
+    rollups were introduced and not backfilled) - callers then use finance_data.
+    """
+    diversity = (
+        select(
+            FinanceMonthlyCategoryCount.month,
+            func.count().label("category_diversity"),
+        )
+        .where(
+            FinanceMonthlyCategoryCount.user_id == user_uuid,
+            FinanceMonthlyCategoryCount.tx_count > 0,
+        )
+        .group_by(FinanceMonthlyCategoryCount.month)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            FinanceMonthlyRollup.month,
+            FinanceMonthlyRollup.amount_sum,
+            FinanceMonthlyRollup.tx_count,
+            FinanceMonthlyRollup.online_count,
+            func.coalesce(diversity.c.category_diversity, 0),
+        )
+        .outerjoin(diversity, diversity.c.month == FinanceMonthlyRollup.month)
+        .where(FinanceMonthlyRollup.user_id == user_uuid, FinanceMonthlyRollup.tx_count > 0)
+        .order_by(FinanceMonthlyRollup.month)
+    ).all()
+    return [tuple(row) for row in rows] or None
+
+
+def rebuild_monthly_rollups(db: Session, user_uuid: Optional[UUID] = None) -> int:
+    """
+    Recompute the monthly rollups from finance_data for one user, or for everyone.
+    Returns the number of (user, month) rows written. The caller commits.
+    """
+    for model in (FinanceMonthlyRollup, FinanceMonthlyCategoryCount):
+        clear = delete(model)
+        if user_uuid is not None:
+            clear = clear.where(model.user_id == user_uuid)
+        db.execute(clear)
+
+    rollups, category_counts = _rollups_from_finance_data(db, user_uuid)
+    written = db.execute(insert(FinanceMonthlyRollup).from_select(_ROLLUP_COLUMNS, rollups)).rowcount
+    db.execute(insert(FinanceMonthlyCategoryCount).from_select(_CATEGORY_COUNT_COLUMNS, category_counts))
+    return written
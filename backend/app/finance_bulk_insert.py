@@ -0,0 +1,117 @@
+"""
+Bulk loading of cleaned CSV chunks into finance_data.
+
+Building a FinancialData ORM object per row and letting the unit of work flush
+them is the bottleneck of large imports. Instead, the cleaned chunk columns are
+streamed straight into the table:
+  - PostgreSQL (psycopg2): COPY finance_data (...) FROM STDIN in CSV format
+  - any other driver: one executemany INSERT, which SQLAlchemy sends as batched
+    multi-row INSERT statements
+
+Both run on the session's connection, so the rows commit (or roll back) together
+with the rest of the session's work. FINANCE_BULK_INSERT_METHOD=copy|insert forces a
+method; the default "auto" uses COPY when the driver supports it.
+
+Benchmark against the ORM path: python -m benchmarks.bench_finance_bulk_insert
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.lazy_imports import lazy_import
+from app.models import FinancialData
+
+pd = lazy_import("pandas")
+
+FINANCE_BULK_INSERT_METHOD = os.getenv("FINANCE_BULK_INSERT_METHOD", "auto").lower()
+
+# Columns written for every imported row (id comes from the sequence)
+BULK_COLUMNS = [
+    "user_id",
+    "date",
+    "amount",
+    "category",
+    "use_chip",
+    "transaction_type",
+    "is_fraud",
+    "fraud_probability",
+    "fraud_check_status",
+    "created_at",
+]
+
+
+def _supports_copy(db: Session) -> bool:
+    bind = db.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+
+
+def _prepare_frame(rows: pd.DataFrame) -> pd.DataFrame:
+    """Return the chunk with exactly BULK_COLUMNS, defaults filled in."""
+    frame = pd.DataFrame(index=rows.index)
+    for column in BULK_COLUMNS:
+        frame[column] = rows[column] if column in rows.columns else None
+    frame["transaction_type"] = frame["transaction_type"].fillna("expense")
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame["created_at"] = pd.to_datetime(frame["created_at"]).fillna(pd.Timestamp(datetime.utcnow()))
+    frame["amount"] = frame["amount"].astype(float).round(2)
+    frame["fraud_probability"] = pd.to_numeric(frame["fraud_probability"]).round(4)
+    frame["is_fraud"] = pd.to_numeric(frame["is_fraud"]).astype("Int64")
+    return frame
+
+
+def _copy_rows(db: Session, frame: pd.DataFrame) -> None:
+    buffer = io.StringIO()
+    # Unquoted empty fields are NULL in COPY's CSV format (cleaned chunks never
+    # contain empty strings: blank category/use_chip values are already None)
+    frame.to_csv(
+        buffer,
+        header=False,
+        index=False,
+        na_rep="",
+        date_format="%Y-%m-%d %H:%M:%S.%f",
+        quoting=csv.QUOTE_MINIMAL,
+    )
+    buffer.seek(0)
+
+    raw_connection = db.connection().connection
+    with raw_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {FinancialData.__tablename__} ({', '.join(BULK_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def _insert_rows(db: Session, frame: pd.DataFrame) -> None:
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    for record in records:
+        record["date"] = pd.Timestamp(record["date"]).to_pydatetime()
+        record["created_at"] = pd.Timestamp(record["created_at"]).to_pydatetime()
+    db.execute(insert(FinancialData.__table__), records)
+
+
+def bulk_insert_finance_rows(db: Session, rows: pd.DataFrame) -> int:
+    """
+    Insert cleaned transactions into finance_data without the ORM. `rows` needs
+    user_id, date and amount columns; the other BULK_COLUMNS are optional.
+    Returns the number of rows written. The caller commits.
+    """
+    if rows.empty:
+        return 0
+
+    frame = _prepare_frame(rows)
+    method = FINANCE_BULK_INSERT_METHOD
+    if method == "auto":
+        method = "copy" if _supports_copy(db) else "insert"
+
+    if method == "copy":
+        _copy_rows(db, frame)
+    else:
+        _insert_rows(db, frame)
+    return len(frame)
@@ -0,0 +1,137 @@
+"""
+Streaming columnar export of a user's finance_data (GET /finance/data/export).
+
+Rows are read with a server-side cursor (yield_per: a named cursor on psycopg2) in
+chunks of FINANCE_EXPORT_CHUNK_ROWS, turned into one Arrow record batch per chunk
+and written straight to the response:
+  - arrow:   Arrow IPC stream format with zstd-compressed buffers (pyarrow.ipc.open_stream)
+  - parquet: one row group per chunk, zstd-compressed; the footer follows the last chunk
+
+Memory stays at about one chunk regardless of the export size. pyarrow is imported on
+the first export (see app.lazy_imports).
+"""
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.lazy_imports import lazy_import
+from app.models import FinancialData
+
+pa = lazy_import("pyarrow")
+
+FINANCE_EXPORT_CHUNK_ROWS = int(os.getenv("FINANCE_EXPORT_CHUNK_ROWS", "50000"))
+
+EXPORT_FORMATS = {
+    # format -> (media type, file extension)
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+EXPORT_COLUMNS = [
+    FinancialData.id,
+    FinancialData.date,
+    FinancialData.amount,
+    FinancialData.category,
+    FinancialData.use_chip,
+    FinancialData.transaction_type,
+    FinancialData.is_fraud,
+    FinancialData.fraud_probability,
+    FinancialData.fraud_check_status,
+    FinancialData.created_at,
+]
+
+
+def export_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("amount", pa.decimal128(15, 2)),
+        ("category", pa.string()),
+        ("use_chip", pa.string()),
+        ("transaction_type", pa.string()),
+        ("is_fraud", pa.int8()),
+        ("fraud_probability", pa.decimal128(5, 4)),
+        ("fraud_check_status", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+class _ChunkSink:
+    """Write-only file object for the pyarrow writers; the generator drains it after each batch."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._parts.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _record_batch(rows: list, schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _open_writer(export_format: str, sink: _ChunkSink, schema):
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    import pyarrow.ipc
+
+    return pyarrow.ipc.new_stream(sink, schema, options=pyarrow.ipc.IpcWriteOptions(compression="zstd"))
+
+
+def stream_finance_export(user_uuid: UUID, export_format: str, start_dt: Optional[datetime] = None,
+                          end_dt: Optional[datetime] = None,
+                          chunk_rows: int = FINANCE_EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Yield the encoded export in pieces. Uses its own session: the response body is
+    streamed after the request's dependencies (and their session) are done.
+    """
+    statement = select(*EXPORT_COLUMNS).where(FinancialData.user_id == user_uuid)
+    if start_dt is not None:
+        statement = statement.where(FinancialData.date >= start_dt)
+    if end_dt is not None:
+        statement = statement.where(FinancialData.date <= end_dt)
+    statement = statement.order_by(FinancialData.date, FinancialData.id)
+
+    schema = export_schema()
+    sink = _ChunkSink()
+    db = SessionLocal()
+    try:
+        writer = _open_writer(export_format, sink, schema)
+        # Core execution on the session's connection: skips ORM row processing
+        result = db.connection().execute(statement.execution_options(yield_per=chunk_rows))
+        for rows in result.partitions():
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+        writer.close()  # Parquet footer / Arrow end-of-stream marker
+        yield sink.drain()
+    finally:
+        db.close()
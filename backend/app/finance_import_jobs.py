@@ -0,0 +1,246 @@
+"""
+Background CSV imports for POST /finance/data/upload.
+
+With background=true the upload is copied (streamed) to FINANCE_IMPORT_DIR, a
+finance_import_jobs row is created and the request returns the job id right away.
+Worker threads pick the job up and run the same chunked import as the synchronous
+path (routes.finance_forecasting.import_csv_stream), writing the running totals and
+per-chunk throughput to the job row after every chunk. GET /finance/imports/{id}
+reads them back.
+
+A job is created as 'uploading' and only becomes 'queued' in the commit that records
+its stored file, so no worker can claim it before the upload is on disk. It is
+claimed with UPDATE ... WHERE status = 'queued', so queued jobs re-enqueued on startup
+are imported exactly once even with several app processes. A process only claims
+jobs whose stored file it can open: with the default per-host FINANCE_IMPORT_DIR a
+job stays with the instance that received the upload (and waits for it to restart),
+so deployments with several instances that should share the queue must point
+FINANCE_IMPORT_DIR at shared storage. Jobs left 'uploading' or 'running' by a process
+that died are not resumed (a running job's chunks are already committed).
+
+Config (env):
+  FINANCE_IMPORT_BACKGROUND    default for the upload's background flag (false)
+  FINANCE_IMPORT_WORKERS       worker threads (1)
+  FINANCE_IMPORT_DIR           where uploads wait for their job (<tmp>/finance_imports);
+                               shared storage when several instances run imports
+"""
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.lazy_imports import lazy_import
+from app.models import FinanceImportJob
+
+pd = lazy_import("pandas")
+
+FINANCE_IMPORT_BACKGROUND = os.getenv("FINANCE_IMPORT_BACKGROUND", "false").lower() == "true"
+FINANCE_IMPORT_WORKERS = int(os.getenv("FINANCE_IMPORT_WORKERS", "1"))
+FINANCE_IMPORT_DIR = Path(os.getenv("FINANCE_IMPORT_DIR", os.path.join(tempfile.gettempdir(), "finance_imports")))
+
+STATUS_UPLOADING = "uploading"
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+_queue: "queue.Queue[int]" = queue.Queue()
+_stop = threading.Event()
+_threads: list = []
+
+
+def is_running() -> bool:
+    return any(t.is_alive() for t in _threads)
+
+
+def submit(db: Session, user_uuid: UUID, filename: str, stream) -> FinanceImportJob:
+    """Store the uploaded CSV and queue an import job for it."""
+    # Not claimable until the file is stored (the id names the file)
+    job = FinanceImportJob(user_id=user_uuid, filename=filename, status=STATUS_UPLOADING)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    try:
+        FINANCE_IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+        storage_path = FINANCE_IMPORT_DIR / f"{job.id}.csv"
+        stream.seek(0)
+        with open(storage_path, "wb") as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+    except Exception as e:
+        job.status = STATUS_FAILED
+        job.errors = json.dumps([f"Could not store upload: {str(e)}"])
+        job.error_count = 1
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        raise
+
+    job.storage_path = str(storage_path)
+    job.status = STATUS_QUEUED
+    db.commit()
+    _queue.put(job.id)
+    print(f"📥 Queued CSV import job {job.id} ({filename})")
+    return job
+
+
+def _has_local_file(storage_path) -> bool:
+    """Whether this process can read a job's stored upload (it may be on another host)."""
+    return bool(storage_path) and os.path.exists(storage_path)
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Move a queued job to running; False if another worker already took it."""
+    result = db.execute(
+        update(FinanceImportJob)
+        .where(FinanceImportJob.id == job_id, FinanceImportJob.status == STATUS_QUEUED)
+        .values(status=STATUS_RUNNING, started_at=datetime.utcnow())
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def run_job(job_id: int) -> None:
+    """Import the stored CSV of a queued job, recording progress after every chunk."""
+    from app.routes.finance_forecasting import import_csv_stream
+
+    db = SessionLocal()
+    storage_path = None
+    try:
+        job = db.get(FinanceImportJob, job_id)
+        if job is None or not _has_local_file(job.storage_path):
+            # Another instance's upload: left queued for the process that has the file
+            return
+        if not _claim(db, job_id):
+            return
+        db.refresh(job)
+        storage_path = job.storage_path
+        chunks = []
+
+        def on_chunk(stats: dict, errors: list) -> None:
+            chunks.append(stats)
+            job.rows_read += stats["rows_read"]
+            job.rows_inserted += stats["rows_inserted"]
+            job.rows_rejected += stats["rows_rejected"]
+            job.fraud_detected += stats["fraud_detected"]
+            job.error_count = len(errors)
+            job.errors = json.dumps(errors[:10]) if errors else None
+            job.chunks = json.dumps(chunks)
+            db.commit()
+
+        try:
+            with open(storage_path, "rb") as f:
+                import_csv_stream(db, f, job.user_id, on_chunk=on_chunk)
+            job.status = STATUS_COMPLETED
+        except Exception as e:
+            db.rollback()
+            message = "CSV file is empty" if isinstance(e, pd.errors.EmptyDataError) else str(e)
+            print(f"❌ CSV import job {job_id} failed: {message}")
+            errors = json.loads(job.errors) if job.errors else []
+            job.errors = json.dumps((errors + [message])[:10])
+            job.error_count += 1
+            job.status = STATUS_FAILED
+
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        print(f"✅ CSV import job {job_id} {job.status}: {job.rows_inserted:,}/{job.rows_read:,} rows inserted")
+    finally:
+        db.close()
+        if storage_path:
+            try:
+                os.remove(storage_path)
+            except OSError:
+                pass
+
+
+def job_to_dict(job: FinanceImportJob) -> dict:
+    """Status payload returned by GET /finance/imports/{id}."""
+    rows_per_second = None
+    if job.started_at:
+        seconds = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if seconds > 0:
+            rows_per_second = round(job.rows_read / seconds, 1)
+
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "rows_read": job.rows_read,
+        "rows_inserted": job.rows_inserted,
+        "rows_rejected": job.rows_rejected,
+        "fraud_detected": job.fraud_detected,
+        "rows_per_second": rows_per_second,
+        "error_count": job.error_count,
+        "errors": json.loads(job.errors) if job.errors else None,
+        "chunks": json.loads(job.chunks) if job.chunks else [],
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _worker() -> None:
+    while not _stop.is_set():
+        try:
+            job_id = _queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        try:
+            run_job(job_id)
+        except Exception as e:
+            print(f"❌ CSV import job {job_id} crashed: {e}")
+
+
+def _resume_queued() -> int:
+    """Enqueue jobs that were queued but never started (e.g. before a restart) and whose file is here."""
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(FinanceImportJob.id, FinanceImportJob.storage_path)
+            .filter(FinanceImportJob.status == STATUS_QUEUED)
+            .order_by(FinanceImportJob.id)
+            .all()
+        )
+    finally:
+        db.close()
+
+    job_ids = [job_id for job_id, storage_path in jobs if _has_local_file(storage_path)]
+    if len(job_ids) < len(jobs):
+        print(f"⏭️ Skipped {len(jobs) - len(job_ids)} queued CSV import job(s) stored on another host")
+    for job_id in job_ids:
+        _queue.put(job_id)
+    return len(job_ids)
+
+
+def start() -> None:
+    """Start the import workers and pick up queued jobs (idempotent)."""
+    if is_running():
+        return
+    _stop.clear()
+    _threads.clear()
+    for i in range(max(1, FINANCE_IMPORT_WORKERS)):
+        thread = threading.Thread(target=_worker, name=f"finance-import-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+    try:
+        resumed = _resume_queued()
+        if resumed:
+            print(f"📥 Resumed {resumed} queued CSV import job(s)")
+    except Exception as e:
+        print(f"⚠️ Could not resume queued CSV import jobs: {e}")
+
+
+def stop() -> None:
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout=5)
+    _threads.clear()
@@ -0,0 +1,187 @@
+"""
+NumPy evaluation of a fitted Prophet model.
+
+Prophet.predict rebuilds its feature frames and draws `uncertainty_samples` (1000)
+trend/noise simulations on every call. For the monthly expense model the fitted
+parameters never change between requests, so compile_prophet() extracts them once:
+piecewise-linear trend (k, m, changepoints, deltas), Fourier seasonalities,
+standardized extra regressors and their coefficients. CompiledProphet.predict then
+evaluates yhat with a few matrix products.
+
+Intervals are approximated analytically instead of by simulation: the predictive
+trend adds Laplace(0, lambda) rate changes from a Poisson process with rate S on
+[1, t], whose variance at scaled time t is S * 2 * lambda^2 * (t - 1)^3 / 3, and the
+observation noise is Normal(0, sigma_obs). The two are combined as a Gaussian.
+yhat matches Prophet to floating-point precision; bounds are close to, but not
+identical with, Prophet's sampled quantiles.
+
+Supported: MAP-fitted models with linear or flat growth, unconditional seasonalities,
+extra regressors, additive or multiplicative components and no holidays. Anything
+else raises ValueError from compile_prophet() so callers can fall back to Prophet.
+
+Validation against Prophet: python -m benchmarks.validate_forecast_engine
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+_EPOCH = pd.Timestamp("1970-01-01")
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class CompiledProphet:
+    """Fitted Prophet parameters plus a vectorized predict(); see compile_prophet()."""
+
+    def __init__(self, growth, start, t_scale_seconds, y_scale, floor, k, m, changepoints_t, deltas,
+                 sigma_obs, seasonalities, extra_regressors, beta_multiplicative, beta_additive,
+                 interval_width):
+        self.growth = growth
+        self.start = pd.Timestamp(start)
+        self.t_scale_seconds = float(t_scale_seconds)
+        self.y_scale = float(y_scale)
+        self.floor = float(floor)
+        self.k = float(k)
+        self.m = float(m)
+        self.changepoints_t = np.asarray(changepoints_t, dtype=float)
+        self.deltas = np.asarray(deltas, dtype=float)
+        self.sigma_obs = float(sigma_obs)
+        self.seasonalities = seasonalities  # [(name, period, fourier_order)], in feature order
+        self.extra_regressors = extra_regressors  # name -> {"mu", "std", "mode"}, in feature order
+        self.beta_multiplicative = np.asarray(beta_multiplicative, dtype=float)
+        self.beta_additive = np.asarray(beta_additive, dtype=float)
+        self.interval_width = float(interval_width)
+
+    def _scaled_time(self, ds: pd.Series) -> np.ndarray:
+        return ((ds - self.start).dt.total_seconds() / self.t_scale_seconds).to_numpy(dtype=float)
+
+    def _features(self, df: pd.DataFrame, ds: pd.Series) -> np.ndarray:
+        """Seasonal and regressor feature matrix, columns in the same order as Prophet's beta."""
+        days = ((ds - _EPOCH).dt.total_seconds() / _SECONDS_PER_DAY).to_numpy(dtype=float)
+        blocks = []
+        for _, period, fourier_order in self.seasonalities:
+            orders = np.arange(1, fourier_order + 1)
+            angles = 2 * np.pi * days[:, None] * orders[None, :] / period
+            block = np.empty((len(days), 2 * fourier_order))
+            block[:, 0::2] = np.sin(angles)
+            block[:, 1::2] = np.cos(angles)
+            blocks.append(block)
+
+        if self.extra_regressors:
+            names = list(self.extra_regressors)
+            missing = [name for name in names if name not in df.columns]
+            if missing:
+                raise ValueError(f"Regressor(s) {missing} missing from dataframe")
+            values = df[names].to_numpy(dtype=float)
+            if np.isnan(values).any():
+                raise ValueError("Found NaN in regressor columns")
+            mu = np.array([self.extra_regressors[name]["mu"] for name in names])
+            std = np.array([self.extra_regressors[name]["std"] for name in names])
+            blocks.append((values - mu) / std)
+
+        return np.hstack(blocks) if blocks else np.empty((len(ds), 0))
+
+    def _trend(self, t: np.ndarray) -> np.ndarray:
+        if self.growth == "flat":
+            return np.full_like(t, self.m)
+        active = self.changepoints_t[None, :] <= t[:, None]
+        k_t = self.k + active @ self.deltas
+        m_t = self.m - active @ (self.deltas * self.changepoints_t)
+        return k_t * t + m_t
+
+    def _trend_std(self, t: np.ndarray) -> np.ndarray:
+        """Std of the simulated future trend changes (in scaled units), 0 inside the history."""
+        if self.growth == "flat" or len(self.changepoints_t) == 0:
+            return np.zeros_like(t)
+        rate = len(self.changepoints_t)
+        laplace_scale = np.mean(np.abs(self.deltas)) + 1e-8
+        horizon = np.clip(t - 1.0, 0.0, None)
+        return np.sqrt(rate * 2 * laplace_scale ** 2 * horizon ** 3 / 3)
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Same contract as Prophet.predict for the columns the forecast uses:
+        ds, trend, multiplicative_terms, additive_terms, yhat, yhat_lower, yhat_upper.
+        """
+        if "ds" not in df:
+            raise ValueError('Dataframe must have column "ds" with the dates.')
+        df = df.reset_index(drop=True)
+        ds = pd.to_datetime(df["ds"])
+        if ds.isnull().any():
+            raise ValueError("Found NaN in column ds.")
+
+        t = self._scaled_time(ds)
+        features = self._features(df, ds)
+        trend = self._trend(t) * self.y_scale + self.floor
+        multiplicative_terms = features @ self.beta_multiplicative
+        additive_terms = (features @ self.beta_additive) * self.y_scale
+        yhat = trend * (1 + multiplicative_terms) + additive_terms
+
+        trend_std = self._trend_std(t) * self.y_scale * np.abs(1 + multiplicative_terms)
+        noise_std = self.sigma_obs * self.y_scale
+        z = NormalDist().inv_cdf((1 + self.interval_width) / 2)
+        margin = z * np.sqrt(trend_std ** 2 + noise_std ** 2)
+
+        return pd.DataFrame({
+            "ds": ds,
+            "trend": trend,
+            "multiplicative_terms": multiplicative_terms,
+            "additive_terms": additive_terms,
+            "yhat": yhat,
+            "yhat_lower": yhat - margin,
+            "yhat_upper": yhat + margin,
+        })
+
+
+def compile_prophet(model) -> CompiledProphet:
+    """Extract the fitted parameters of a Prophet model; ValueError if it uses unsupported features."""
+    if model.params is None or "k" not in model.params:
+        raise ValueError("Model is not fitted")
+    if getattr(model, "mcmc_samples", 0):
+        raise ValueError("MCMC-fitted models are not supported")
+    if model.growth not in ("linear", "flat"):
+        raise ValueError(f"Growth '{model.growth}' is not supported")
+    if model.holidays is not None or getattr(model, "country_holidays", None):
+        raise ValueError("Holiday effects are not supported")
+    if getattr(model, "logistic_floor", False):
+        raise ValueError("Logistic floor is not supported")
+
+    seasonalities = []
+    for name, props in model.seasonalities.items():
+        if props.get("condition_name"):
+            raise ValueError(f"Conditional seasonality '{name}' is not supported")
+        seasonalities.append((name, float(props["period"]), int(props["fourier_order"])))
+
+    extra_regressors = {
+        name: {"mu": float(props["mu"]), "std": float(props["std"]), "mode": props["mode"]}
+        for name, props in model.extra_regressors.items()
+    }
+
+    # Beta columns follow make_all_seasonality_features: seasonalities, then regressors
+    n_features = sum(2 * order for _, _, order in seasonalities) + len(extra_regressors)
+    beta = np.asarray(model.params["beta"], dtype=float).mean(axis=0)
+    if beta.shape[0] != n_features:
+        raise ValueError(f"Expected {n_features} coefficients, model has {beta.shape[0]}")
+    component_cols = model.train_component_cols
+    multiplicative_mask = component_cols["multiplicative_terms"].to_numpy(dtype=float)
+    additive_mask = component_cols["additive_terms"].to_numpy(dtype=float)
+
+    floor = model.y_min if getattr(model, "scaling", "absmax") == "minmax" else 0.0
+
+    return CompiledProphet(
+        growth=model.growth,
+        start=model.start,
+        t_scale_seconds=model.t_scale.total_seconds(),
+        y_scale=model.y_scale,
+        floor=floor,
+        k=np.nanmean(model.params["k"]),
+        m=np.nanmean(model.params["m"]),
+        changepoints_t=np.asarray(model.changepoints_t if model.changepoints_t is not None else [], dtype=float),
+        deltas=np.nanmean(model.params["delta"], axis=0),
+        sigma_obs=np.nanmean(model.params["sigma_obs"]),
+        seasonalities=seasonalities,
+        extra_regressors=extra_regressors,
+        beta_multiplicative=beta * multiplicative_mask,
+        beta_additive=beta * additive_mask,
+        interval_width=model.interval_width,
+    )
@@ -0,0 +1,192 @@
+"""
+Process pool for CPU-heavy forecast work (Prophet predictions and fallback fits).
+
+A Prophet fit or its 1000-sample predict holds a request thread (and parts of it the
+GIL) for up to seconds. run() (run_async() in async routes) executes such work in a
+small ProcessPoolExecutor so the API process stays responsive. At most
+FORECAST_POOL_WORKERS + FORECAST_POOL_MAX_PENDING calls are in flight; beyond that
+run() raises ForecastPoolBusy immediately, and a call that does not finish within
+FORECAST_POOL_TIMEOUT_SECONDS raises ForecastPoolTimeout. Routes turn both into 503
+with Retry-After. A timed-out call that is already running cannot be cancelled, so
+its pool is killed and replaced on the next call.
+
+Workers are started with "spawn": forking a process that already runs the scheduler,
+queue threads and a DB connection pool is not safe. Each worker imports the app and
+loads the model on its first task. Inside a worker run() executes inline.
+
+Config (env):
+  FORECAST_POOL_WORKERS              worker processes (2); 0 runs everything inline
+  FORECAST_POOL_MAX_PENDING          calls allowed to wait for a free worker (4)
+  FORECAST_POOL_TIMEOUT_SECONDS      how long a caller waits for a result (60)
+  FORECAST_POOL_RETRY_AFTER_SECONDS  Retry-After for 503 responses (10)
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+FORECAST_POOL_WORKERS = int(os.getenv("FORECAST_POOL_WORKERS", "2"))
+FORECAST_POOL_MAX_PENDING = int(os.getenv("FORECAST_POOL_MAX_PENDING", "4"))
+FORECAST_POOL_TIMEOUT_SECONDS = float(os.getenv("FORECAST_POOL_TIMEOUT_SECONDS", "60"))
+FORECAST_POOL_RETRY_AFTER_SECONDS = int(os.getenv("FORECAST_POOL_RETRY_AFTER_SECONDS", "10"))
+
+
+class ForecastPoolBusy(Exception):
+    """All workers are busy and the pending queue is full."""
+
+
+class ForecastPoolTimeout(Exception):
+    """The forecast did not finish within FORECAST_POOL_TIMEOUT_SECONDS."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+_in_flight = 0
+_rejected = 0
+_timed_out = 0
+_in_worker = False  # True inside pool processes
+
+
+def _init_worker() -> None:
+    global _in_worker
+    _in_worker = True
+
+
+def enabled() -> bool:
+    return FORECAST_POOL_WORKERS > 0 and not _in_worker
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=FORECAST_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            print(f"✅ Forecast process pool started ({FORECAST_POOL_WORKERS} workers)")
+        return _executor
+
+
+def _release(_future=None) -> None:
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _discard(executor: ProcessPoolExecutor, reason: str, terminate: bool = False) -> None:
+    """
+    Drop the pool so the next call starts a fresh one. terminate=True also kills its
+    workers: a running task cannot be cancelled, and a hung fit would keep its worker
+    (and in-flight slot) forever. Other calls still running in that pool then fail
+    with BrokenProcessPool.
+    """
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    processes = list((executor._processes or {}).values()) if terminate else []
+    for process in processes:
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+    print(f"⚠️ Forecast process pool {reason}; it will be restarted on the next forecast")
+
+
+def _submit(fn, args: tuple) -> tuple:
+    """Take an in-flight slot and submit fn(*args); returns (executor, future)."""
+    global _in_flight, _rejected
+    with _lock:
+        if _in_flight >= FORECAST_POOL_WORKERS + FORECAST_POOL_MAX_PENDING:
+            _rejected += 1
+            raise ForecastPoolBusy(
+                f"{_in_flight} forecasts in progress; try again in {FORECAST_POOL_RETRY_AFTER_SECONDS}s"
+            )
+        _in_flight += 1
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(fn, *args)
+    except (BrokenProcessPool, RuntimeError):
+        _release()
+        _discard(executor, "broke")
+        raise
+    # The slot stays taken until the worker is done, even if the caller gave up waiting
+    future.add_done_callback(_release)
+    return executor, future
+
+
+def _timeout(executor: ProcessPoolExecutor, future: Future) -> ForecastPoolTimeout:
+    global _timed_out
+    with _lock:
+        _timed_out += 1
+    if not future.cancel():  # cancel() only works if it has not started yet
+        _discard(executor, f"killed after a forecast ran over {FORECAST_POOL_TIMEOUT_SECONDS:g}s",
+                 terminate=True)
+    return ForecastPoolTimeout(f"Forecast did not finish within {FORECAST_POOL_TIMEOUT_SECONDS:g}s")
+
+
+def run(fn, *args):
+    """
+    Run fn(*args) in the pool and return its result. fn and its arguments must be
+    picklable (module-level function, plain data). Inline when the pool is disabled.
+    """
+    if not enabled():
+        return fn(*args)
+
+    executor, future = _submit(fn, args)
+    try:
+        return future.result(timeout=FORECAST_POOL_TIMEOUT_SECONDS)
+    except FuturesTimeoutError:
+        raise _timeout(executor, future)
+    except BrokenProcessPool:
+        _discard(executor, "broke")
+        raise
+
+
+async def run_async(fn, *args):
+    """
+    run() for async routes: awaits the result instead of holding a threadpool thread
+    while the worker computes. Runs fn in a thread when the pool is disabled.
+    """
+    if not enabled():
+        return await asyncio.to_thread(fn, *args)
+
+    executor, future = _submit(fn, args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), FORECAST_POOL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise _timeout(executor, future)
+    except BrokenProcessPool:
+        _discard(executor, "broke")
+        raise
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "workers": FORECAST_POOL_WORKERS,
+            "max_pending": FORECAST_POOL_MAX_PENDING,
+            "timeout_seconds": FORECAST_POOL_TIMEOUT_SECONDS,
+            "in_flight": _in_flight,
+            "rejected": _rejected,
+            "timed_out": _timed_out,
+            "started": _executor is not None,
+        }
+
+
+def start() -> None:
+    """Create the pool at startup (workers are spawned when the first forecast arrives)."""
+    if enabled():
+        _get_executor()
+
+
+def stop() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,244 @@
+"""
+Asynchronous fraud scoring for manually added transactions.
+
+When enabled, POST /finance/data commits the row with is_fraud = NULL and
+fraud_check_status = 'pending' and returns immediately. A small pool of worker
+threads drains the queue in micro-batches: it waits for the first row id, then
+collects up to FRAUD_QUEUE_BATCH_SIZE ids for at most FRAUD_QUEUE_MAX_WAIT_MS,
+scores the whole batch with one model call and writes the results back.
+
+Pending rows are also picked up from the database on startup and by a periodic
+sweep, so rows queued by a worker process that died are not lost. When scoring a
+batch fails (e.g. the model cannot be loaded) its rows stay pending for the next
+sweep; after FRAUD_QUEUE_MAX_ATTEMPTS failed attempts in this process a row is
+marked 'failed'.
+
+The workers and the sweep run only where FRAUD_QUEUE_ENABLED is set (it follows
+ASYNC_FRAUD_SCORING by default); elsewhere POST /finance/data scores synchronously
+even when async_fraud_check is requested.
+
+Config (env):
+  ASYNC_FRAUD_SCORING          default for POST /finance/data (false)
+  FRAUD_QUEUE_ENABLED          run the workers and sweep in this process (ASYNC_FRAUD_SCORING)
+  FRAUD_QUEUE_WORKERS          worker threads (2)
+  FRAUD_QUEUE_BATCH_SIZE       max rows per model call (256)
+  FRAUD_QUEUE_MAX_WAIT_MS      how long a batch waits to fill up (50)
+  FRAUD_QUEUE_SWEEP_SECONDS    interval of the pending-row sweep (60)
+  FRAUD_QUEUE_MAX_ATTEMPTS     scoring attempts per row before it is marked failed (3)
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, update
+
+from app.database import SessionLocal
+from app.lazy_imports import lazy_import
+from app.models import FinancialData
+
+pd = lazy_import("pandas")
+
+ASYNC_FRAUD_SCORING = os.getenv("ASYNC_FRAUD_SCORING", "false").lower() == "true"
+FRAUD_QUEUE_ENABLED = os.getenv("FRAUD_QUEUE_ENABLED", str(ASYNC_FRAUD_SCORING)).lower() == "true"
+FRAUD_QUEUE_WORKERS = int(os.getenv("FRAUD_QUEUE_WORKERS", "2"))
+FRAUD_QUEUE_BATCH_SIZE = int(os.getenv("FRAUD_QUEUE_BATCH_SIZE", "256"))
+FRAUD_QUEUE_MAX_WAIT_MS = int(os.getenv("FRAUD_QUEUE_MAX_WAIT_MS", "50"))
+FRAUD_QUEUE_SWEEP_SECONDS = int(os.getenv("FRAUD_QUEUE_SWEEP_SECONDS", "60"))
+FRAUD_QUEUE_MAX_ATTEMPTS = int(os.getenv("FRAUD_QUEUE_MAX_ATTEMPTS", "3"))
+
+STATUS_PENDING = "pending"
+STATUS_SCORED = "scored"
+STATUS_FAILED = "failed"
+
+_queue: "queue.Queue[int]" = queue.Queue()
+_queued_ids: set = set()
+_queued_lock = threading.Lock()
+_failed_attempts: dict = {}  # row id -> failed scoring attempts, guarded by _queued_lock
+_stop = threading.Event()
+_threads: list = []
+
+
+def is_running() -> bool:
+    return any(t.is_alive() for t in _threads)
+
+
+def queue_depth() -> int:
+    return _queue.qsize()
+
+
+def enqueue(row_id: int) -> None:
+    """Queue a committed, pending finance_data row for scoring (duplicates are ignored)."""
+    with _queued_lock:
+        if row_id in _queued_ids:
+            return
+        _queued_ids.add(row_id)
+    _queue.put(row_id)
+
+
+def _next_batch() -> list:
+    """Block until a row id arrives, then gather more until the batch is full or the wait expires."""
+    try:
+        batch = [_queue.get(timeout=1.0)]
+    except queue.Empty:
+        return []
+
+    deadline = time.monotonic() + FRAUD_QUEUE_MAX_WAIT_MS / 1000.0
+    while len(batch) < FRAUD_QUEUE_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _record_failure(row_ids: list) -> list:
+    """Count a failed scoring attempt for each row; returns the rows out of attempts."""
+    given_up = []
+    with _queued_lock:
+        for row_id in row_ids:
+            attempts = _failed_attempts.get(row_id, 0) + 1
+            if attempts >= FRAUD_QUEUE_MAX_ATTEMPTS:
+                _failed_attempts.pop(row_id, None)
+                given_up.append(row_id)
+            else:
+                _failed_attempts[row_id] = attempts
+    return given_up
+
+
+def score_pending_rows(row_ids: list) -> int:
+    """Score the given pending rows with one model call and store the results. Returns rows scored."""
+    from app.routes.fraud_detection import score_stored_transactions
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            FinancialData.id,
+            FinancialData.user_id,
+            FinancialData.date,
+            FinancialData.amount,
+            FinancialData.category,
+            FinancialData.use_chip,
+        ).filter(
+            FinancialData.id.in_(row_ids),
+            FinancialData.fraud_check_status == STATUS_PENDING,
+        ).all()
+        if not rows:
+            return 0
+
+        transactions = pd.DataFrame(
+            rows, columns=["id", "user_id", "date", "amount", "category", "use_chip"]
+        )
+        try:
+            is_fraud, fraud_probability = score_stored_transactions(transactions, db)
+        except Exception as e:
+            db.rollback()
+            given_up = _record_failure([int(row_id) for row_id in transactions["id"]])
+            print(f"❌ Async fraud scoring failed for {len(rows)} row(s), "
+                  f"{len(given_up)} marked failed: {e}")
+            if not given_up:
+                return 0
+            results = [
+                {"row_id": row_id, "is_fraud_value": None, "probability": None, "status": STATUS_FAILED}
+                for row_id in given_up
+            ]
+        else:
+            results = [
+                {"row_id": int(row_id), "is_fraud_value": int(flag),
+                 "probability": round(float(prob), 4), "status": STATUS_SCORED}
+                for row_id, flag, prob in zip(transactions["id"], is_fraud, fraud_probability)
+            ]
+            with _queued_lock:
+                for result in results:
+                    _failed_attempts.pop(result["row_id"], None)
+
+        table = FinancialData.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .where(table.c.fraud_check_status == STATUS_PENDING)
+            .values(
+                is_fraud=bindparam("is_fraud_value"),
+                fraud_probability=bindparam("probability"),
+                fraud_check_status=bindparam("status"),
+            ),
+            results,
+        )
+        db.commit()
+        return sum(1 for r in results if r["status"] == STATUS_SCORED)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _worker() -> None:
+    while not _stop.is_set():
+        batch = _next_batch()
+        if not batch:
+            continue
+        try:
+            scored = score_pending_rows(batch)
+            print(f"✅ Async fraud queue: scored {scored}/{len(batch)} row(s)")
+        except Exception as e:
+            # Rows stay pending and are retried by the next sweep
+            print(f"❌ Async fraud queue batch failed: {e}")
+        finally:
+            with _queued_lock:
+                _queued_ids.difference_update(batch)
+
+
+def sweep_pending(limit: Optional[int] = None) -> int:
+    """Enqueue rows still marked pending in the database. Returns how many were found."""
+    db = SessionLocal()
+    try:
+        query = db.query(FinancialData.id).filter(
+            FinancialData.fraud_check_status == STATUS_PENDING
+        ).order_by(FinancialData.id)
+        if limit:
+            query = query.limit(limit)
+        row_ids = [row[0] for row in query.all()]
+    finally:
+        db.close()
+
+    for row_id in row_ids:
+        enqueue(row_id)
+    return len(row_ids)
+
+
+def start() -> None:
+    """Start the worker threads and the periodic sweep when enabled (idempotent)."""
+    from app import forecast_pool
+
+    if not FRAUD_QUEUE_ENABLED or forecast_pool._in_worker or is_running():
+        return
+    _stop.clear()
+    _threads.clear()
+    for i in range(max(1, FRAUD_QUEUE_WORKERS)):
+        thread = threading.Thread(target=_worker, name=f"fraud-queue-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+    from app.scheduler_app import scheduler
+
+    scheduler.add_job(
+        sweep_pending,
+        "interval",
+        seconds=FRAUD_QUEUE_SWEEP_SECONDS,
+        id="fraud_queue_sweep",
+        replace_existing=True,
+        next_run_time=datetime.now(),  # first sweep right away picks up rows left pending
+    )
+
+
+def stop() -> None:
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout=5)
+    _threads.clear()
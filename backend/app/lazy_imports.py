@@ -0,0 +1,39 @@
+"""
+Deferred imports of the heavy ML stack (pandas, numpy, xgboost, joblib).
+
+app.main imports every router, so a top-level `import pandas` in the finance or fraud
+routes made every cold start (OAuth, social and voice-bot endpoints included) pay
+for pandas, numpy, xgboost and scikit-learn. Modules use
+
+    pd = lazy_import("pandas")
+
+instead: the real module is imported on the first attribute access, i.e. by the first
+finance or fraud request or by the model preload app.model_registry runs after startup.
+The import goes through the normal import system, so concurrent first requests are
+safe. Modules using lazy names in annotations need `from __future__ import annotations`
+so the annotations are not evaluated at import.
+
+Measure with: python -m benchmarks.bench_import_time
+"""
+import importlib
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported when one of its attributes is first used."""
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        value = getattr(module, attr)
+        setattr(self, attr, value)  # later lookups skip __getattr__
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}'>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Module `name` if already imported, else a LazyModule for it."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
@@ -8,8 +8,11 @@ from fastapi.responses import RedirectResponse
 import httpx
 import os
 from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app import meta_accounts
+from app.database import get_async_db, get_db
 from app.models import User
 from app.auth import get_user_id_from_token
 from datetime import datetime, timedelta, timezone
@@ -22,6 +25,7 @@ from app.routes.fraud_detection import router as fraud_detection_router
 from app.routes.categories import router as categories_router
 from app.routes.voice_bots import router as voice_bots_router
 from app.routes.meeting_scheduling import router as meeting_scheduling_router
+from app.routes.social_snapshots import router as social_snapshots_router
 from fastapi.middleware.cors import CORSMiddleware
 from uuid import UUID as UUIDType
 
@@ -31,10 +35,35 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     from app.scheduler_app import start_scheduler, shutdown_scheduler
+    from app.database import SessionLocal, async_engine
+    from app import category_cache, finance_import_jobs, forecast_pool, fraud_queue, model_registry, social_snapshots
+    from app.routes import insta_analytics
 
     start_scheduler()
+    model_registry.start()
+    fraud_queue.start()
+    finance_import_jobs.start()
+    forecast_pool.start()
+    social_snapshots.start()
+
+    # Warm the category cache; if the DB is unreachable it loads on first use instead
+    db = SessionLocal()
+    try:
+        category_cache.load(db)
+    except Exception as e:
+        print(f"⚠️ Could not preload categories: {e}")
+    finally:
+        db.close()
+
     yield
+    social_snapshots.stop()
+    forecast_pool.stop()
+    finance_import_jobs.stop()
+    fraud_queue.stop()
+    model_registry.stop()
     shutdown_scheduler()
+    await insta_analytics.close_client()
+    await async_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -63,6 +92,7 @@ app.include_router(fraud_detection_router)
 app.include_router(categories_router)
 app.include_router(voice_bots_router)
 app.include_router(meeting_scheduling_router)
+app.include_router(social_snapshots_router)
 
 FB_APP_ID    = os.getenv("FB_APP_ID")
 FB_APP_SECRET = os.getenv("FB_APP_SECRET")
@@ -221,6 +251,11 @@ async def facebook_callback(request: Request, db: Session = Depends(get_db)):
 
     db.commit()
 
+    # Pages / Instagram account resolved with the previous token are stale now
+    for user in (user_by_uid, user_by_fb):
+        if user is not None:
+            meta_accounts.invalidate(user.user_id)
+
     return RedirectResponse(f"{FRONTEND_URL}/marketing?connected=true")
 
 
@@ -413,8 +448,8 @@ def google_callback(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/user/connection-status")
-def get_connection_status(
-    db: Session = Depends(get_db),
+async def get_connection_status(
+    db: AsyncSession = Depends(get_async_db),
     user_id: str = Depends(get_user_id_from_token)
 ):
     """
@@ -426,7 +461,7 @@ def get_connection_status(
     except ValueError:
         return {"error": "Invalid user_id format. Expected UUID."}
     
-    user = db.query(User).filter(User.user_id == user_uuid).first()
+    user = await db.scalar(select(User).where(User.user_id == user_uuid).limit(1))
     
     if not user:
         return {
@@ -452,3 +487,11 @@ def get_connection_status(
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "Opsly backend is running"}
+
+
+@app.get("/health/models")
+def models_status():
+    """Loaded ML models with version, sha256 and load time (see app.model_registry)."""
+    from app import model_registry
+
+    return {"status": "ok", "models": model_registry.status()}
@@ -0,0 +1,88 @@
+"""
+In-process cache of global finance_data frequencies used for the mcc_rarity fraud feature.
+
+mcc_rarity is the share of all transactions whose category maps to the same MCC code.
+Counting that over finance_data on every fraud check means several full-table scans,
+so the per-category counts are loaded with one grouped query and then:
+  - bumped in-process when this worker inserts rows (record_inserted_categories), and
+  - reloaded once older than MCC_FREQUENCY_MAX_AGE_SECONDS (default 300), which bounds
+    how stale the counts can be with respect to inserts made by other workers.
+The mcc_code -> category names mapping comes from app.category_cache.
+"""
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import category_cache
+from app.models import FinancialData
+
+MCC_FREQUENCY_MAX_AGE_SECONDS = float(os.getenv("MCC_FREQUENCY_MAX_AGE_SECONDS", "300"))
+
+_lock = threading.Lock()
+_category_counts: dict = {}      # finance_data.category (None included) -> row count
+_total_count = 0
+_loaded_at: Optional[float] = None
+
+
+def _is_stale() -> bool:
+    return _loaded_at is None or (time.monotonic() - _loaded_at) > MCC_FREQUENCY_MAX_AGE_SECONDS
+
+
+def _refresh(db: Session) -> None:
+    global _category_counts, _total_count, _loaded_at
+
+    counts = dict(
+        db.query(FinancialData.category, func.count(FinancialData.id))
+        .group_by(FinancialData.category)
+        .all()
+    )
+
+    _category_counts = counts
+    _total_count = sum(counts.values())
+    _loaded_at = time.monotonic()
+
+
+def ensure_fresh(db: Session) -> None:
+    """Reload the counts if they were never loaded or are older than the staleness bound."""
+    if not _is_stale():
+        return
+    with _lock:
+        # Another thread may have refreshed while we waited for the lock
+        if _is_stale():
+            _refresh(db)
+
+
+def invalidate() -> None:
+    """Force a reload on the next lookup."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = None
+
+
+def record_inserted_categories(categories: Iterable[Optional[str]]) -> None:
+    """Fold committed inserts into the cached counts (no-op until the cache is loaded)."""
+    global _total_count
+    with _lock:
+        if _loaded_at is None:
+            return
+        for category in categories:
+            _category_counts[category] = _category_counts.get(category, 0) + 1
+            _total_count += 1
+
+
+def mcc_rarity(mcc_simple: int, db: Session) -> float:
+    """
+    Frequency of the MCC among all transactions (matching training): rows whose category
+    has categories.mcc_code == str(mcc_simple), or rows without a category when mcc_simple is 0.
+    """
+    ensure_fresh(db)
+    counts = _category_counts
+    if mcc_simple > 0:
+        mcc_count = sum(counts.get(name, 0) for name in category_cache.names_for_mcc_code(str(mcc_simple), db))
+    else:
+        mcc_count = counts.get(None, 0)
+    return mcc_count / (_total_count or 1)
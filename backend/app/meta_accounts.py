@@ -0,0 +1,116 @@
+"""
+Per-user cache of the Facebook Page and Instagram business account behind a Meta
+session token.
+
+The Facebook/Instagram analytics and posting endpoints all start with
+/me/accounts (first Page and its page token) and
+/{page_id}?fields=instagram_business_account. Those mappings rarely change, so the
+result is cached per user for META_ACCOUNT_CACHE_TTL_SECONDS. Entries are keyed on
+the user and a digest of their session_token: after facebook_callback stores a new
+token no worker can serve the old mapping, and the callback also drops the user's
+entries in its own process (invalidate()).
+
+The Instagram lookup only runs for callers that need it (instagram=True) and is
+then kept in the entry. Graph errors are never cached. Callers pass their own
+graph_get(url, params) so request failures surface exactly as before
+(HTTPException in the analytics routes, the raw JSON in post_dynamic).
+
+Config (env):
+  META_ACCOUNT_CACHE_SIZE          users kept (default 1024)
+  META_ACCOUNT_CACHE_TTL_SECONDS   lifetime of an entry (default 900; 0 disables)
+"""
+import hashlib
+import os
+from typing import Callable, NamedTuple, Optional
+from uuid import UUID
+
+from app.ttl_cache import TTLCache
+
+GRAPH_API_URL = "https://graph.facebook.com/v24.0"
+
+META_ACCOUNT_CACHE_SIZE = int(os.getenv("META_ACCOUNT_CACHE_SIZE", "1024"))
+META_ACCOUNT_CACHE_TTL_SECONDS = float(os.getenv("META_ACCOUNT_CACHE_TTL_SECONDS", "900"))
+_cache = TTLCache(META_ACCOUNT_CACHE_SIZE, META_ACCOUNT_CACHE_TTL_SECONDS)
+
+
+class MetaAccount(NamedTuple):
+    page_id: str
+    page_name: Optional[str]
+    page_token: str
+    ig_user_id: Optional[str] = None  # None when the Page has no Instagram business account
+    ig_resolved: bool = False         # whether ig_user_id has been looked up
+    ig_error: Optional[dict] = None   # Graph's response when the lookup failed (never cached)
+
+
+def _key(user_uuid: UUID, session_token: Optional[str]) -> tuple:
+    return user_uuid, hashlib.sha256((session_token or "").encode("utf-8")).hexdigest()
+
+
+def _pages_request(session_token: Optional[str]) -> tuple:
+    return f"{GRAPH_API_URL}/me/accounts", {"access_token": session_token}
+
+
+def _ig_request(account: MetaAccount) -> tuple:
+    return f"{GRAPH_API_URL}/{account.page_id}", {
+        "fields": "instagram_business_account",
+        "access_token": account.page_token,
+    }
+
+
+def _store_page(key: tuple, page: dict) -> MetaAccount:
+    account = MetaAccount(page_id=page["id"], page_name=page.get("name"), page_token=page["access_token"])
+    _cache.set(key, account)
+    return account
+
+
+def _store_instagram(key: tuple, account: MetaAccount, ig_resp: dict) -> MetaAccount:
+    failed = "error" in ig_resp  # a failed lookup is not "no Instagram account"
+    account = account._replace(
+        ig_user_id=ig_resp.get("instagram_business_account", {}).get("id"),
+        ig_resolved=not failed,
+        ig_error=ig_resp if failed else None,
+    )
+    if account.ig_resolved:
+        _cache.set(key, account)
+    return account
+
+
+def resolve(user_uuid: UUID, session_token: Optional[str], graph_get: Callable,
+            instagram: bool = False) -> tuple:
+    """
+    (account, None) for the user's first Page, or (None, /me/accounts response) when
+    they manage no Page. With instagram=True account.ig_user_id is looked up too.
+    graph_get(url, params) returns the decoded Graph response.
+    """
+    key = _key(user_uuid, session_token)
+    account = _cache.get(key)
+    if account is None:
+        pages_resp = graph_get(*_pages_request(session_token))
+        if not pages_resp.get("data"):
+            return None, pages_resp
+        account = _store_page(key, pages_resp["data"][0])
+    if instagram and not account.ig_resolved:
+        account = _store_instagram(key, account, graph_get(*_ig_request(account)))
+    return account, None
+
+
+async def resolve_async(user_uuid: UUID, session_token: Optional[str], graph_get: Callable,
+                        instagram: bool = False) -> tuple:
+    """resolve() with an async graph_get."""
+    key = _key(user_uuid, session_token)
+    account = _cache.get(key)
+    if account is None:
+        pages_resp = await graph_get(*_pages_request(session_token))
+        if not pages_resp.get("data"):
+            return None, pages_resp
+        account = _store_page(key, pages_resp["data"][0])
+    if instagram and not account.ig_resolved:
+        account = _store_instagram(key, account, await graph_get(*_ig_request(account)))
+    return account, None
+
+
+def invalidate(user_uuid: Optional[UUID]) -> int:
+    """Drop the user's cached accounts (their session_token changed). Returns entries dropped."""
+    if user_uuid is None:
+        return 0
+    return _cache.invalidate(lambda key: key[0] == user_uuid)
@@ -0,0 +1,37 @@
+"""
+Migration: composite index on finance_data (user_id, date DESC, id DESC) for keyset
+pagination of /finance/data and /fraud/history (see app.pagination).
+Built CONCURRENTLY so inserts are not blocked on a large table.
+Run once from backend folder: python -m app.migrate_add_finance_data_keyset_index
+"""
+from sqlalchemy import text
+
+from app.database import engine
+
+
+def migrate():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        exists = conn.execute(
+            text("""
+                SELECT 1 FROM pg_indexes
+                WHERE schemaname = 'public'
+                  AND tablename = 'finance_data'
+                  AND indexname = 'ix_finance_data_user_date_id'
+            """)
+        ).fetchone()
+
+        if exists:
+            print("  Index 'ix_finance_data_user_date_id' already exists — skipping.")
+        else:
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY ix_finance_data_user_date_id
+                ON finance_data (user_id, date DESC, id DESC)
+            """))
+            conn.execute(text("ANALYZE finance_data"))
+            print("  Created index 'ix_finance_data_user_date_id'.")
+    print("finance_data keyset index migration complete.")
+
+
+if __name__ == "__main__":
+    migrate()
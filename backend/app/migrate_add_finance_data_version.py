@@ -0,0 +1,33 @@
+"""
+Migration: add data_version to user_transaction_stats (bumped on every insert, keys the forecast cache).
+Run once from backend folder: python -m app.migrate_add_finance_data_version
+"""
+from sqlalchemy import text
+
+from app.database import engine
+
+
+def migrate():
+    with engine.connect() as conn:
+        exists = conn.execute(
+            text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'public'
+                  AND table_name = 'user_transaction_stats'
+                  AND column_name = 'data_version'
+            """)
+        ).fetchone()
+
+        if exists:
+            print("  Column 'data_version' already exists — skipping.")
+        else:
+            conn.execute(text(
+                "ALTER TABLE user_transaction_stats ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0"
+            ))
+            print("  Added column 'data_version'.")
+        conn.commit()
+    print("data_version migration complete.")
+
+
+if __name__ == "__main__":
+    migrate()
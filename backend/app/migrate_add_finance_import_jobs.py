@@ -0,0 +1,56 @@
+"""
+Migration script to create the finance_import_jobs table for background CSV imports.
+Run once: python -m app.migrate_add_finance_import_jobs
+"""
+from app.database import engine
+from sqlalchemy import text
+
+
+def migrate():
+    with engine.connect() as conn:
+        exists = conn.execute(text("""
+            SELECT 1 FROM information_schema.tables
+            WHERE table_name = 'finance_import_jobs'
+        """)).fetchone()
+
+        if exists:
+            print("Table 'finance_import_jobs' already exists — skipping.")
+            return
+
+        conn.execute(text("""
+            CREATE TABLE finance_import_jobs (
+                id              SERIAL PRIMARY KEY,
+                user_id         UUID         NOT NULL,
+                filename        VARCHAR,
+                storage_path    VARCHAR,
+                status          VARCHAR(16)  NOT NULL DEFAULT 'queued',
+                rows_read       BIGINT       NOT NULL DEFAULT 0,
+                rows_inserted   BIGINT       NOT NULL DEFAULT 0,
+                rows_rejected   BIGINT       NOT NULL DEFAULT 0,
+                fraud_detected  BIGINT       NOT NULL DEFAULT 0,
+                error_count     INTEGER      NOT NULL DEFAULT 0,
+                errors          TEXT,
+                chunks          TEXT,
+                created_at      TIMESTAMP    DEFAULT NOW(),
+                started_at      TIMESTAMP,
+                finished_at     TIMESTAMP
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX ix_finance_import_jobs_id         ON finance_import_jobs(id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_finance_import_jobs_user_id    ON finance_import_jobs(user_id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_finance_import_jobs_status     ON finance_import_jobs(status)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_finance_import_jobs_created_at ON finance_import_jobs(created_at)"
+        ))
+        conn.commit()
+        print("Table 'finance_import_jobs' created successfully.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,32 @@
+"""
+Migration script to create the monthly rollup tables used by /finance/forecast
+(finance_monthly_rollups, finance_monthly_category_counts) and backfill them from finance_data.
+Run from backend folder: python -m app.migrate_add_finance_monthly_rollups
+
+Re-running it rebuilds the rollups for every user:  python -m app.migrate_add_finance_monthly_rollups
+Rebuild a single user:  python -m app.migrate_add_finance_monthly_rollups <user_uuid>
+"""
+import sys
+from uuid import UUID
+
+from app.database import engine, SessionLocal
+from app.finance_aggregates import rebuild_monthly_rollups
+from app.models import FinanceMonthlyCategoryCount, FinanceMonthlyRollup
+
+
+def migrate(user_uuid=None):
+    print("Creating monthly rollup tables if needed...")
+    FinanceMonthlyRollup.__table__.create(bind=engine, checkfirst=True)
+    FinanceMonthlyCategoryCount.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_monthly_rollups(db, user_uuid)
+        db.commit()
+        print(f"Rebuilt {rebuilt} monthly rollup row(s).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate(UUID(sys.argv[1]) if len(sys.argv) > 1 else None)
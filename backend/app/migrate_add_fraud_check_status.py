@@ -0,0 +1,41 @@
+"""
+Migration: add fraud_check_status to finance_data for asynchronous fraud scoring.
+Run once from backend folder: python -m app.migrate_add_fraud_check_status
+"""
+from sqlalchemy import text
+
+from app.database import engine
+
+
+def migrate():
+    with engine.connect() as conn:
+        exists = conn.execute(
+            text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'public'
+                  AND table_name = 'finance_data'
+                  AND column_name = 'fraud_check_status'
+            """)
+        ).fetchone()
+
+        if exists:
+            print("  Column 'fraud_check_status' already exists — skipping.")
+        else:
+            conn.execute(text("ALTER TABLE finance_data ADD COLUMN fraud_check_status VARCHAR(16)"))
+            # Rows scored before this migration
+            conn.execute(text(
+                "UPDATE finance_data SET fraud_check_status = 'scored' WHERE is_fraud IS NOT NULL"
+            ))
+            print("  Added column 'fraud_check_status'.")
+
+        # Partial index: the queue only ever looks up pending rows
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_finance_data_fraud_pending
+            ON finance_data (id) WHERE fraud_check_status = 'pending'
+        """))
+        conn.commit()
+    print("fraud_check_status migration complete.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,15 @@
+"""
+Migration script to create the social_post_snapshots table (app.social_snapshots).
+Run once: python -m app.migrate_add_social_post_snapshots
+"""
+from app.database import engine
+from app.models import SocialPostSnapshot
+
+
+def migrate():
+    SocialPostSnapshot.__table__.create(bind=engine, checkfirst=True)
+    print("Table 'social_post_snapshots' is ready.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,31 @@
+"""
+Migration script to create the user_transaction_stats table and backfill it from finance_data.
+Run from backend folder: python -m app.migrate_add_user_transaction_stats
+
+Re-running it rebuilds the aggregates for every user (e.g. after rows were
+deleted or edited outside the API):  python -m app.migrate_add_user_transaction_stats
+Rebuild a single user:  python -m app.migrate_add_user_transaction_stats <user_uuid>
+"""
+import sys
+from uuid import UUID
+
+from app.database import engine, SessionLocal
+from app.finance_aggregates import rebuild_user_transaction_stats
+from app.models import UserTransactionStats
+
+
+def migrate(user_uuid=None):
+    print("Creating 'user_transaction_stats' table if needed...")
+    UserTransactionStats.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_user_transaction_stats(db, user_uuid)
+        db.commit()
+        print(f"Rebuilt transaction stats for {rebuilt} user(s).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate(UUID(sys.argv[1]) if len(sys.argv) > 1 else None)
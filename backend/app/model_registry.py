@@ -0,0 +1,196 @@
+"""
+Registry of the pickled models in backend/models/ (fraud pipeline, Prophet forecast).
+
+Routes register their model file with a loader; start() (FastAPI lifespan) loads all of
+them in a background thread right after startup, so the first request after a deploy
+does not pay for unpickling (nor for importing the ML stack, see app.lazy_imports) while
+the rest of the API is already serving. It also schedules a poll that hot-swaps a model
+whose .pkl was replaced on disk.
+
+Each load reads the file once, records its sha256 and builds a new LoadedModel; the
+registry then swaps the entry in a single assignment. Requests that already hold the
+previous LoadedModel finish with it. A file that fails to load leaves the current model
+in place. Replace model files with an atomic rename (or let them settle: files modified
+less than MODEL_RELOAD_SETTLE_SECONDS ago are picked up by the next poll).
+
+Config (env):
+  MODEL_PRELOAD                  load registered models after startup (true)
+  MODEL_RELOAD_SECONDS           interval of the changed-file poll (60; 0 disables it)
+  MODEL_RELOAD_SETTLE_SECONDS    minimum age of a changed file before it is loaded (2)
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+MODEL_RELOAD_SECONDS = int(os.getenv("MODEL_RELOAD_SECONDS", "60"))
+MODEL_RELOAD_SETTLE_SECONDS = float(os.getenv("MODEL_RELOAD_SETTLE_SECONDS", "2"))
+
+
+class LoadedModel:
+    """One loaded model file; never mutated after creation."""
+
+    def __init__(self, name: str, model, metadata: dict, checksum: str, path: Path,
+                 mtime_ns: int, size: int):
+        self.name = name
+        self.model = model
+        self.metadata = metadata
+        self.checksum = checksum
+        # Metadata version if the training job wrote one, else the checksum prefix
+        self.version = str(metadata.get("version") or checksum[:12])
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.loaded_at = datetime.now()
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "path": str(self.path),
+            "version": self.version,
+            "sha256": self.checksum,
+            "size": self.size,
+            "loaded_at": self.loaded_at.isoformat(),
+        }
+
+
+class _Spec:
+    def __init__(self, path: Path, loader: Callable, metadata_path: Optional[Path]):
+        self.path = Path(path)
+        self.loader = loader  # file object -> model
+        self.metadata_path = Path(metadata_path) if metadata_path else None
+
+
+_specs: dict = {}   # name -> _Spec
+_models: dict = {}  # name -> LoadedModel
+_load_lock = threading.Lock()  # one load at a time; readers never take it
+
+
+def register(name: str, path, loader: Callable, metadata_path=None) -> None:
+    """Declare a model file. `loader` receives a binary file object (e.g. pickle.load, joblib.load)."""
+    _specs[name] = _Spec(path, loader, metadata_path)
+
+
+def _load(name: str) -> LoadedModel:
+    spec = _specs[name]
+    if not spec.path.exists():
+        raise FileNotFoundError(f"Model file not found at {spec.path}")
+
+    stat = spec.path.stat()
+    data = spec.path.read_bytes()
+    model = spec.loader(io.BytesIO(data))
+    metadata = {}
+    if spec.metadata_path is not None and spec.metadata_path.exists():
+        with open(spec.metadata_path, "r") as f:
+            metadata = json.load(f)
+
+    return LoadedModel(name, model, metadata, hashlib.sha256(data).hexdigest(), spec.path,
+                       stat.st_mtime_ns, len(data))
+
+
+def get(name: str, checksum: Optional[str] = None) -> LoadedModel:
+    """
+    Current model `name`, loaded on first use. With `checksum`, reload from disk if the
+    loaded file differs and the file changed since it was loaded (keeps forecast pool
+    processes in step with the API process). The result can still differ from
+    `checksum` (the file was replaced again): callers compare LoadedModel.checksum.
+    Raises FileNotFoundError or the loader's exception.
+    """
+    loaded = _models.get(name)
+    if loaded is not None and (checksum is None or loaded.checksum == checksum):
+        return loaded
+
+    with _load_lock:
+        loaded = _models.get(name)
+        if loaded is None or (checksum is not None and loaded.checksum != checksum and _file_changed(loaded)):
+            loaded = _load(name)
+            _models[name] = loaded
+            print(f"✅ Model '{name}' loaded from {loaded.path} (version {loaded.version})")
+        return loaded
+
+
+def _file_changed(loaded: LoadedModel) -> bool:
+    try:
+        stat = loaded.path.stat()
+    except FileNotFoundError:
+        return False  # keep serving the loaded model
+    return (stat.st_mtime_ns, stat.st_size) != (loaded.mtime_ns, loaded.size)
+
+
+def current(name: str) -> Optional[LoadedModel]:
+    """The loaded model `name`, or None if it has not been loaded (never loads)."""
+    return _models.get(name)
+
+
+def preload() -> None:
+    for name in list(_specs):
+        try:
+            get(name)
+        except Exception as e:
+            print(f"⚠️ Could not preload model '{name}': {e}")
+
+
+def reload_changed() -> list:
+    """Reload models whose file changed on disk; returns the names swapped."""
+    swapped = []
+    for name, spec in list(_specs.items()):
+        previous = _models.get(name)
+        if previous is None:
+            continue  # never loaded; get() loads it on first use
+        try:
+            stat = spec.path.stat()
+        except FileNotFoundError:
+            continue  # keep serving the loaded model
+        if (stat.st_mtime_ns, stat.st_size) == (previous.mtime_ns, previous.size):
+            continue
+        if time.time() - stat.st_mtime_ns / 1e9 < MODEL_RELOAD_SETTLE_SECONDS:
+            continue  # possibly still being written
+
+        with _load_lock:
+            try:
+                loaded = _load(name)
+            except Exception as e:
+                print(f"⚠️ Changed model file for '{name}' failed to load ({e}); keeping version {previous.version}")
+                continue
+            _models[name] = loaded
+        if loaded.checksum != previous.checksum:
+            swapped.append(name)
+            print(f"🔄 Model '{name}' reloaded: version {previous.version} -> {loaded.version}")
+    return swapped
+
+
+def status() -> list:
+    return [
+        _models[name].to_dict() if name in _models
+        else {"name": name, "path": str(spec.path), "version": None, "sha256": None}
+        for name, spec in _specs.items()
+    ]
+
+
+def start() -> None:
+    """Preload registered models in the background and schedule the changed-file poll."""
+    if MODEL_PRELOAD:
+        threading.Thread(target=preload, name="model-preload", daemon=True).start()
+    if MODEL_RELOAD_SECONDS > 0:
+        from app.scheduler_app import scheduler
+
+        scheduler.add_job(
+            reload_changed,
+            "interval",
+            seconds=MODEL_RELOAD_SECONDS,
+            id="model_registry_reload",
+            replace_existing=True,
+        )
+
+
+def stop() -> None:
+    from app.scheduler_app import scheduler
+
+    if scheduler.get_job("model_registry_reload"):
+        scheduler.remove_job("model_registry_reload")
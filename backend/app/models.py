@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Numeric, Text, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 from app.database import Base
@@ -42,8 +42,75 @@ class FinancialData(Base):
     # Fraud detection fields
     is_fraud = Column(Integer, nullable=True)  # 0 = legitimate, 1 = fraud, NULL = not checked
     fraud_probability = Column(Numeric(5, 4), nullable=True)  # Probability score (0.0000 to 1.0000)
+    fraud_check_status = Column(String(16), nullable=True)  # 'pending' (queued for async scoring), 'scored', 'failed'; NULL = not checked
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Keyset pagination of a user's rows, newest first (app.pagination)
+        Index("ix_finance_data_user_date_id", user_id, date.desc(), id.desc()),
+        Index(
+            "ix_finance_data_fraud_pending",
+            "id",
+            postgresql_where=text("fraud_check_status = 'pending'"),
+        ),
+    )
+
+
+class UserTransactionStats(Base):
+    """Running per-user aggregate of finance_data, maintained on insert (see app.finance_aggregates)."""
+    __tablename__ = "user_transaction_stats"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)  # References auth.users(id)
+    tx_count = Column(BigInteger, nullable=False, default=0)
+    amount_sum = Column(Numeric(20, 2), nullable=False, default=0)
+    amount_sum_sq = Column(Numeric, nullable=False, default=0)  # Unbounded: sum of squared amounts
+    last_tx_at = Column(DateTime, nullable=True)  # Latest finance_data.date for the user
+    data_version = Column(BigInteger, nullable=False, default=0, server_default="0")  # Bumped on every insert (forecast cache key)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class FinanceMonthlyRollup(Base):
+    """Per-user monthly expense totals, maintained on insert (app.finance_aggregates)"""
+    __tablename__ = "finance_monthly_rollups"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)  # References auth.users(id)
+    month = Column(Date, primary_key=True)  # First day of the month
+    amount_sum = Column(Numeric(20, 2), nullable=False, default=0)
+    tx_count = Column(BigInteger, nullable=False, default=0)
+    online_count = Column(BigInteger, nullable=False, default=0)  # use_chip == 'Online Transaction'
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class FinanceMonthlyCategoryCount(Base):
+    """Per-user monthly transaction count by category; distinct categories per month for the forecast"""
+    __tablename__ = "finance_monthly_category_counts"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)  # References auth.users(id)
+    month = Column(Date, primary_key=True)  # First day of the month
+    category = Column(String, primary_key=True)  # finance_data.category, 'Unknown' when missing
+    tx_count = Column(BigInteger, nullable=False, default=0)
+
+
+class FinanceImportJob(Base):
+    """Background CSV import started by POST /finance/data/upload with background=true"""
+    __tablename__ = "finance_import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), index=True, nullable=False)  # References auth.users(id)
+    filename = Column(String, nullable=True)  # Name of the uploaded file
+    storage_path = Column(String, nullable=True)  # Spooled copy of the upload, removed when the job ends
+    status = Column(String(16), nullable=False, default="queued", index=True)  # uploading, queued, running, completed, failed
+    rows_read = Column(BigInteger, nullable=False, default=0)
+    rows_inserted = Column(BigInteger, nullable=False, default=0)
+    rows_rejected = Column(BigInteger, nullable=False, default=0)
+    fraud_detected = Column(BigInteger, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=True)  # JSON list, first 10 error messages
+    chunks = Column(Text, nullable=True)  # JSON list of per-chunk counts and throughput
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 
 class Category(Base):
     __tablename__ = "categories"
@@ -71,3 +138,28 @@ class FraudDetection(Base):
     payment_code = Column(Integer, nullable=True)  # Payment method code
     mcc_simple = Column(Integer, nullable=True)  # Simplified MCC code
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SocialPostSnapshot(Base):
+    """Per-post Facebook/Instagram metrics per time bucket, written by app.social_snapshots"""
+    __tablename__ = "social_post_snapshots"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)  # References auth.users(id)
+    platform = Column(String(16), primary_key=True)  # facebook, instagram
+    post_id = Column(String, primary_key=True)  # Graph API post / media id
+    bucket = Column(DateTime, primary_key=True)  # Start of the time bucket (UTC)
+    account_id = Column(String, nullable=False)  # Facebook Page id / Instagram business account id
+    position = Column(Integer, nullable=False, default=0)  # Order in the Graph API listing (newest first)
+    collected_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # NULL when the metric could not be fetched (or does not exist on the platform)
+    likes = Column(BigInteger, nullable=True)
+    comments = Column(BigInteger, nullable=True)
+    shares = Column(BigInteger, nullable=True)
+    saved = Column(BigInteger, nullable=True)
+    reach = Column(BigInteger, nullable=True)
+    impressions = Column(BigInteger, nullable=True)
+    payload = Column(Text, nullable=True)  # JSON of the full post entry; kept on the newest bucket only
+
+    __table_args__ = (
+        Index("ix_social_post_snapshots_user_platform_bucket", user_id, platform, bucket.desc()),
+    )
@@ -0,0 +1,82 @@
+"""
+Keyset (cursor) pagination for the finance_data listings (/finance/data, /fraud/history).
+
+Rows are ordered by (date DESC, id DESC). A page ends with an opaque cursor encoding
+the (date, id) of its last row; the next page asks for rows strictly after it:
+
+    WHERE user_id = :user AND (date, id) < (:cursor_date, :cursor_id)
+    ORDER BY date DESC, id DESC LIMIT :limit + 1
+
+With the ix_finance_data_user_date_id index on (user_id, date DESC, id DESC) every
+page is an index range read of `limit` rows, however deep the page, whereas OFFSET
+reads and discards all earlier rows. The extra row tells whether there is a next page.
+
+Totals are optional: "exact" runs COUNT(*) (a scan of the user's matching rows),
+"estimate" asks the PostgreSQL planner (other databases fall back to an exact count),
+"none" skips it.
+
+Both listings run on the async session (app.database.get_async_db), so the helpers
+take a select() statement and an AsyncSession.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Select, desc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+TOTAL_MODES = ("exact", "estimate", "none")
+
+
+def encode_cursor(row_date: datetime, row_id: int) -> str:
+    raw = json.dumps([row_date.isoformat(), row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(date, id) from a cursor; ValueError if it was not produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        row_date, row_id = json.loads(raw)
+        return datetime.fromisoformat(row_date), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def keyset_page(db: AsyncSession, statement: Select, date_column, id_column, limit: int,
+                      cursor: Optional[str] = None, offset: int = 0):
+    """
+    One page of `statement` (a select of one ORM entity) ordered by (date DESC, id DESC),
+    starting after `cursor` (or, for legacy clients without a cursor, after `offset` rows).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    ValueError for a malformed cursor.
+    """
+    statement = statement.order_by(desc(date_column), desc(id_column))
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(date_column, id_column) < tuple_(cursor_date, cursor_id))
+    elif offset:
+        statement = statement.offset(offset)
+
+    rows = (await db.scalars(statement.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, date_column.key), getattr(last, id_column.key))
+
+
+async def count_rows(db: AsyncSession, statement: Select, mode: str) -> Optional[int]:
+    """Total rows of `statement` per TOTAL_MODES; None for "none"."""
+    if mode == "none":
+        return None
+    statement = statement.order_by(None)
+    if mode == "estimate" and db.bind.dialect.name == "postgresql":
+        compiled = statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+        connection = await db.connection()
+        plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return await db.scalar(select(func.count()).select_from(statement.subquery()))
@@ -1,35 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Category
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app import category_cache
 
 router = APIRouter()
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """True if an If-None-Match header value matches the current (strong) ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
 @router.get("/categories")
-def get_categories(
-    db: Session = Depends(get_db)
+async def get_categories(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all available expense categories.
     Returns list of categories with id, name, mcc_code, and description.
+    Served from the in-memory category cache; supports If-None-Match (304).
     """
     try:
-        categories = db.query(Category).order_by(Category.name).all()
-        
-        return {
-            "status": "success",
-            "count": len(categories),
-            "categories": [
-                {
-                    "id": cat.id,
-                    "name": cat.name,
-                    "mcc_code": cat.mcc_code,
-                    "description": cat.description
-                }
-                for cat in categories
-            ]
-        }
+        categories, etag = await category_cache.get_categories_async(db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching categories: {str(e)}")
 
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    response.headers.update(cache_headers)
+    return {
+        "status": "success",
+        "count": len(categories),
+        "categories": categories
+    }
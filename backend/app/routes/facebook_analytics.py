@@ -1,19 +1,29 @@
 from fastapi import Depends, APIRouter, HTTPException
 from sqlalchemy.orm import Session
+import json
 import requests
 from requests.exceptions import RequestException, Timeout
+from urllib.parse import urlencode
 from uuid import UUID as UUIDType
 
+from app import meta_accounts
 from app.database import get_db
 from app.models import User
 from app.auth import get_user_id_from_token
 
 router = APIRouter()
 
+GRAPH_API_URL = "https://graph.facebook.com/v24.0"
+# Graph API limit on sub-requests per batch call
+GRAPH_BATCH_MAX_REQUESTS = 50
 
-def _graph_get(url: str, params: dict, timeout: int = 30):
+# Keep-alive connections to graph.facebook.com across calls and requests
+_http = requests.Session()
+
+
+def _graph_request(method: str, url: str, timeout: int = 30, **kwargs):
     try:
-        response = requests.get(url, params=params, timeout=timeout)
+        response = _http.request(method, url, timeout=timeout, **kwargs)
         response.raise_for_status()
         return response.json()
     except Timeout:
@@ -21,6 +31,40 @@ def _graph_get(url: str, params: dict, timeout: int = 30):
     except RequestException as exc:
         raise HTTPException(status_code=502, detail=f"Facebook Graph API request failed: {exc}")
 
+
+def _graph_get(url: str, params: dict, timeout: int = 30):
+    return _graph_request("GET", url, timeout, params=params)
+
+
+def _graph_batch(relative_urls: list, access_token: str, timeout: int = 30) -> list:
+    """
+    GET each Graph API path (e.g. "<post_id>/likes?summary=total_count") through batch
+    requests, one POST per GRAPH_BATCH_MAX_REQUESTS paths, and return the decoded
+    bodies in order. A failed sub-request fails the call, like _graph_get.
+    """
+    bodies = []
+    for start in range(0, len(relative_urls), GRAPH_BATCH_MAX_REQUESTS):
+        chunk = relative_urls[start:start + GRAPH_BATCH_MAX_REQUESTS]
+        responses = _graph_request("POST", GRAPH_API_URL, timeout, data={
+            "access_token": access_token,
+            "batch": json.dumps([{"method": "GET", "relative_url": url} for url in chunk]),
+        })
+        for relative_url, item in zip(chunk, responses):
+            if item is None:  # Graph API gave up on this sub-request
+                raise HTTPException(status_code=504, detail=f"Facebook Graph API request timed out: {relative_url}")
+            try:
+                body = json.loads(item.get("body") or "{}")
+            except ValueError:
+                body = {}
+            if item.get("code") != 200:
+                error = body.get("error", {}).get("message") or f"HTTP {item.get('code')}"
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Facebook Graph API request failed: {relative_url}: {error}"
+                )
+            bodies.append(body)
+    return bodies
+
 @router.get("/facebook/page-analytics")
 def get_page_post_analytics(
     db: Session = Depends(get_db),
@@ -36,26 +80,22 @@ def get_page_post_analytics(
     if not user:
         return {"error": "User not found"}
 
-    user_token = user.session_token
+    return fetch_page_post_analytics(user_uuid, user.session_token)
 
-    # 2. Get pages managed by user
-    pages_resp = _graph_get(
-        "https://graph.facebook.com/v24.0/me/accounts",
-        params={"access_token": user_token}
-    )
 
-    if "data" not in pages_resp or not pages_resp["data"]:
+def fetch_page_post_analytics(user_uuid: UUIDType, session_token: str) -> dict:
+    """Steps 2-4 of GET /facebook/page-analytics; also used by the snapshot collector (app.social_snapshots)."""
+    # 2. First page the user manages and its token (cached per user, see app.meta_accounts)
+    account, pages_resp = meta_accounts.resolve(user_uuid, session_token, _graph_get)
+    if account is None:
         return {"error": "No managed pages found", "details": pages_resp}
 
-    # For simplicity, pick the first page (or you can filter by name/id)
-    page_info = pages_resp["data"][0]
-    page_id = page_info["id"]
-    page_token = page_info["access_token"]
-    #print(page_id,page_token)
+    page_id = account.page_id
+    page_token = account.page_token
 
     # 3. Get posts from the page
     posts_resp = _graph_get(
-        f"https://graph.facebook.com/v24.0/{page_id}/posts",
+        f"{GRAPH_API_URL}/{page_id}/posts",
         params={
             "fields": "id,message,created_time,full_picture,permalink_url",
             "access_token": page_token
@@ -65,52 +105,31 @@ def get_page_post_analytics(
     if "data" not in posts_resp:
         return {"error": "Failed to fetch posts", "details": posts_resp}
 
-    analytics = []
-
-    for post in posts_resp["data"]:
+    # 4. Likes, comments and shares of every post: three sub-requests per post, sent as
+    # Graph API batches instead of three round-trips per post
+    posts = posts_resp["data"]
+    edge_urls = []
+    for post in posts:
         post_id = post["id"]
-
-        # Likes
-        like_data = _graph_get(
-            f"https://graph.facebook.com/v24.0/{post_id}/likes",
-            params={"summary": "total_count", "access_token": page_token}
-        )
-    #     like_data = requests.get(
-    # f"https://graph.facebook.com/v24.0/{post_id}",
-    # params={
-    #     "fields": "reactions.summary(total_count)",
-    #     "access_token": page_token
-    # }
-    # ).json()
-        #print(like_data)
-        #likes_count = like_data.get("reactions", {}).get("summary", {}).get("total_count", 0)
-
-
-        # Comments
-        # comment_data = requests.get(
-        #     f"https://graph.facebook.com/v24.0/{post_id}/comments",
-        #     params={"summary": "total_count", "access_token": page_token}
-        # ).json()
-        comments_resp = _graph_get(
-            f"https://graph.facebook.com/v24.0/{post_id}/comments",
-            params={
+        edge_urls += [
+            f"{post_id}/likes?" + urlencode({"summary": "total_count"}),
+            f"{post_id}/comments?" + urlencode({
                 "fields": "id,from,message,created_time,like_count",
                 "summary": "total_count",
-                "access_token": page_token
-            }
-        )
+            }),
+            f"{post_id}/sharedposts?" + urlencode({"summary": "total_count"}),
+        ]
+    edge_data = _graph_batch(edge_urls, page_token)
+
+    analytics = []
+
+    for index, post in enumerate(posts):
+        like_data, comments_resp, share_data = edge_data[3 * index:3 * index + 3]
         total_comments = comments_resp.get("summary", {}).get("total_count", 0)
         comments_list = comments_resp.get("data", [])
 
-        
-        # Shares
-        share_data = _graph_get(
-            f"https://graph.facebook.com/v24.0/{post_id}/sharedposts",
-            params={"summary": "total_count", "access_token": page_token}
-        )
-
         analytics.append({
-            "post_id": post_id,
+            "post_id": post["id"],
             "message": post.get("message"),
             "created_time": post.get("created_time"),
             "likes": like_data.get("summary", {}).get("total_count", 0),
@@ -123,6 +142,6 @@ def get_page_post_analytics(
         })
 
     return {
-        "page": {"id": page_id, "name": page_info.get("name")},
+        "page": {"id": page_id, "name": account.page_name},
         "analytics": analytics
     }
@@ -1,21 +1,36 @@
+from __future__ import annotations
+
+import copy
+import importlib.util
 import os
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, extract
+from sqlalchemy import extract, select
 from datetime import datetime
 from typing import Optional
 from uuid import UUID as UUIDType
-import pandas as pd
-import io
 import pickle
-import json
+import time
 from pathlib import Path
-import numpy as np
 
-from app.database import get_db
-from app.models import FinancialData, User
+from app.database import get_async_db, get_db
+from app.models import FinancialData, FinanceImportJob, User
 from app.auth import get_user_id_from_token
-from app.routes.fraud_detection import check_transaction_for_fraud_internal
+from app.finance_aggregates import get_data_version, get_monthly_rollups, record_inserted_months, record_inserted_transactions
+from app.finance_bulk_insert import bulk_insert_finance_rows
+from app.finance_export import EXPORT_FORMATS, stream_finance_export
+from app import finance_import_jobs, forecast_pool, fraud_queue, mcc_frequency, model_registry
+from app.lazy_imports import lazy_import
+from app.pagination import TOTAL_MODES, count_rows, keyset_page
+from app.ttl_cache import TTLCache
+from app.routes.fraud_detection import check_transaction_for_fraud_internal, score_transactions_batch
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 router = APIRouter()
 
@@ -24,35 +39,29 @@ MODELS_DIR = Path(__file__).parent.parent.parent / "models"
 MODEL_PATH = MODELS_DIR / "prophet_finance_model_latest.pkl"
 METADATA_PATH = MODELS_DIR / "model_metadata_latest.json"
 
-# Global model cache
-_loaded_model = None
-_model_metadata = None
+FORECAST_MODEL = "forecast"
+model_registry.register(FORECAST_MODEL, MODEL_PATH, pickle.load, metadata_path=METADATA_PATH)
 
-def load_model():
-    """Load the pre-trained Prophet model"""
-    global _loaded_model, _model_metadata
-    
-    if _loaded_model is not None:
-        return _loaded_model, _model_metadata
-    
-    if not MODEL_PATH.exists():
+# Forecast engine: "prophet" (Prophet.predict) or "numpy" (app.forecast_engine, compiled once per model)
+FORECAST_ENGINES = ("prophet", "numpy")
+FORECAST_ENGINE = os.getenv("FORECAST_ENGINE", "prophet").lower()
+_compiled_model = None
+_compiled_model_checksum = None
+
+# Forecast responses by (user, days, engine, model checksum, user data version)
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "512"))
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv("FORECAST_CACHE_TTL_SECONDS", "900"))
+_forecast_cache = TTLCache(FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL_SECONDS)
+
+def _get_forecast_model(checksum: Optional[str] = None) -> model_registry.LoadedModel:
+    """The registry entry of the Prophet model: model, metadata, version and checksum together."""
+    try:
+        return model_registry.get(FORECAST_MODEL, checksum)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=404,
             detail=f"Model file not found at {MODEL_PATH}"
         )
-    
-    try:
-        with open(MODEL_PATH, 'rb') as f:
-            _loaded_model = pickle.load(f)
-        
-        if METADATA_PATH.exists():
-            with open(METADATA_PATH, 'r') as f:
-                _model_metadata = json.load(f)
-        else:
-            _model_metadata = {}
-        
-        print(f"✅ Model loaded from {MODEL_PATH}")
-        return _loaded_model, _model_metadata
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -60,6 +69,33 @@ def load_model():
         )
 
 
+def load_model():
+    """The pre-trained Prophet model and its metadata (preloaded and hot-reloaded by app.model_registry)"""
+    loaded = _get_forecast_model()
+    return loaded.model, loaded.metadata
+
+
+def get_compiled_model(loaded: model_registry.LoadedModel):
+    """
+    NumPy evaluator for the loaded Prophet model, compiled once per model file.
+    Returns None (use Prophet) if the model uses features the engine does not support.
+    """
+    global _compiled_model, _compiled_model_checksum
+    compiled = _compiled_model
+    if compiled is not None and _compiled_model_checksum == loaded.checksum:
+        return compiled
+    from app.forecast_engine import compile_prophet
+
+    try:
+        compiled = compile_prophet(loaded.model)
+    except ValueError as e:
+        print(f"⚠️ NumPy forecast engine unavailable for this model ({e}); using Prophet")
+        return None
+    _compiled_model, _compiled_model_checksum = compiled, loaded.checksum
+    print(f"✅ Compiled forecast model version {loaded.version} for the NumPy engine")
+    return compiled
+
+
 def _heuristic_forecast_like_prophet(prophet_df: pd.DataFrame, future_with_ds: pd.DataFrame) -> pd.DataFrame:
     """When Prophet.predict or a fresh Prophet fit fails (e.g. CmdStan on Windows), return a
     minimal DataFrame with ds, yhat, yhat_lower, yhat_upper for the same downstream logic."""
@@ -89,19 +125,134 @@ def _heuristic_forecast_like_prophet(prophet_df: pd.DataFrame, future_with_ds: p
     return pd.DataFrame(rows)
 
 
+VALID_USE_CHIP = ["Swipe Transaction", "Chip Transaction", "Online Transaction"]
+
+
+def _clean_category(category) -> Optional[str]:
+    """Strip a CSV category value; empty or missing values become None."""
+    if category and pd.notna(category):
+        category = str(category).strip()
+        return category if category != '' else None
+    return None
+
+
+def _clean_use_chip(use_chip) -> Optional[str]:
+    """Strip a CSV use_chip value; anything outside VALID_USE_CHIP becomes None."""
+    if use_chip and pd.notna(use_chip):
+        use_chip = str(use_chip).strip()
+        return use_chip if use_chip in VALID_USE_CHIP else None
+    return None
+
+
+def _clean_optional_column(values: pd.Series, cleaner) -> pd.Series:
+    """Apply `cleaner` to a CSV column, keeping None (not NaN) for missing values."""
+    cleaned = values.map(cleaner).astype(object)
+    return cleaned.where(cleaned.notna(), None)
+
+
+# CSV import: rows per chunk, columns read from the file, NUMERIC(15, 2) limit
+CSV_CHUNK_SIZE = 10000
+CSV_COLUMNS = ['date', 'amount', 'category', 'use_chip']
+MAX_AMOUNT = 999999999999999.99
+
+
+def _read_csv_columns(stream) -> list:
+    """Read only the header line of a CSV stream and rewind it."""
+    columns = list(pd.read_csv(stream, nrows=0).columns)
+    stream.seek(0)
+    return columns
+
+
+def _iter_csv_chunks(stream, chunk_size: int):
+    """
+    Yield raw DataFrame chunks straight from a (spooled) file object. Only the columns
+    the import uses are parsed, and only one chunk is held in memory at a time.
+    """
+    reader = pd.read_csv(
+        stream,
+        chunksize=chunk_size,
+        usecols=lambda column: column in CSV_COLUMNS,
+        dtype={'amount': str, 'category': object, 'use_chip': object},
+    )
+    with reader:
+        yield from reader
+
+
+def _clean_csv_chunk(chunk_df: pd.DataFrame, chunk_num: int, has_category: bool,
+                     has_use_chip: bool, errors: list) -> Optional[pd.DataFrame]:
+    """
+    Parse and validate one CSV chunk. Returns the cleaned chunk (absolute amounts,
+    cleaned category/use_chip, transaction_type) or None if no valid rows are left.
+    """
+    # All entries are expenses
+    chunk_df['transaction_type'] = 'expense'
+
+    # Clean and process data
+    chunk_df['amount'] = chunk_df['amount'].astype(str).str.replace('$', '', regex=False)
+    chunk_df['amount'] = pd.to_numeric(chunk_df['amount'], errors='coerce')
+    chunk_df['date'] = pd.to_datetime(chunk_df['date'], errors='coerce')
+
+    # Remove rows with invalid data
+    before_dropna = len(chunk_df)
+    chunk_df = chunk_df.dropna(subset=['date', 'amount'])
+    after_dropna = len(chunk_df)
+
+    if before_dropna != after_dropna and chunk_num == 1:
+        print(f"Chunk {chunk_num}: Dropped {before_dropna - after_dropna} rows with invalid date/amount")
+
+    if chunk_df.empty:
+        if chunk_num == 1:
+            print(f"Chunk {chunk_num}: Empty after dropna - check your CSV format")
+        return None
+
+    # Validate amounts
+    invalid_amounts = chunk_df[chunk_df['amount'].abs() > MAX_AMOUNT]
+    if not invalid_amounts.empty:
+        errors.append(f"Chunk {chunk_num}: Found {len(invalid_amounts)} rows with amounts exceeding maximum")
+        chunk_df = chunk_df[chunk_df['amount'].abs() <= MAX_AMOUNT]
+
+    # Remove rows with zero amounts
+    before_zero_filter = len(chunk_df)
+    chunk_df = chunk_df[chunk_df['amount'].abs() > 0].copy()
+    after_zero_filter = len(chunk_df)
+
+    if before_zero_filter != after_zero_filter and chunk_num == 1:
+        print(f"Chunk {chunk_num}: Dropped {before_zero_filter - after_zero_filter} rows with zero amounts")
+
+    if chunk_df.empty:
+        if chunk_num == 1:
+            print(f"Chunk {chunk_num}: Empty after filtering - all rows were invalid")
+        return None
+
+    # Clean optional fields once for the whole chunk
+    chunk_df['category'] = (
+        _clean_optional_column(chunk_df['category'], _clean_category)
+        if has_category else None
+    )
+    chunk_df['use_chip'] = (
+        _clean_optional_column(chunk_df['use_chip'], _clean_use_chip)
+        if has_use_chip else None
+    )
+    chunk_df['amount'] = chunk_df['amount'].abs()
+    return chunk_df
+
+
 @router.post("/finance/data")
 def add_financial_data(
     date: str = Form(...),  # Format: "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS"
     amount: float = Form(...),
     category: Optional[str] = Form(None),  # Expense category
     use_chip: Optional[str] = Form(None),  # "Swipe Transaction" or "Online Transaction"
+    async_fraud_check: Optional[bool] = Form(None),  # Defaults to ASYNC_FRAUD_SCORING env
     db: Session = Depends(get_db),
     user_id: str = Depends(get_user_id_from_token)
 ):
     """
     Manually add a single expense entry.
     Required: date, amount
-    Optional: category, use_chip
+    Optional: category, use_chip, async_fraud_check
+    With async_fraud_check the entry is stored right away with fraud_status "pending"
+    and scored in the background (see GET /fraud/pending).
     """
     try:
         user_uuid = UUIDType(user_id)
@@ -157,21 +308,27 @@ def add_financial_data(
             detail=f"use_chip must be one of: {', '.join(valid_use_chip)}"
         )
 
-    # Automatically check for fraud before creating entry
+    # Automatically check for fraud before creating entry, or defer it to the scoring queue
     is_fraud = None
     fraud_probability = None
-    try:
-        is_fraud, fraud_probability = check_transaction_for_fraud_internal(
-            amount=abs(amount),
-            transaction_date=parsed_date,
-            use_chip=use_chip,
-            category=category,
-            user_uuid=user_uuid,
-            db=db
-        )
-    except Exception as e:
-        # If fraud check fails, continue anyway (don't fail the transaction)
-        print(f"Error checking transaction for fraud: {str(e)}")
+    if async_fraud_check is None:
+        async_fraud_check = fraud_queue.ASYNC_FRAUD_SCORING
+    if async_fraud_check and fraud_queue.is_running():
+        fraud_status = fraud_queue.STATUS_PENDING
+    else:
+        fraud_status = fraud_queue.STATUS_SCORED
+        try:
+            is_fraud, fraud_probability = check_transaction_for_fraud_internal(
+                amount=abs(amount),
+                transaction_date=parsed_date,
+                use_chip=use_chip,
+                category=category,
+                user_uuid=user_uuid,
+                db=db
+            )
+        except Exception as e:
+            # If fraud check fails, continue anyway (don't fail the transaction)
+            print(f"Error checking transaction for fraud: {str(e)}")
 
     # Create financial data entry with fraud detection results
     financial_entry = FinancialData(
@@ -182,15 +339,26 @@ def add_financial_data(
         use_chip=use_chip,
         transaction_type='expense',
         is_fraud=is_fraud,
-        fraud_probability=fraud_probability
+        fraud_probability=fraud_probability,
+        fraud_check_status=fraud_status
     )
 
     db.add(financial_entry)
+    db.flush()
+    record_inserted_transactions(db, user_uuid, [financial_entry.amount], financial_entry.date)
+    record_inserted_months(
+        db, user_uuid,
+        [financial_entry.date], [financial_entry.amount],
+        [financial_entry.category], [financial_entry.use_chip]
+    )
     db.commit()
     db.refresh(financial_entry)
+    mcc_frequency.record_inserted_categories([financial_entry.category])
+    if fraud_status == fraud_queue.STATUS_PENDING:
+        fraud_queue.enqueue(financial_entry.id)
 
-    # Determine fraud risk level
-    fraud_risk = "low"
+    # Determine fraud risk level (unknown until a pending entry is scored)
+    fraud_risk = None if fraud_status == fraud_queue.STATUS_PENDING else "low"
     if fraud_probability is not None:
         if fraud_probability > 0.7:
             fraud_risk = "high"
@@ -208,14 +376,163 @@ def add_financial_data(
             "use_chip": financial_entry.use_chip,
             "is_fraud": is_fraud,
             "fraud_probability": fraud_probability,
-            "fraud_risk": fraud_risk
+            "fraud_risk": fraud_risk,
+            "fraud_status": fraud_status
         }
     }
 
 
+def _import_csv_chunk(db: Session, chunk_df: pd.DataFrame, chunk_num: int, user_uuid: UUIDType,
+                      has_category: bool, has_use_chip: bool, skip_fraud_check: bool,
+                      errors: list) -> tuple:
+    """
+    Clean, fraud-score and insert one CSV chunk, committing it on success.
+    Returns (rows inserted, rows flagged as fraud); failures are appended to `errors`.
+    """
+    try:
+        chunk_df = _clean_csv_chunk(chunk_df, chunk_num, has_category, has_use_chip, errors)
+        if chunk_df is None:
+            return 0, 0
+
+        # Fraud detection: one batched model call per chunk
+        chunk_df['user_id'] = user_uuid
+        chunk_df['is_fraud'] = None
+        chunk_df['fraud_probability'] = None
+        chunk_df['fraud_check_status'] = None
+        chunk_fraud_count = 0
+        if not skip_fraud_check:
+            chunk_df['fraud_check_status'] = fraud_queue.STATUS_SCORED
+            try:
+                flags, probabilities = score_transactions_batch(chunk_df, user_uuid, db)
+                chunk_df['is_fraud'] = flags
+                chunk_df['fraud_probability'] = probabilities
+                chunk_fraud_count = int(flags.sum())
+            except Exception as e:
+                # Same fallback as check_transaction_for_fraud_internal: store the rows as not fraud
+                chunk_df['is_fraud'] = 0
+                chunk_df['fraud_probability'] = 0.0
+                errors.append(f"Chunk {chunk_num}: fraud check failed, rows stored as not fraud: {str(e)}")
+                print(f"Error checking chunk {chunk_num} for fraud: {str(e)}")
+
+        # Stream the cleaned chunk into finance_data (COPY / multi-row INSERT)
+        try:
+            chunk_added = bulk_insert_finance_rows(db, chunk_df)
+            record_inserted_transactions(
+                db, user_uuid,
+                chunk_df['amount'],
+                chunk_df['date'].max().to_pydatetime()
+            )
+            record_inserted_months(
+                db, user_uuid,
+                chunk_df['date'], chunk_df['amount'],
+                chunk_df['category'], chunk_df['use_chip']
+            )
+        except Exception as e:
+            db.rollback()
+            errors.append(f"Chunk {chunk_num}: insert failed: {str(e)}")
+            print(f"Error inserting chunk {chunk_num}: {str(e)}")
+            return 0, 0
+
+        if chunk_num == 1:
+            print(f"✓ Chunk {chunk_num}: Inserted {chunk_added} entries from {len(chunk_df)} rows")
+
+        # Commit after each chunk to avoid huge transactions
+        try:
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            errors.append(f"Chunk {chunk_num} commit failed: {str(e)}")
+            print(f"Error committing chunk {chunk_num}: {str(e)}")
+            return 0, 0
+
+        mcc_frequency.record_inserted_categories(chunk_df['category'])
+        return chunk_added, chunk_fraud_count
+
+    except Exception as e:
+        db.rollback()
+        errors.append(f"Chunk {chunk_num}: {str(e)}")
+        print(f"Error processing chunk {chunk_num}: {str(e)}")
+        return 0, 0
+
+
+def import_csv_stream(db: Session, stream, user_uuid: UUIDType, on_chunk=None) -> dict:
+    """
+    Import an expense CSV from a readable binary stream, one committed chunk at a time.
+    The header must already have been validated (date and amount columns present).
+    `on_chunk(stats, errors)` is called after every chunk with that chunk's row counts
+    and throughput plus the errors so far; background import jobs use it for progress.
+    Returns the totals reported by POST /finance/data/upload.
+    """
+    columns = _read_csv_columns(stream)
+
+    # Optional columns: category, use_chip
+    has_category = 'category' in columns
+    has_use_chip = 'use_chip' in columns
+
+    # Process in chunks
+    added_count = 0
+    fraud_detected_count = 0
+    errors = []
+    total_rows_read = 0
+
+    # Fraud detection is enabled by default; toggle via env var for large imports
+    skip_fraud_check = os.getenv("SKIP_CSV_FRAUD_CHECK", "false").lower() == "true"
+
+    print(f"Processing CSV in chunks of {CSV_CHUNK_SIZE} rows...")
+
+    chunk_started = time.perf_counter()
+    for chunk_num, chunk_df in enumerate(_iter_csv_chunks(stream, CSV_CHUNK_SIZE), 1):
+        rows_read = len(chunk_df)
+        total_rows_read += rows_read
+        chunk_added, chunk_fraud_count = _import_csv_chunk(
+            db, chunk_df, chunk_num, user_uuid, has_category, has_use_chip, skip_fraud_check, errors
+        )
+        added_count += chunk_added
+        fraud_detected_count += chunk_fraud_count
+
+        if chunk_num % 10 == 0:
+            print(f"Processed {chunk_num} chunks ({total_rows_read:,} rows, {added_count:,} inserted)...")
+
+        if on_chunk is not None:
+            now = time.perf_counter()
+            seconds = now - chunk_started
+            chunk_started = now
+            on_chunk({
+                "chunk": chunk_num,
+                "rows_read": rows_read,
+                "rows_inserted": chunk_added,
+                "rows_rejected": rows_read - chunk_added,
+                "fraud_detected": chunk_fraud_count,
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(rows_read / seconds, 1) if seconds > 0 else None,
+            }, errors)
+
+    print(f"\n📊 Upload Summary:")
+    print(f"   Total rows read: {total_rows_read:,}")
+    print(f"   Total rows inserted: {added_count:,}")
+    print(f"   Errors: {len(errors)}")
+
+    if added_count == 0 and total_rows_read > 0:
+        print(f"\n⚠️ WARNING: Read {total_rows_read:,} rows but inserted 0!")
+        print(f"   This usually means all rows were filtered out.")
+        print(f"   Check: date format, amount format, or data validation")
+        if errors:
+            print(f"   First few errors: {errors[:5]}")
+
+    return {
+        "added_count": added_count,
+        "total_rows_read": total_rows_read,
+        "total_rows_processed": added_count,
+        "fraud_detected": fraud_detected_count,
+        "errors": errors[:10] if errors else None,  # Limit errors in response
+        "error_count": len(errors)
+    }
+
+
 @router.post("/finance/data/upload")
 def upload_financial_data_csv(
     file: UploadFile = File(...),
+    background: Optional[bool] = Form(None),  # Defaults to FINANCE_IMPORT_BACKGROUND env
     db: Session = Depends(get_db),
     user_id: str = Depends(get_user_id_from_token)
 ):
@@ -223,6 +540,8 @@ def upload_financial_data_csv(
     Upload expense data from a CSV file.
     CSV should have columns: date, amount
     All entries will be treated as expenses.
+    With background=true the file is stored and imported by a worker; the response
+    (202) carries a job id to poll at GET /finance/imports/{job_id}.
     """
     try:
         user_uuid = UUIDType(user_id)
@@ -247,228 +566,39 @@ def upload_financial_data_csv(
         raise HTTPException(status_code=400, detail="File must be a CSV file")
 
     try:
-        # Process CSV in chunks to handle large files efficiently
-        CHUNK_SIZE = 10000  # Process 10k rows at a time
-        BATCH_SIZE = 1000   # Insert 1k rows per database batch
-        
-        # Read the file content into memory first (for FastAPI UploadFile)
-        # FastAPI's UploadFile might not support seek() properly
-        file_content = file.file.read()
-        file.file.seek(0)  # Try to reset anyway
-        
-        # Validate columns by reading first line
-        import io
-        file_stream = io.BytesIO(file_content)
-        first_chunk = pd.read_csv(file_stream, nrows=1)
-        
+        # Validate the header only; the body is streamed from the spooled upload
+        columns = _read_csv_columns(file.file)
+
         # Validate required columns
-        if 'date' not in first_chunk.columns or 'amount' not in first_chunk.columns:
+        if 'date' not in columns or 'amount' not in columns:
             raise HTTPException(
                 status_code=400, 
-                detail=f"CSV must contain 'date' and 'amount' columns. Found columns: {list(first_chunk.columns)}"
+                detail=f"CSV must contain 'date' and 'amount' columns. Found columns: {columns}"
             )
-        
-        # Optional columns: category, use_chip
-        has_category = 'category' in first_chunk.columns
-        has_use_chip = 'use_chip' in first_chunk.columns
-        
-        # Create a new stream for chunked reading
-        file_stream = io.BytesIO(file_content)
-        
-        # Process in chunks
-        added_count = 0
-        fraud_detected_count = 0
-        errors = []
-        total_rows_processed = 0
-        total_rows_read = 0
-        max_amount = 999999999999999.99
-        
-        # Fraud detection is enabled by default; toggle via env var for large imports
-        skip_fraud_check = os.getenv("SKIP_CSV_FRAUD_CHECK", "false").lower() == "true"
-        
-        print(f"Processing CSV in chunks of {CHUNK_SIZE} rows...")
-        
-        for chunk_num, chunk_df in enumerate(pd.read_csv(file_stream, chunksize=CHUNK_SIZE), 1):
-            try:
-                total_rows_read += len(chunk_df)
-                
-                # All entries are expenses
-                chunk_df['transaction_type'] = 'expense'
-                
-                # Clean and process data
-                initial_count = len(chunk_df)
-                chunk_df['amount'] = chunk_df['amount'].astype(str).str.replace('$', '', regex=False)
-                chunk_df['amount'] = pd.to_numeric(chunk_df['amount'], errors='coerce')
-                chunk_df['date'] = pd.to_datetime(chunk_df['date'], errors='coerce')
-                
-                # Remove rows with invalid data
-                before_dropna = len(chunk_df)
-                chunk_df = chunk_df.dropna(subset=['date', 'amount'])
-                after_dropna = len(chunk_df)
-                
-                if before_dropna != after_dropna and chunk_num == 1:
-                    print(f"Chunk {chunk_num}: Dropped {before_dropna - after_dropna} rows with invalid date/amount")
-                
-                if chunk_df.empty:
-                    if chunk_num == 1:
-                        print(f"Chunk {chunk_num}: Empty after dropna - check your CSV format")
-                    continue
-                
-                # Validate amounts
-                invalid_amounts = chunk_df[chunk_df['amount'].abs() > max_amount]
-                if not invalid_amounts.empty:
-                    errors.append(f"Chunk {chunk_num}: Found {len(invalid_amounts)} rows with amounts exceeding maximum")
-                    chunk_df = chunk_df[chunk_df['amount'].abs() <= max_amount]
-                
-                # Remove rows with zero amounts
-                before_zero_filter = len(chunk_df)
-                chunk_df = chunk_df[chunk_df['amount'].abs() > 0]
-                after_zero_filter = len(chunk_df)
-                
-                if before_zero_filter != after_zero_filter and chunk_num == 1:
-                    print(f"Chunk {chunk_num}: Dropped {before_zero_filter - after_zero_filter} rows with zero amounts")
-                
-                if chunk_df.empty:
-                    if chunk_num == 1:
-                        print(f"Chunk {chunk_num}: Empty after filtering - all rows were invalid")
-                    continue
-                
-                # Prepare bulk insert data
-                financial_entries = []
-                
-                for idx, row in chunk_df.iterrows():
-                    try:
-                        transaction_date = row['date'].to_pydatetime()
-                        transaction_amount = abs(float(row['amount']))
-                        
-                        # Get optional fields
-                        category = row.get('category') if has_category else None
-                        use_chip = row.get('use_chip') if has_use_chip else None
-                        
-                        # Clean category and use_chip
-                        if category and pd.notna(category):
-                            category = str(category).strip()
-                            if category == '':
-                                category = None
-                        else:
-                            category = None
-                        
-                        if use_chip and pd.notna(use_chip):
-                            use_chip = str(use_chip).strip()
-                            if use_chip not in ["Swipe Transaction", "Chip Transaction", "Online Transaction"]:
-                                use_chip = None
-                        else:
-                            use_chip = None
-                        
-                        # Fraud detection (optional, can be slow for large files)
-                        is_fraud = None
-                        fraud_probability = None
-                        if not skip_fraud_check:
-                            try:
-                                is_fraud, fraud_probability = check_transaction_for_fraud_internal(
-                                    amount=transaction_amount,
-                                    transaction_date=transaction_date,
-                                    use_chip=use_chip,
-                                    category=category,
-                                    user_uuid=user_uuid,
-                                    db=db
-                                )
-                                
-                                if is_fraud == 1:
-                                    fraud_detected_count += 1
-                            except Exception as e:
-                                print(f"Error checking transaction for fraud: {str(e)}")
-                        
-                        # Create financial entry with fraud detection results
-                        financial_entry = FinancialData(
-                            user_id=user_uuid,
-                            date=transaction_date,
-                            amount=transaction_amount,
-                            category=category,
-                            use_chip=use_chip,
-                            transaction_type='expense',
-                            is_fraud=is_fraud,
-                            fraud_probability=fraud_probability
-                        )
-                        financial_entries.append(financial_entry)
-                        
-                    except Exception as e:
-                        errors.append(f"Chunk {chunk_num}, Row {idx}: {str(e)}")
-                
-                # Only proceed if we have entries to insert
-                if not financial_entries:
-                    if chunk_num == 1:
-                        print(f"⚠️ Chunk {chunk_num}: No valid entries created after processing {len(chunk_df)} rows")
-                        print(f"   Sample row: {chunk_df.iloc[0].to_dict() if len(chunk_df) > 0 else 'N/A'}")
-                    elif chunk_num % 10 == 0:
-                        print(f"Chunk {chunk_num}: No valid entries after filtering")
-                    continue
-                
-                if chunk_num == 1:
-                    print(f"✓ Chunk {chunk_num}: Created {len(financial_entries)} entries from {len(chunk_df)} rows")
-                
-                # Bulk insert financial entries in batches
-                chunk_added = 0
-                for i in range(0, len(financial_entries), BATCH_SIZE):
-                    batch = financial_entries[i:i + BATCH_SIZE]
-                    try:
-                        for entry in batch:
-                            db.add(entry)
-                        db.flush()  # Flush to get IDs
-                        chunk_added += len(batch)
-                    except Exception as e:
-                        db.rollback()
-                        errors.append(f"Chunk {chunk_num}, Batch {i//BATCH_SIZE + 1}: {str(e)}")
-                        print(f"Error inserting batch in chunk {chunk_num}: {str(e)}")
-                        # Continue with next batch
-                        continue
-                
-                # Commit after each chunk to avoid huge transactions
-                try:
-                    db.commit()
-                    added_count += chunk_added
-                    total_rows_processed += len(chunk_df)
-                    
-                    if chunk_num % 10 == 0:
-                        print(f"Processed {chunk_num} chunks ({total_rows_processed:,} rows, {added_count:,} inserted)...")
-                except Exception as e:
-                    db.rollback()
-                    errors.append(f"Chunk {chunk_num} commit failed: {str(e)}")
-                    print(f"Error committing chunk {chunk_num}: {str(e)}")
-                    # Continue with next chunk
-                    continue
-                
-            except Exception as e:
-                db.rollback()
-                errors.append(f"Chunk {chunk_num}: {str(e)}")
-                print(f"Error processing chunk {chunk_num}: {str(e)}")
-                # Continue with next chunk
-                continue
-
-        print(f"\n📊 Upload Summary:")
-        print(f"   Total rows read: {total_rows_read:,}")
-        print(f"   Total rows processed: {total_rows_processed:,}")
-        print(f"   Total rows inserted: {added_count:,}")
-        print(f"   Errors: {len(errors)}")
-        
-        if added_count == 0 and total_rows_read > 0:
-            print(f"\n⚠️ WARNING: Read {total_rows_read:,} rows but inserted 0!")
-            print(f"   This usually means all rows were filtered out.")
-            print(f"   Check: date format, amount format, or data validation")
-            if errors:
-                print(f"   First few errors: {errors[:5]}")
-        
+
+        if background is None:
+            background = finance_import_jobs.FINANCE_IMPORT_BACKGROUND
+        if background and finance_import_jobs.is_running():
+            job = finance_import_jobs.submit(db, user_uuid, file.filename, file.file)
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "status": "accepted",
+                    "message": "CSV import queued",
+                    "job_id": job.id,
+                    "status_url": f"/finance/imports/{job.id}"
+                }
+            )
+
+        result = import_csv_stream(db, file.file, user_uuid)
         return {
             "status": "success",
-            "message": f"Successfully added {added_count} financial data entries",
-            "added_count": added_count,
-            "total_rows_read": total_rows_read,
-            "total_rows_processed": total_rows_processed,
-            "fraud_detected": fraud_detected_count,
-            "errors": errors[:10] if errors else None,  # Limit errors in response
-            "error_count": len(errors)
+            "message": f"Successfully added {result['added_count']} financial data entries",
+            **result
         }
 
+    except HTTPException:
+        raise
     except pd.errors.EmptyDataError:
         raise HTTPException(status_code=400, detail="CSV file is empty")
     except Exception as e:
@@ -476,37 +606,76 @@ def upload_financial_data_csv(
         raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
 
 
+@router.get("/finance/imports/{job_id}")
+def get_import_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    Progress of a background CSV import: status, rows read / inserted / rejected,
+    rows flagged as fraud, overall and per-chunk throughput.
+    """
+    try:
+        user_uuid = UUIDType(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
+
+    job = db.query(FinanceImportJob).filter(
+        FinanceImportJob.id == job_id,
+        FinanceImportJob.user_id == user_uuid
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    return {
+        "status": "success",
+        "data": finance_import_jobs.job_to_dict(job)
+    }
+
+
 @router.get("/finance/data")
-def get_financial_data(
+async def get_financial_data(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     month: Optional[int] = None,
     year: Optional[int] = None,
     limit: int = 100,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,  # "exact", "estimate" or "none"
+    db: AsyncSession = Depends(get_async_db),
     user_id: str = Depends(get_user_id_from_token)
 ):
     """
-    Get financial data for the authenticated user.
+    Get financial data for the authenticated user, newest first.
     Optional filters: 
     - start_date, end_date (format: YYYY-MM-DD)
     - month (1-12), year (YYYY) - filter by specific month/year
+    Pagination: pass the returned next_cursor as `cursor` for the next page (offset
+    still works but deep offsets get slower). total_count is exact on the first page
+    and omitted on cursor pages unless `total` asks for it (see app.pagination).
     """
     try:
         user_uuid = UUIDType(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
 
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+    total_mode = total or ("none" if cursor else "exact")
+    if total_mode not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail=f"total must be one of: {', '.join(TOTAL_MODES)}")
+
     # Query financial data for user
-    query = db.query(FinancialData).filter(FinancialData.user_id == user_uuid)
+    query = select(FinancialData).where(FinancialData.user_id == user_uuid)
 
     # Apply month/year filter if provided
     if month is not None and year is not None:
         if month < 1 or month > 12:
             raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
         # Filter by specific month/year
-        query = query.filter(
+        query = query.where(
             extract('year', FinancialData.date) == year,
             extract('month', FinancialData.date) == month
         )
@@ -517,7 +686,7 @@ def get_financial_data(
     if start_date and (month is None or year is None):
         try:
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            query = query.filter(FinancialData.date >= start_dt)
+            query = query.where(FinancialData.date >= start_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
 
@@ -526,24 +695,27 @@ def get_financial_data(
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
             # Include the entire end date
             end_dt = end_dt.replace(hour=23, minute=59, second=59)
-            query = query.filter(FinancialData.date <= end_dt)
+            query = query.where(FinancialData.date <= end_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
 
-    # Order by date descending
-    query = query.order_by(desc(FinancialData.date))
-
-    # Get total count
-    total_count = query.count()
-
-    # Apply pagination
-    financial_data = query.offset(offset).limit(limit).all()
+    # Newest first, one (date, id) index range per page
+    try:
+        financial_data, next_cursor = await keyset_page(
+            db, query, FinancialData.date, FinancialData.id, limit, cursor=cursor, offset=offset
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    total_count = await count_rows(db, query, total_mode)
 
     return {
         "status": "success",
         "total_count": total_count,
+        "total_estimated": total_mode == "estimate",
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
         "data": [
             {
                 "id": entry.id,
@@ -558,551 +730,760 @@ def get_financial_data(
     }
 
 
-@router.post("/finance/forecast")
-def forecast_financial_data(
-    days: int = Form(...),
-    db: Session = Depends(get_db),
+@router.get("/finance/data/export")
+def export_financial_data(
+    format: str = "parquet",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
     user_id: str = Depends(get_user_id_from_token)
 ):
     """
-    Forecast expenses using the pre-trained Prophet model.
-    Creates engineered features from: date, amount, category, use_chip
+    Stream all of the authenticated user's financial data as Parquet (default) or an
+    Arrow IPC stream (format=arrow), oldest first, for analysis tools.
+    Optional filters: start_date, end_date (format: YYYY-MM-DD)
     """
     try:
         user_uuid = UUIDType(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
 
-    if days <= 0:
-        raise HTTPException(status_code=400, detail="Days must be a positive integer")
+    export_format = format.lower()
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Export requires pyarrow (pip install pyarrow)")
 
-    # Load the pre-trained model
-    try:
-        model, metadata = load_model()
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error loading model: {str(e)}"
-        )
+    start_dt = end_dt = None
+    if start_date:
+        try:
+            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
+    if end_date:
+        try:
+            end_dt = datetime.strptime(end_date, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    filename = f"finance_data_{datetime.now().strftime('%Y%m%d')}.{extension}"
+    return StreamingResponse(
+        stream_finance_export(user_uuid, export_format, start_dt, end_dt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# Rows per server-side cursor fetch when the forecast aggregates raw transactions
+FORECAST_LOAD_CHUNK_ROWS = int(os.getenv("FORECAST_LOAD_CHUNK_ROWS", "20000"))
 
-    # Get all expense data for user
-    financial_data = db.query(FinancialData).filter(
+# Columns of the per-month frame the forecast features are built from
+MONTHLY_COLUMNS = [
+    'date', 'monthly_expense', 'transaction_count', 'avg_transaction_amount',
+    'category_diversity', 'online_transaction_count'
+]
+
+
+def _monthly_frame_from_rollups(rollups: list) -> pd.DataFrame:
+    """
+    Build the monthly frame from finance_monthly_rollups rows. Months without
+    transactions inside the range are added like pd.Grouper(freq='ME') does:
+    zero sum and counts, NaN mean.
+    """
+    months = pd.DataFrame(rollups, columns=[
+        'month', 'monthly_expense', 'transaction_count', 'online_transaction_count', 'category_diversity'
+    ])
+    months['date'] = pd.to_datetime(months['month']) + pd.offsets.MonthEnd(0)
+    months = months.set_index('date').drop(columns='month')
+    months = months.reindex(pd.date_range(months.index.min(), months.index.max(), freq='ME'))
+
+    months['monthly_expense'] = months['monthly_expense'].astype(float).fillna(0.0)
+    for col in ['transaction_count', 'online_transaction_count', 'category_diversity']:
+        months[col] = months[col].fillna(0).astype('int64')
+    months['avg_transaction_amount'] = (
+        months['monthly_expense'] / months['transaction_count'].where(months['transaction_count'] > 0)
+    )
+    return months.rename_axis('date').reset_index()[MONTHLY_COLUMNS]
+
+
+def _monthly_frame_from_transactions(db: Session, user_uuid: UUIDType) -> Optional[pd.DataFrame]:
+    """
+    Aggregate the user's expense rows by month (used when no rollups exist yet).
+    Only (date, amount, category, use_chip) are read, in FORECAST_LOAD_CHUNK_ROWS chunks
+    from a server-side cursor, straight into NumPy arrays; category and use_chip are
+    dictionary-encoded, so a row costs ~20 bytes instead of an ORM object and a dict.
+    """
+    statement = select(
+        FinancialData.date, FinancialData.amount, FinancialData.category, FinancialData.use_chip
+    ).where(
         FinancialData.user_id == user_uuid,
         FinancialData.transaction_type == 'expense'
-    ).order_by(FinancialData.date).all()
+    ).order_by(FinancialData.date).execution_options(yield_per=FORECAST_LOAD_CHUNK_ROWS)
+
+    dates, amounts, category_codes, use_chip_codes = [], [], [], []
+    categories, use_chips = {}, {}  # value -> code, in first-seen order
+    for rows in db.connection().execute(statement).partitions():
+        chunk_dates, chunk_amounts, chunk_categories, chunk_use_chips = zip(*rows)
+        dates.append(np.array(chunk_dates, dtype="datetime64[us]"))
+        amounts.append(np.array(chunk_amounts, dtype=np.float64))
+        category_codes.append(np.fromiter(
+            (categories.setdefault(value or "Unknown", len(categories)) for value in chunk_categories),
+            dtype=np.int32, count=len(rows)
+        ))
+        use_chip_codes.append(np.fromiter(
+            (use_chips.setdefault(value or "Unknown", len(use_chips)) for value in chunk_use_chips),
+            dtype=np.int32, count=len(rows)
+        ))
+
+    if not dates:
+        return None
+
+    df = pd.DataFrame({
+        "date": np.concatenate(dates),
+        "amount": np.concatenate(amounts),
+        "category": pd.Categorical.from_codes(np.concatenate(category_codes), list(categories)),
+        "use_chip": pd.Categorical.from_codes(np.concatenate(use_chip_codes), list(use_chips)),
+    })
+    return aggregate_monthly_expenses(df)
+
+
+def aggregate_monthly_expenses(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Monthly frame from individual expenses (date, amount, category, use_chip columns;
+    missing category / use_chip already replaced by "Unknown").
+    """
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values('date')
+
+    # Group by month and aggregate
+    monthly_df = df.groupby(pd.Grouper(key='date', freq='ME')).agg({
+        'amount': ['sum', 'count', 'mean'],
+        'category': lambda x: x.nunique(),  # Category diversity
+        'use_chip': lambda x: (x == 'Online Transaction').sum()  # Online count
+    }).reset_index()
+
+    # Flatten column names
+    monthly_df.columns = MONTHLY_COLUMNS
+    return monthly_df
 
-    if not financial_data:
-        raise HTTPException(
-            status_code=400, 
-            detail="No expense data found. Please add financial data first."
-        )
 
+def _get_data_version(db: Session, user_uuid: UUIDType) -> Optional[int]:
+    """The user's data version, or None (no stats row / column not migrated) to skip the forecast cache."""
     try:
-        # Convert to DataFrame
-        df = pd.DataFrame([
-            {
-                "date": entry.date,
-                "amount": float(entry.amount),
-                "category": entry.category or "Unknown",
-                "use_chip": entry.use_chip or "Unknown"
-            }
-            for entry in financial_data
-        ])
+        return get_data_version(db, user_uuid)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Data version unavailable, forecast cache skipped: {e}")
+        return None
 
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
 
-        # Group by month and aggregate
-        monthly_df = df.groupby(pd.Grouper(key='date', freq='ME')).agg({
-            'amount': ['sum', 'count', 'mean'],
-            'category': lambda x: x.nunique(),  # Category diversity
-            'use_chip': lambda x: (x == 'Online Transaction').sum()  # Online count
-        }).reset_index()
+def _load_monthly_expenses(db: Session, user_uuid: UUIDType) -> Optional[pd.DataFrame]:
+    """Monthly expense frame for the forecast; None if the user has no expenses."""
+    try:
+        rollups = get_monthly_rollups(db, user_uuid)
+    except Exception as e:
+        # e.g. rollup tables not migrated yet
+        db.rollback()
+        print(f"⚠️ Monthly rollups unavailable, aggregating finance_data: {e}")
+        rollups = None
 
-        # Flatten column names
-        monthly_df.columns = ['date', 'monthly_expense', 'transaction_count', 'avg_transaction_amount', 'category_diversity', 'online_transaction_count']
-        
-        # Calculate engineered features
-        monthly_df['online_ratio'] = monthly_df['online_transaction_count'] / (monthly_df['transaction_count'] + 1e-6)
-        
-        # Temporal features
-        monthly_df['month'] = monthly_df['date'].dt.month
-        monthly_df['quarter'] = monthly_df['date'].dt.quarter
-        monthly_df['year'] = monthly_df['date'].dt.year
-        monthly_df['is_month_end'] = (monthly_df['date'].dt.day >= 28).astype(int)
-        monthly_df['is_holiday_season'] = ((monthly_df['month'] == 11) | (monthly_df['month'] == 12)).astype(int)
-        
-        # Aggregates: Moving averages
-        monthly_df['ma_3_month'] = monthly_df['monthly_expense'].rolling(window=3, min_periods=1).mean()
-        monthly_df['ma_6_month'] = monthly_df['monthly_expense'].rolling(window=6, min_periods=1).mean()
-        monthly_df['ma_12_month'] = monthly_df['monthly_expense'].rolling(window=12, min_periods=1).mean()
-        monthly_df['transaction_count_ma3'] = monthly_df['transaction_count'].rolling(window=3, min_periods=1).mean()
-        monthly_df['avg_transaction_ma3'] = monthly_df['avg_transaction_amount'].rolling(window=3, min_periods=1).mean()
-        
-        # Trends: Growth rates
-        monthly_df['mom_growth'] = monthly_df['monthly_expense'].pct_change()
-        monthly_df['mom_growth_3m_avg'] = monthly_df['mom_growth'].rolling(window=3, min_periods=1).mean()
-        
-        # Trends: Volatility
-        monthly_df['volatility_3m'] = monthly_df['monthly_expense'].rolling(window=3, min_periods=1).std()
-        
-        # Recurring: Online ratio moving average
-        monthly_df['online_ratio_ma3'] = monthly_df['online_ratio'].rolling(window=3, min_periods=1).mean()
-        
-        # Fill NaN values
-        feature_cols = [col for col in monthly_df.columns if col not in ['date', 'monthly_expense']]
-        for col in feature_cols:
-            monthly_df[col] = monthly_df[col].ffill().bfill().fillna(0)
-
-        # Prepare for Prophet
-        prophet_df = monthly_df.rename(columns={
-            "date": "ds",
-            "monthly_expense": "y"
-        })
+    if rollups:
+        return _monthly_frame_from_rollups(rollups)
+    return _monthly_frame_from_transactions(db, user_uuid)
 
-        # Prophet and merge() require unique month timestamps; duplicates break pd.crosstab inside Prophet.
-        if prophet_df["ds"].duplicated().any():
-            prophet_df = (
-                prophet_df.drop_duplicates(subset=["ds"], keep="last")
-                .sort_values("ds")
-                .reset_index(drop=True)
-            )
 
-        # Add index regressor (sequential month number)
-        prophet_df["index"] = range(1, len(prophet_df) + 1)
+def build_future_regressors(ds: pd.Series, regressors: list, history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Regressor values for future months, one vectorized column per regressor (Example 4 logic):
+    calendar features come from `ds`, `index` keeps counting months, and moving averages,
+    growth, volatility, ratios and everything else carry the last historical value forward.
+    `history` is the training frame (ds, year, month and regressor columns), oldest first.
+    """
+    ds = pd.to_datetime(ds)
+    last_row = history.iloc[-1]
+    n_rows = len(ds)
 
-        # Handle single month of data with simple forecast
-        if len(prophet_df) < 2:
-            print(f"⚠️ Only {len(prophet_df)} month(s) of data. Using simple average-based forecast.")
-            
-            # Get the single month's data
-            monthly_avg = prophet_df['y'].iloc[0]
-            last_date = prophet_df['ds'].max()
-            
-            # Convert to Timestamp if needed
-            if not isinstance(last_date, pd.Timestamp):
-                last_date = pd.to_datetime(last_date)
-            
-            # Generate future dates
-            from pandas import DateOffset
-            next_month_start = last_date.replace(day=1) + DateOffset(months=1)
-            months_to_forecast = max(1, int(days / 30))
-            
-            future_dates = pd.date_range(
-                start=next_month_start,
-                periods=months_to_forecast,
-                freq='ME'
-            )
-            
-            # Simple forecast: use the single month's average for all future months
-            forecast_results = []
-            for date_val in future_dates:
-                forecast_results.append({
-                    "date": date_val.strftime("%Y-%m"),
-                    "forecasted_amount": round(float(monthly_avg), 2),
-                    "lower_bound": round(float(monthly_avg * 0.5), 2),  # 50% lower
-                    "upper_bound": round(float(monthly_avg * 1.5), 2),  # 50% higher
-                })
-            
-            return {
-                "status": "success",
-                "forecast_days": days,
-                "forecast_months": months_to_forecast,
-                "forecast": forecast_results,
-                "summary": {
-                    "total_predicted": round(float(monthly_avg * months_to_forecast), 2),
-                    "average_monthly": round(float(monthly_avg), 2),
-                    "min_monthly": round(float(monthly_avg), 2),
-                    "max_monthly": round(float(monthly_avg), 2),
-                    "historical_average": round(float(monthly_avg), 2),
-                    "historical_max": round(float(monthly_avg), 2),
-                    "historical_min": round(float(monthly_avg), 2),
-                    "average_previous_monthly": round(float(monthly_avg), 2),
-                    "note": "Forecast based on single month of data. Add more months for better predictions."
-                }
-            }
+    # Calendar parts are extracted once and shared by the date-derived regressors
+    year = ds.dt.year.to_numpy()
+    month = ds.dt.month.to_numpy()
+    columns = {}
 
-        # Convert days to months
-        months_to_forecast = max(1, int(days / 30))
-        
-        # Get the last date from user's data (not from model's training data)
-        last_user_date = prophet_df['ds'].max()
-        print(f"📅 Last user data date: {last_user_date.strftime('%Y-%m-%d')}")
+    for regressor in regressors:
+        last_value = last_row[regressor] if regressor in history.columns else 0
+
+        # Index: sequential month number (continue from last)
+        if regressor == 'index':
+            columns[regressor] = last_value + (year - last_row['year']) * 12 + (month - last_row['month'])
+        # Temporal features: calculate from date
+        elif regressor == 'month':
+            columns[regressor] = month
+        elif regressor == 'quarter':
+            columns[regressor] = (month - 1) // 3 + 1
+        elif regressor == 'year':
+            columns[regressor] = year
+        elif regressor == 'is_month_end':
+            columns[regressor] = (ds.dt.day.to_numpy() >= 28).astype(int)
+        elif regressor == 'month_start_dow':
+            columns[regressor] = ds.dt.dayofweek.to_numpy()
+        elif regressor == 'is_holiday_season':
+            columns[regressor] = np.isin(month, [11, 12]).astype(int)
+        elif regressor == 'is_year_end':
+            columns[regressor] = (month == 12).astype(int)
+        elif regressor == 'is_quarter_end':
+            columns[regressor] = np.isin(month, [3, 6, 9, 12]).astype(int)
+        # Moving averages, growth rates, volatility: last calculated value (stabilizes)
+        elif ('ma_' in regressor or '_ma' in regressor
+              or 'growth' in regressor or 'mom_' in regressor
+              or 'volatility' in regressor):
+            columns[regressor] = np.full(n_rows, last_value)
+        # Ratios: last known ratio
+        elif 'ratio' in regressor:
+            columns[regressor] = np.full(n_rows, last_value if not pd.isna(last_value) else 0.5)
+        # Other features: last known value
+        else:
+            columns[regressor] = np.full(n_rows, last_value if not pd.isna(last_value) else 0)
+
+    return pd.DataFrame(columns, index=ds.index, columns=regressors)
+
+
+def _fit_fallback_forecast(train: pd.DataFrame, future: pd.DataFrame) -> pd.DataFrame:
+    """Fit a plain Prophet model on (ds, y) and predict `future`; runs in the forecast pool."""
+    from prophet import Prophet
+
+    fallback_model = Prophet(
+        yearly_seasonality=True,
+        weekly_seasonality=False,
+        daily_seasonality=False,
+        seasonality_mode='additive',
+    )
+    fallback_model.fit(train)
+    return fallback_model.predict(future)
+
+
+def _run_forecast_in_worker(monthly_df: pd.DataFrame, days: int, checksum: str) -> tuple:
+    """
+    _run_forecast with the Prophet model, inside a forecast pool process. The worker keeps
+    its own registry copy and reloads it when the API process has swapped to another file.
+    Returns (result, checksum of the model used, error): the checksum differs from
+    `checksum` while the file is being replaced, and error is (status_code, detail) of an
+    HTTPException to re-raise in the API process (it does not survive pickling).
+    """
+    try:
+        loaded = _get_forecast_model(checksum)
+    except HTTPException as e:
+        return None, checksum, (e.status_code, e.detail)
+    return _run_forecast(monthly_df, days, loaded.model, loaded.metadata), loaded.checksum, None
+
+
+def _run_forecast(monthly_df: pd.DataFrame, days: int, model, metadata) -> dict:
+    """
+    Build the monthly features, predict `days` ahead with the pre-trained model
+    (falling back to a fresh Prophet fit or a heuristic) and format the response.
+    """
+    # Calculate engineered features
+    monthly_df['online_ratio'] = monthly_df['online_transaction_count'] / (monthly_df['transaction_count'] + 1e-6)
+    
+    # Temporal features
+    monthly_df['month'] = monthly_df['date'].dt.month
+    monthly_df['quarter'] = monthly_df['date'].dt.quarter
+    monthly_df['year'] = monthly_df['date'].dt.year
+    monthly_df['is_month_end'] = (monthly_df['date'].dt.day >= 28).astype(int)
+    monthly_df['is_holiday_season'] = ((monthly_df['month'] == 11) | (monthly_df['month'] == 12)).astype(int)
+    
+    # Aggregates: Moving averages
+    monthly_df['ma_3_month'] = monthly_df['monthly_expense'].rolling(window=3, min_periods=1).mean()
+    monthly_df['ma_6_month'] = monthly_df['monthly_expense'].rolling(window=6, min_periods=1).mean()
+    monthly_df['ma_12_month'] = monthly_df['monthly_expense'].rolling(window=12, min_periods=1).mean()
+    monthly_df['transaction_count_ma3'] = monthly_df['transaction_count'].rolling(window=3, min_periods=1).mean()
+    monthly_df['avg_transaction_ma3'] = monthly_df['avg_transaction_amount'].rolling(window=3, min_periods=1).mean()
+    
+    # Trends: Growth rates
+    monthly_df['mom_growth'] = monthly_df['monthly_expense'].pct_change()
+    monthly_df['mom_growth_3m_avg'] = monthly_df['mom_growth'].rolling(window=3, min_periods=1).mean()
+    
+    # Trends: Volatility
+    monthly_df['volatility_3m'] = monthly_df['monthly_expense'].rolling(window=3, min_periods=1).std()
+    
+    # Recurring: Online ratio moving average
+    monthly_df['online_ratio_ma3'] = monthly_df['online_ratio'].rolling(window=3, min_periods=1).mean()
+    
+    # Fill NaN values
+    feature_cols = [col for col in monthly_df.columns if col not in ['date', 'monthly_expense']]
+    for col in feature_cols:
+        monthly_df[col] = monthly_df[col].ffill().bfill().fillna(0)
+
+    # Prepare for Prophet
+    prophet_df = monthly_df.rename(columns={
+        "date": "ds",
+        "monthly_expense": "y"
+    })
+
+    # Prophet and merge() require unique month timestamps; duplicates break pd.crosstab inside Prophet.
+    if prophet_df["ds"].duplicated().any():
+        prophet_df = (
+            prophet_df.drop_duplicates(subset=["ds"], keep="last")
+            .sort_values("ds")
+            .reset_index(drop=True)
+        )
+
+    # Add index regressor (sequential month number)
+    prophet_df["index"] = range(1, len(prophet_df) + 1)
+
+    # Handle single month of data with simple forecast
+    if len(prophet_df) < 2:
+        print(f"⚠️ Only {len(prophet_df)} month(s) of data. Using simple average-based forecast.")
         
-        # Create future dataframe starting from the month AFTER the user's last data
-        # This ensures we forecast from the user's current data, not the model's old training data
-        from pandas import DateOffset
+        # Get the single month's data
+        monthly_avg = prophet_df['y'].iloc[0]
+        last_date = prophet_df['ds'].max()
         
         # Convert to Timestamp if needed
-        if not isinstance(last_user_date, pd.Timestamp):
-            last_user_date = pd.to_datetime(last_user_date)
+        if not isinstance(last_date, pd.Timestamp):
+            last_date = pd.to_datetime(last_date)
         
-        # Get the next month end date (ME = Month End frequency)
-        # Start from first day of next month, then use ME to get month end
-        next_month_start = last_user_date.replace(day=1) + DateOffset(months=1)
+        # Generate future dates
+        from pandas import DateOffset
+        next_month_start = last_date.replace(day=1) + DateOffset(months=1)
+        months_to_forecast = max(1, int(days / 30))
         
-        # Generate future dates (month end dates) starting from next month
         future_dates = pd.date_range(
             start=next_month_start,
             periods=months_to_forecast,
-            freq='ME'  # Month End - automatically gets last day of each month
+            freq='ME'
         )
         
-        # Create future dataframe with just dates
-        future = pd.DataFrame({'ds': future_dates})
+        # Simple forecast: use the single month's average for all future months
+        forecast_results = []
+        for date_val in future_dates:
+            forecast_results.append({
+                "date": date_val.strftime("%Y-%m"),
+                "forecasted_amount": round(float(monthly_avg), 2),
+                "lower_bound": round(float(monthly_avg * 0.5), 2),  # 50% lower
+                "upper_bound": round(float(monthly_avg * 1.5), 2),  # 50% higher
+            })
         
-        print(f"📅 Forecasting from {future_dates[0].strftime('%Y-%m-%d')} for {months_to_forecast} months")
-        print(f"   Future dates: {future_dates[0].strftime('%Y-%m')} to {future_dates[-1].strftime('%Y-%m')}")
+        return {
+            "status": "success",
+            "forecast_days": days,
+            "forecast_months": months_to_forecast,
+            "forecast": forecast_results,
+            "summary": {
+                "total_predicted": round(float(monthly_avg * months_to_forecast), 2),
+                "average_monthly": round(float(monthly_avg), 2),
+                "min_monthly": round(float(monthly_avg), 2),
+                "max_monthly": round(float(monthly_avg), 2),
+                "historical_average": round(float(monthly_avg), 2),
+                "historical_max": round(float(monthly_avg), 2),
+                "historical_min": round(float(monthly_avg), 2),
+                "average_previous_monthly": round(float(monthly_avg), 2),
+                "note": "Forecast based on single month of data. Add more months for better predictions."
+            }
+        }
+
+    # Convert days to months
+    months_to_forecast = max(1, int(days / 30))
+    
+    # Get the last date from user's data (not from model's training data)
+    last_user_date = prophet_df['ds'].max()
+    print(f"📅 Last user data date: {last_user_date.strftime('%Y-%m-%d')}")
+    
+    # Create future dataframe starting from the month AFTER the user's last data
+    # This ensures we forecast from the user's current data, not the model's old training data
+    from pandas import DateOffset
+    
+    # Convert to Timestamp if needed
+    if not isinstance(last_user_date, pd.Timestamp):
+        last_user_date = pd.to_datetime(last_user_date)
+    
+    # Get the next month end date (ME = Month End frequency)
+    # Start from first day of next month, then use ME to get month end
+    next_month_start = last_user_date.replace(day=1) + DateOffset(months=1)
+    
+    # Generate future dates (month end dates) starting from next month
+    future_dates = pd.date_range(
+        start=next_month_start,
+        periods=months_to_forecast,
+        freq='ME'  # Month End - automatically gets last day of each month
+    )
+    
+    # Create future dataframe with just dates
+    future = pd.DataFrame({'ds': future_dates})
+    
+    print(f"📅 Forecasting from {future_dates[0].strftime('%Y-%m-%d')} for {months_to_forecast} months")
+    print(f"   Future dates: {future_dates[0].strftime('%Y-%m')} to {future_dates[-1].strftime('%Y-%m')}")
+    
+    # Get regressors the model expects
+    model_regressors = []
+    if hasattr(model, 'extra_regressors') and model.extra_regressors:
+        model_regressors = list(model.extra_regressors.keys())
+    elif hasattr(model, 'regressors') and model.regressors:
+        model_regressors = list(model.regressors)
+    elif metadata and 'regressors' in metadata:
+        model_regressors = metadata['regressors']
+
+    # Guard against duplicated regressor names coming from model metadata.
+    if model_regressors:
+        unique_regressors = list(dict.fromkeys(model_regressors))
+        if len(unique_regressors) != len(model_regressors):
+            print(f"⚠️ Removed {len(model_regressors) - len(unique_regressors)} duplicate regressor name(s)")
+        model_regressors = unique_regressors
+    
+    # Add regressors for training period (following Example 4 logic)
+    num_months = len(prophet_df)
+    
+    # For small datasets (< 24 months), the pre-trained model may still expect regressors
+    # but we need to be very careful about how we populate them
+    if model_regressors:
+        print(f"📊 Model expects {len(model_regressors)} regressors for dataset with {num_months} months")
         
-        # Get regressors the model expects
-        model_regressors = []
-        if hasattr(model, 'extra_regressors') and model.extra_regressors:
-            model_regressors = list(model.extra_regressors.keys())
-        elif hasattr(model, 'regressors') and model.regressors:
-            model_regressors = list(model.regressors)
-        elif metadata and 'regressors' in metadata:
-            model_regressors = metadata['regressors']
-
-        # Guard against duplicated regressor names coming from model metadata.
-        if model_regressors:
-            unique_regressors = list(dict.fromkeys(model_regressors))
-            if len(unique_regressors) != len(model_regressors):
-                print(f"⚠️ Removed {len(model_regressors) - len(unique_regressors)} duplicate regressor name(s)")
-            model_regressors = unique_regressors
+        # Ensure all required regressors exist in prophet_df
+        for regressor in model_regressors:
+            if regressor not in prophet_df.columns:
+                # Add missing regressor with default value
+                if regressor == 'index':
+                    prophet_df[regressor] = range(1, len(prophet_df) + 1)
+                else:
+                    prophet_df[regressor] = 0
         
-        # Add regressors for training period (following Example 4 logic)
-        num_months = len(prophet_df)
+        # Merge historical regressors for training period
+        regressor_cols = [r for r in model_regressors if r in prophet_df.columns]
+        if regressor_cols:
+            hist_regs = prophet_df[["ds"] + regressor_cols].drop_duplicates(subset=["ds"], keep="last")
+            future = future.merge(hist_regs, on="ds", how="left")
         
-        # For small datasets (< 24 months), the pre-trained model may still expect regressors
-        # but we need to be very careful about how we populate them
-        if model_regressors:
-            print(f"📊 Model expects {len(model_regressors)} regressors for dataset with {num_months} months")
-            
-            # Ensure all required regressors exist in prophet_df
-            for regressor in model_regressors:
-                if regressor not in prophet_df.columns:
-                    # Add missing regressor with default value
-                    if regressor == 'index':
-                        prophet_df[regressor] = range(1, len(prophet_df) + 1)
-                    else:
-                        prophet_df[regressor] = 0
-            
-            # Merge historical regressors for training period
-            regressor_cols = [r for r in model_regressors if r in prophet_df.columns]
-            if regressor_cols:
-                hist_regs = prophet_df[["ds"] + regressor_cols].drop_duplicates(subset=["ds"], keep="last")
-                future = future.merge(hist_regs, on="ds", how="left")
-            
-            # Ensure all regressors are in future dataframe
-            for regressor in model_regressors:
-                if regressor not in future.columns:
-                    future[regressor] = 0
-            
-            # For future periods, calculate regressors from historical patterns (Example 4 approach)
-            last_date = prophet_df['ds'].max()
-            future_period_mask = future['ds'] > last_date
-            
-            if future_period_mask.any():
-                print(f"   Calculating regressors for {future_period_mask.sum()} future periods...")
-                
-                # Get last known values from training data (like Example 4)
-                last_values = {}
-                for regressor in model_regressors:
-                    if regressor in prophet_df.columns:
-                        last_values[regressor] = prophet_df[regressor].iloc[-1]
-                    else:
-                        last_values[regressor] = 0
-                
-                # Calculate each regressor for future periods (matching Example 4 logic)
-                for idx in future[future_period_mask].index:
-                    date_val = future.loc[idx, 'ds']
-                    
-                    for regressor in model_regressors:
-                        # Index: sequential month number (continue from last)
-                        if regressor == 'index':
-                            last_index = last_values.get('index', len(prophet_df))
-                            last_year = last_values.get('year', prophet_df.iloc[-1]['year'])
-                            last_month = last_values.get('month', prophet_df.iloc[-1]['month'])
-                            # Calculate months ahead
-                            months_ahead = (date_val.year - last_year) * 12 + (date_val.month - last_month)
-                            future.loc[idx, regressor] = last_index + months_ahead
-                        # Temporal features: calculate from date
-                        elif regressor == 'month':
-                            future.loc[idx, regressor] = date_val.month
-                        elif regressor == 'quarter':
-                            future.loc[idx, regressor] = date_val.quarter
-                        elif regressor == 'year':
-                            future.loc[idx, regressor] = date_val.year
-                        elif regressor == 'is_month_end':
-                            future.loc[idx, regressor] = 1 if date_val.day >= 28 else 0
-                        elif regressor == 'month_start_dow':
-                            future.loc[idx, regressor] = date_val.dayofweek
-                        elif regressor == 'is_holiday_season':
-                            future.loc[idx, regressor] = 1 if date_val.month in [11, 12] else 0
-                        elif regressor == 'is_year_end':
-                            future.loc[idx, regressor] = 1 if date_val.month == 12 else 0
-                        elif regressor == 'is_quarter_end':
-                            future.loc[idx, regressor] = 1 if date_val.month in [3, 6, 9, 12] else 0
-                        # Moving averages: use last calculated value (stabilizes)
-                        elif 'ma_' in regressor or '_ma' in regressor:
-                            future.loc[idx, regressor] = last_values.get(regressor, 0)
-                        # Growth rates: use last known growth (assume continuation)
-                        elif 'growth' in regressor or 'mom_' in regressor:
-                            future.loc[idx, regressor] = last_values.get(regressor, 0)
-                        # Volatility: use last known volatility
-                        elif 'volatility' in regressor:
-                            future.loc[idx, regressor] = last_values.get(regressor, 0)
-                        # Ratios: use last known ratio
-                        elif 'ratio' in regressor:
-                            val = last_values.get(regressor, 0.5)
-                            future.loc[idx, regressor] = val if not pd.isna(val) else 0.5
-                        # Other features: use last known value
-                        else:
-                            val = last_values.get(regressor, 0)
-                            future.loc[idx, regressor] = val if not pd.isna(val) else 0
-                
-                print(f"   ✓ Calculated all {len(model_regressors)} regressors for future periods")
+        # Ensure all regressors are in future dataframe
+        for regressor in model_regressors:
+            if regressor not in future.columns:
+                future[regressor] = 0
+        
+        # For future periods, calculate regressors from historical patterns (Example 4 approach)
+        last_date = prophet_df['ds'].max()
+        future_period_mask = future['ds'] > last_date
+        
+        if future_period_mask.any():
+            print(f"   Calculating regressors for {future_period_mask.sum()} future periods...")
             
-            # CRITICAL: FINAL SAFETY CHECK (matching Example 4)
-            print(f"\n   🔍 FINAL SAFETY CHECK before prediction:")
-            print(f"      Model expects {len(model_regressors)} regressors")
+            # Date-derived columns from the ds series, last known values broadcast (like Example 4)
+            future_regressors = build_future_regressors(future['ds'], model_regressors, prophet_df)
+            mask = future_period_mask.to_numpy()
+            values = future[model_regressors].to_numpy(dtype=float, copy=True)
+            values[mask] = future_regressors.to_numpy(dtype=float)[mask]
+            future[model_regressors] = values
             
-            # Ensure ALL required regressors are present and non-NaN
-            missing_count = 0
-            nan_count_total = 0
-            for regressor in model_regressors:
-                if regressor not in future.columns:
-                    missing_count += 1
-                    # Use last known value from training data if available
-                    if regressor in prophet_df.columns:
-                        fill_val = prophet_df[regressor].iloc[-1]
-                        if pd.isna(fill_val):
-                            fill_val = 0.5 if 'ratio' in regressor else 0
-                    else:
+            print(f"   ✓ Calculated all {len(model_regressors)} regressors for future periods")
+        
+        # CRITICAL: FINAL SAFETY CHECK (matching Example 4)
+        print(f"\n   🔍 FINAL SAFETY CHECK before prediction:")
+        print(f"      Model expects {len(model_regressors)} regressors")
+        
+        # Ensure ALL required regressors are present and non-NaN
+        missing_count = 0
+        nan_count_total = 0
+        for regressor in model_regressors:
+            if regressor not in future.columns:
+                missing_count += 1
+                # Use last known value from training data if available
+                if regressor in prophet_df.columns:
+                    fill_val = prophet_df[regressor].iloc[-1]
+                    if pd.isna(fill_val):
                         fill_val = 0.5 if 'ratio' in regressor else 0
-                    future[regressor] = fill_val
-                elif future[regressor].isna().any():
-                    nan_count = future[regressor].isna().sum()
-                    nan_count_total += nan_count
-                    # Fill with last known value or default
-                    if regressor in prophet_df.columns:
-                        fill_val = prophet_df[regressor].iloc[-1]
-                        if pd.isna(fill_val):
-                            fill_val = 0.5 if 'ratio' in regressor else 0
-                    else:
+                else:
+                    fill_val = 0.5 if 'ratio' in regressor else 0
+                future[regressor] = fill_val
+            elif future[regressor].isna().any():
+                nan_count = future[regressor].isna().sum()
+                nan_count_total += nan_count
+                # Fill with last known value or default
+                if regressor in prophet_df.columns:
+                    fill_val = prophet_df[regressor].iloc[-1]
+                    if pd.isna(fill_val):
                         fill_val = 0.5 if 'ratio' in regressor else 0
-                    future[regressor] = future[regressor].fillna(fill_val)
-            
-            if missing_count > 0:
-                print(f"      ⚠ Added {missing_count} missing regressors with calculated values")
-            if nan_count_total > 0:
-                print(f"      ⚠ Filled {nan_count_total} NaN values with calculated values")
-            
-            print(f"      ✅ Safety check complete. All {len(model_regressors)} regressors present.")
+                else:
+                    fill_val = 0.5 if 'ratio' in regressor else 0
+                future[regressor] = future[regressor].fillna(fill_val)
+        
+        if missing_count > 0:
+            print(f"      ⚠ Added {missing_count} missing regressors with calculated values")
+        if nan_count_total > 0:
+            print(f"      ⚠ Filled {nan_count_total} NaN values with calculated values")
+        
+        print(f"      ✅ Safety check complete. All {len(model_regressors)} regressors present.")
 
-        # Prophet cannot predict with duplicate column labels or duplicate ds rows.
-        if future.columns.duplicated().any():
-            dup_count = int(future.columns.duplicated().sum())
-            print(f"⚠️ Found {dup_count} duplicate future column label(s); keeping first occurrence")
-            future = future.loc[:, ~future.columns.duplicated(keep='first')]
+    # Prophet cannot predict with duplicate column labels or duplicate ds rows.
+    if future.columns.duplicated().any():
+        dup_count = int(future.columns.duplicated().sum())
+        print(f"⚠️ Found {dup_count} duplicate future column label(s); keeping first occurrence")
+        future = future.loc[:, ~future.columns.duplicated(keep='first')]
 
-        if future['ds'].duplicated().any():
-            dup_rows = int(future['ds'].duplicated().sum())
-            print(f"⚠️ Found {dup_rows} duplicate future date row(s); keeping last occurrence")
-            future = future.drop_duplicates(subset=['ds'], keep='last').sort_values('ds').reset_index(drop=True)
+    if future['ds'].duplicated().any():
+        dup_rows = int(future['ds'].duplicated().sum())
+        print(f"⚠️ Found {dup_rows} duplicate future date row(s); keeping last occurrence")
+        future = future.drop_duplicates(subset=['ds'], keep='last').sort_values('ds').reset_index(drop=True)
 
-        future = future.reset_index(drop=True)
-        
-        # Make prediction
-        try:
-            forecast = model.predict(future)
-        except Exception as pred_err:
-            err_text = str(pred_err).lower()
-            recoverable_error = (
-                "duplicate labels" in err_text
-                or "cannot reindex" in err_text
-                or "stan_backend" in err_text
-            )
-            if not recoverable_error:
-                raise
+    future = future.reset_index(drop=True)
+    
+    # Make prediction
+    try:
+        forecast = model.predict(future)
+    except Exception as pred_err:
+        err_text = str(pred_err).lower()
+        recoverable_error = (
+            "duplicate labels" in err_text
+            or "cannot reindex" in err_text
+            or "stan_backend" in err_text
+        )
+        if not recoverable_error:
+            raise
 
-            print(f"⚠️ Pre-trained model prediction failed: {pred_err}")
-            print("   Falling back to a clean local Prophet model for this request.")
+        print(f"⚠️ Pre-trained model prediction failed: {pred_err}")
+        print("   Falling back to a clean local Prophet model for this request.")
 
-            from prophet import Prophet
+        fallback_train = prophet_df[['ds', 'y']].copy()
+        fallback_train = (
+            fallback_train
+            .dropna(subset=['ds', 'y'])
+            .drop_duplicates(subset=['ds'], keep='last')
+            .sort_values('ds')
+            .reset_index(drop=True)
+        )
 
-            fallback_train = prophet_df[['ds', 'y']].copy()
-            fallback_train = (
-                fallback_train
-                .dropna(subset=['ds', 'y'])
-                .drop_duplicates(subset=['ds'], keep='last')
-                .sort_values('ds')
-                .reset_index(drop=True)
-            )
+        fallback_future = future[['ds']].copy()
+        fallback_future = (
+            fallback_future
+            .dropna(subset=['ds'])
+            .drop_duplicates(subset=['ds'], keep='last')
+            .sort_values('ds')
+            .reset_index(drop=True)
+        )
 
-            fallback_future = future[['ds']].copy()
-            fallback_future = (
-                fallback_future
-                .dropna(subset=['ds'])
-                .drop_duplicates(subset=['ds'], keep='last')
-                .sort_values('ds')
-                .reset_index(drop=True)
-            )
+        try:
+            forecast = forecast_pool.run(_fit_fallback_forecast, fallback_train, fallback_future)
+        except Exception as fb_err:
+            print(f"⚠️ Prophet fallback failed ({fb_err}); using heuristic trend forecast.")
+            forecast = _heuristic_forecast_like_prophet(prophet_df, fallback_future)
 
-            try:
-                fallback_model = Prophet(
-                    yearly_seasonality=True,
-                    weekly_seasonality=False,
-                    daily_seasonality=False,
-                    seasonality_mode='additive',
-                )
-                fallback_model.fit(fallback_train)
-                forecast = fallback_model.predict(fallback_future)
-            except Exception as fb_err:
-                print(f"⚠️ Prophet fallback failed ({fb_err}); using heuristic trend forecast.")
-                forecast = _heuristic_forecast_like_prophet(prophet_df, fallback_future)
-
-        # Get only the forecasted period
-        forecast_period = forecast.tail(months_to_forecast)
-
-        # Get historical statistics for validation
-        historical_avg = prophet_df['y'].mean()
-        historical_std = prophet_df['y'].std()
-        historical_max = prophet_df['y'].max()
-        historical_min = prophet_df['y'].min()
-        historical_median = prophet_df['y'].median()
+    # Get only the forecasted period
+    forecast_period = forecast.tail(months_to_forecast)
+
+    # Get historical statistics for validation
+    historical_avg = prophet_df['y'].mean()
+    historical_std = prophet_df['y'].std()
+    historical_max = prophet_df['y'].max()
+    historical_min = prophet_df['y'].min()
+    historical_median = prophet_df['y'].median()
+    
+    # For small datasets, use MUCH more conservative capping
+    num_months = len(prophet_df)
+    recent_avg = prophet_df['y'].tail(min(3, len(prophet_df))).mean()  # Last 3 months or all
+    
+    # Calculate trend for small datasets
+    use_trend_based = False
+    trend = 0
+    if num_months >= 3:
+        recent_values = prophet_df['y'].tail(3).values
+        trend = (recent_values[-1] - recent_values[0]) / 2  # Average monthly change
         
-        # For small datasets, use MUCH more conservative capping
-        num_months = len(prophet_df)
-        recent_avg = prophet_df['y'].tail(min(3, len(prophet_df))).mean()  # Last 3 months or all
+    if num_months < 6:
+        # For very small datasets (3-5 months), use trend-based prediction instead of raw model
+        use_trend_based = True
+        max_multiplier = 1.2  # Only 20% above max
+        min_multiplier = 0.8  # Only 20% below min
+    elif num_months < 12:
+        # Very conservative for small datasets
+        max_multiplier = 1.3  # Only 30% increase
+        min_multiplier = 0.6  # Allow 40% decrease
+    elif num_months < 24:
+        # Conservative for medium datasets
+        max_multiplier = 2.0  # Allow 2x increase
+        min_multiplier = 0.3  # Allow 70% decrease
+    else:
+        # Normal for large datasets
+        max_multiplier = 3.0  # Allow 3x increase
+        min_multiplier = 0.2  # Allow 80% decrease
+    
+    max_allowed = max(historical_max * max_multiplier, recent_avg * max_multiplier)
+    min_allowed = min(historical_min * min_multiplier, recent_avg * min_multiplier)
+    
+    print(f"📊 Historical: avg=${historical_avg:,.2f}, max=${historical_max:,.2f}, min=${historical_min:,.2f}")
+    print(f"   Recent avg (last 3): ${recent_avg:,.2f}, trend: ${trend:,.2f}/month")
+    print(f"   Dataset: {num_months} months - Using {'trend-based' if use_trend_based else 'model'} prediction")
+    print(f"   Capping: max=${max_allowed:,.2f}, min=${min_allowed:,.2f}")
+    
+    # Format response with validation
+    forecast_results = []
+    for i, (_, row) in enumerate(forecast_period.iterrows()):
+        # Get raw predicted value
+        raw_predicted = float(row['yhat'])
+        raw_lower = float(row['yhat_lower'])
+        raw_upper = float(row['yhat_upper'])
         
-        # Calculate trend for small datasets
-        use_trend_based = False
-        trend = 0
-        if num_months >= 3:
-            recent_values = prophet_df['y'].tail(3).values
-            trend = (recent_values[-1] - recent_values[0]) / 2  # Average monthly change
-            
-        if num_months < 6:
-            # For very small datasets (3-5 months), use trend-based prediction instead of raw model
-            use_trend_based = True
-            max_multiplier = 1.2  # Only 20% above max
-            min_multiplier = 0.8  # Only 20% below min
-        elif num_months < 12:
-            # Very conservative for small datasets
-            max_multiplier = 1.3  # Only 30% increase
-            min_multiplier = 0.6  # Allow 40% decrease
-        elif num_months < 24:
-            # Conservative for medium datasets
-            max_multiplier = 2.0  # Allow 2x increase
-            min_multiplier = 0.3  # Allow 70% decrease
+        # For very small datasets, use trend-based prediction
+        if use_trend_based:
+            # Project forward based on recent trend
+            months_ahead = i + 1
+            predicted = recent_avg + (trend * months_ahead)
+            print(f"   Month {i+1}: Trend-based: ${predicted:,.2f} (model said: ${raw_predicted:,.2f})")
         else:
-            # Normal for large datasets
-            max_multiplier = 3.0  # Allow 3x increase
-            min_multiplier = 0.2  # Allow 80% decrease
-        
-        max_allowed = max(historical_max * max_multiplier, recent_avg * max_multiplier)
-        min_allowed = min(historical_min * min_multiplier, recent_avg * min_multiplier)
-        
-        print(f"📊 Historical: avg=${historical_avg:,.2f}, max=${historical_max:,.2f}, min=${historical_min:,.2f}")
-        print(f"   Recent avg (last 3): ${recent_avg:,.2f}, trend: ${trend:,.2f}/month")
-        print(f"   Dataset: {num_months} months - Using {'trend-based' if use_trend_based else 'model'} prediction")
-        print(f"   Capping: max=${max_allowed:,.2f}, min=${min_allowed:,.2f}")
-        
-        # Format response with validation
-        forecast_results = []
-        for i, (_, row) in enumerate(forecast_period.iterrows()):
-            # Get raw predicted value
-            raw_predicted = float(row['yhat'])
-            raw_lower = float(row['yhat_lower'])
-            raw_upper = float(row['yhat_upper'])
-            
-            # For very small datasets, use trend-based prediction
-            if use_trend_based:
-                # Project forward based on recent trend
-                months_ahead = i + 1
-                predicted = recent_avg + (trend * months_ahead)
-                print(f"   Month {i+1}: Trend-based: ${predicted:,.2f} (model said: ${raw_predicted:,.2f})")
-            else:
-                predicted = raw_predicted
-                
-                # If negative, use recent average
-                if predicted < 0:
-                    print(f"   Month {i+1}: Negative! Using recent avg.")
-                    predicted = recent_avg
-                
-                # Cap extreme outliers
-                if predicted > max_allowed:
-                    print(f"   Month {i+1}: Too high (${predicted:,.2f})! Capping to ${max_allowed:,.2f}")
-                    predicted = max_allowed
-                elif predicted < min_allowed:
-                    print(f"   Month {i+1}: Too low (${predicted:,.2f})! Setting to ${min_allowed:,.2f}")
-                    predicted = min_allowed
-                
-                # If still way off from recent trend, use trend-based instead
-                if num_months >= 3 and abs(predicted - recent_avg) > recent_avg * 1.5:
-                    predicted = recent_avg + trend
-                    print(f"   Month {i+1}: Too far from trend! Using trend-based: ${predicted:,.2f}")
-            
-            # Final validation: ensure within bounds
-            predicted = max(min_allowed, min(max_allowed, predicted))
+            predicted = raw_predicted
             
-            # Validate bounds
-            lower = max(0, raw_lower) if raw_lower >= 0 else historical_avg * 0.5
-            upper = min(raw_upper, historical_max * 3) if raw_upper < historical_max * 3 else historical_max * 3
+            # If negative, use recent average
+            if predicted < 0:
+                print(f"   Month {i+1}: Negative! Using recent avg.")
+                predicted = recent_avg
             
-            # Ensure bounds make sense relative to prediction
-            if lower > predicted:
-                lower = predicted * 0.5
-            if upper < predicted:
-                upper = predicted * 1.5
+            # Cap extreme outliers
+            if predicted > max_allowed:
+                print(f"   Month {i+1}: Too high (${predicted:,.2f})! Capping to ${max_allowed:,.2f}")
+                predicted = max_allowed
+            elif predicted < min_allowed:
+                print(f"   Month {i+1}: Too low (${predicted:,.2f})! Setting to ${min_allowed:,.2f}")
+                predicted = min_allowed
             
-            # Format date as YYYY-MM for frontend compatibility
-            # Frontend formatMonthLabel expects "YYYY-MM" format and appends '-01'
-            date_val = row['ds']
-            if pd.isna(date_val):
-                # Skip if date is NaN (shouldn't happen, but safety check)
-                continue
-            
-            # Convert to datetime and format as YYYY-MM (month format, not full date)
-            if isinstance(date_val, pd.Timestamp):
-                date_formatted = date_val.strftime("%Y-%m")
-            elif hasattr(date_val, 'strftime'):
-                date_formatted = date_val.strftime("%Y-%m")
-            else:
-                # Convert to datetime first
-                date_formatted = pd.to_datetime(date_val).strftime("%Y-%m")
-            
-            forecast_results.append({
-                "date": date_formatted,
-                "forecasted_amount": round(predicted, 2),
-                "lower_bound": round(lower, 2),
-                "upper_bound": round(upper, 2)
-            })
+            # If still way off from recent trend, use trend-based instead
+            if num_months >= 3 and abs(predicted - recent_avg) > recent_avg * 1.5:
+                predicted = recent_avg + trend
+                print(f"   Month {i+1}: Too far from trend! Using trend-based: ${predicted:,.2f}")
+        
+        # Final validation: ensure within bounds
+        predicted = max(min_allowed, min(max_allowed, predicted))
+        
+        # Validate bounds
+        lower = max(0, raw_lower) if raw_lower >= 0 else historical_avg * 0.5
+        upper = min(raw_upper, historical_max * 3) if raw_upper < historical_max * 3 else historical_max * 3
+        
+        # Ensure bounds make sense relative to prediction
+        if lower > predicted:
+            lower = predicted * 0.5
+        if upper < predicted:
+            upper = predicted * 1.5
+        
+        # Format date as YYYY-MM for frontend compatibility
+        # Frontend formatMonthLabel expects "YYYY-MM" format and appends '-01'
+        date_val = row['ds']
+        if pd.isna(date_val):
+            # Skip if date is NaN (shouldn't happen, but safety check)
+            continue
+        
+        # Convert to datetime and format as YYYY-MM (month format, not full date)
+        if isinstance(date_val, pd.Timestamp):
+            date_formatted = date_val.strftime("%Y-%m")
+        elif hasattr(date_val, 'strftime'):
+            date_formatted = date_val.strftime("%Y-%m")
+        else:
+            # Convert to datetime first
+            date_formatted = pd.to_datetime(date_val).strftime("%Y-%m")
+        
+        forecast_results.append({
+            "date": date_formatted,
+            "forecasted_amount": round(predicted, 2),
+            "lower_bound": round(lower, 2),
+            "upper_bound": round(upper, 2)
+        })
 
-        # Calculate summary with validated values
-        predicted_values = [r['forecasted_amount'] for r in forecast_results]
-        summary = {
-            "total_predicted": round(sum(predicted_values), 2),
-            "average_monthly": round(sum(predicted_values) / len(predicted_values), 2),
-            "min_monthly": round(min(predicted_values), 2),
-            "max_monthly": round(max(predicted_values), 2),
-            "historical_average": round(historical_avg, 2),
-            "historical_max": round(historical_max, 2),
-            "historical_min": round(historical_min, 2),
-            "average_previous_monthly": round(historical_avg, 2)
-        }
+    # Calculate summary with validated values
+    predicted_values = [r['forecasted_amount'] for r in forecast_results]
+    summary = {
+        "total_predicted": round(sum(predicted_values), 2),
+        "average_monthly": round(sum(predicted_values) / len(predicted_values), 2),
+        "min_monthly": round(min(predicted_values), 2),
+        "max_monthly": round(max(predicted_values), 2),
+        "historical_average": round(historical_avg, 2),
+        "historical_max": round(historical_max, 2),
+        "historical_min": round(historical_min, 2),
+        "average_previous_monthly": round(historical_avg, 2)
+    }
 
-        return {
-            "status": "success",
-            "forecast_days": days,
-            "forecast_months": months_to_forecast,
-            "forecast": forecast_results,
-            "summary": summary
-        }
+    return {
+        "status": "success",
+        "forecast_days": days,
+        "forecast_months": months_to_forecast,
+        "forecast": forecast_results,
+        "summary": summary
+    }
+
+
+@router.post("/finance/forecast")
+async def forecast_financial_data(
+    response: Response,
+    days: int = Form(...),
+    engine: Optional[str] = Form(None),  # "prophet" or "numpy"; defaults to FORECAST_ENGINE env
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    Forecast expenses using the pre-trained Prophet model.
+    Creates engineered features from: date, amount, category, use_chip
+    engine=numpy evaluates the model with app.forecast_engine instead of Prophet.predict
+    (same yhat, approximate intervals); X-Forecast-Engine reports the engine used.
+    Results are cached per (user, days, engine, model file, data version); the
+    X-Forecast-Cache response header says HIT or MISS.
+    Prophet forecasts run in the forecast process pool; 503 with Retry-After when it is full.
+    Async so a request waiting on the pool does not hold a threadpool thread; the
+    blocking model, database and inline forecast calls run in the threadpool.
+    """
+    try:
+        user_uuid = UUIDType(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
 
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="Days must be a positive integer")
+
+    engine = (engine or FORECAST_ENGINE).lower()
+    if engine not in FORECAST_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of: {', '.join(FORECAST_ENGINES)}")
+
+    # Pre-trained model; one registry entry for the whole request even if a reload swaps it meanwhile
+    loaded_model = await run_in_threadpool(_get_forecast_model)
+    model, metadata = loaded_model.model, loaded_model.metadata
+
+    if engine == "numpy":
+        compiled_model = await run_in_threadpool(get_compiled_model, loaded_model)
+        if compiled_model is not None:
+            model = compiled_model
+        else:
+            engine = "prophet"
+    response.headers["X-Forecast-Engine"] = engine
+
+    # Inserts bump the user's data version, so a cached forecast is never stale
+    data_version = await run_in_threadpool(_get_data_version, db, user_uuid)
+    cache_key = (user_uuid, days, engine, loaded_model.checksum, data_version) if data_version is not None else None
+    model_checksum = loaded_model.checksum
+    if cache_key is not None:
+        cached = _forecast_cache.get(cache_key)
+        if cached is not None:
+            response.headers["X-Forecast-Cache"] = "HIT"
+            return copy.deepcopy(cached)
+    response.headers["X-Forecast-Cache"] = "MISS"
+
+    # Monthly totals: maintained rollups, or aggregated from finance_data for users without them
+    monthly_df = await run_in_threadpool(_load_monthly_expenses, db, user_uuid)
+
+    if monthly_df is None:
+        raise HTTPException(
+            status_code=400, 
+            detail="No expense data found. Please add financial data first."
+        )
+
+    try:
+        if engine == "prophet" and forecast_pool.enabled():
+            # Prophet sampling (and any fallback fit) runs in a worker process
+            result, model_checksum, error = await forecast_pool.run_async(
+                _run_forecast_in_worker, monthly_df, days, loaded_model.checksum
+            )
+            if error is not None:
+                status_code, detail = error
+                raise HTTPException(status_code=status_code, detail=detail)
+        else:
+            result = await run_in_threadpool(_run_forecast, monthly_df, days, model, metadata)
+    except (forecast_pool.ForecastPoolBusy, forecast_pool.ForecastPoolTimeout, BrokenProcessPool) as e:
+        # A pool killed over another request's timeout fails its other running forecasts too
+        raise HTTPException(
+            status_code=503,
+            detail=f"Forecast service is busy: {e}",
+            headers={"Retry-After": str(forecast_pool.FORECAST_POOL_RETRY_AFTER_SECONDS)}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -1110,3 +1491,24 @@ def forecast_financial_data(
         error_trace = traceback.format_exc()
         print(f"Forecast error: {error_trace}")
         raise HTTPException(status_code=500, detail=f"Error during forecasting: {str(e)}")
+
+    if cache_key is not None:
+        # Keyed on the model that produced it: a worker may be on another file mid-swap
+        _forecast_cache.set((user_uuid, days, engine, model_checksum, data_version), copy.deepcopy(result))
+    return result
+
+
+@router.get("/finance/forecast/cache")
+def get_forecast_cache_stats(
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """Forecast cache metrics (size, hits, misses, hit rate, evictions, expirations) and pool load."""
+    loaded_model = model_registry.current(FORECAST_MODEL)
+    return {
+        "status": "success",
+        "data": {
+            **_forecast_cache.stats(),
+            "model_version": loaded_model.version if loaded_model else None,
+            "pool": forecast_pool.stats()
+        }
+    }
@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from __future__ import annotations
+
+import copy
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
 from datetime import datetime
 from typing import Optional
 from uuid import UUID as UUIDType
-import pandas as pd
-import numpy as np
-import joblib
-import xgboost as xgb
 from pathlib import Path
 
-from app.database import get_db
-from app.models import FinancialData, User, Category
+from app.database import get_async_db, get_db
+from app.models import FinancialData, User
 from app.auth import get_user_id_from_token
+from app.finance_aggregates import get_data_version, get_data_version_async, get_history_before, get_stored_histories
+from app import category_cache, fraud_queue, mcc_frequency, model_registry
+from app.lazy_imports import lazy_import
+from app.pagination import TOTAL_MODES, count_rows, keyset_page
+from app.ttl_cache import TTLCache
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+joblib = lazy_import("joblib")
+xgb = lazy_import("xgboost")
 
 router = APIRouter()
 
@@ -20,8 +32,13 @@ router = APIRouter()
 MODELS_DIR = Path(__file__).parent.parent.parent / "models"
 MODEL_PATH = MODELS_DIR / "fraud_detection_pipeline.pkl"
 
-# Global model cache
-_model = None
+FRAUD_MODEL = "fraud"
+model_registry.register(FRAUD_MODEL, MODEL_PATH, lambda f: joblib.load(f))  # joblib imported on first load
+
+# /fraud/history responses (dashboards poll it); FRAUD_HISTORY_CACHE_TTL_SECONDS=0 disables
+FRAUD_HISTORY_CACHE_SIZE = int(os.getenv("FRAUD_HISTORY_CACHE_SIZE", "1024"))
+FRAUD_HISTORY_CACHE_TTL_SECONDS = float(os.getenv("FRAUD_HISTORY_CACHE_TTL_SECONDS", "5"))
+_history_cache = TTLCache(FRAUD_HISTORY_CACHE_SIZE, FRAUD_HISTORY_CACHE_TTL_SECONDS)
 
 # Fraud detection threshold (from model training)
 FRAUD_THRESHOLD = 0.72
@@ -34,24 +51,23 @@ PAYMENT_CODE_MAP = {
 }
 DEFAULT_PAYMENT_CODE = 1  # Default to Swipe if not specified
 
+# Model input columns, in the order the booster was trained with
+FEATURE_COLUMNS = [
+    'amount_log', 'hour', 'is_weekend', 'payment_code', 'mcc_simple',
+    'hours_since_last_tx', 'client_total_tx', 'amount_zscore',
+    'mcc_rarity', 'is_unusual_hour'
+]
+
 
 def load_fraud_model():
-    """Load the XGBoost fraud detection model."""
-    global _model
-    
-    if _model is not None:
-        return _model
-    
-    if not MODEL_PATH.exists():
+    """The XGBoost fraud detection model (preloaded and hot-reloaded by app.model_registry)."""
+    try:
+        return model_registry.get(FRAUD_MODEL).model
+    except FileNotFoundError:
         raise HTTPException(
             status_code=404,
             detail="Fraud detection model not found. Please ensure fraud_detection_pipeline.pkl exists in backend/models/"
         )
-    
-    try:
-        _model = joblib.load(MODEL_PATH)
-        print(f"✅ Fraud model loaded: {type(_model)}")
-        return _model
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -59,6 +75,26 @@ def load_fraud_model():
         )
 
 
+def _get_data_version(db: Session, user_uuid: UUIDType) -> Optional[int]:
+    """The user's data version for cache keys; None if it cannot be read (column not migrated)."""
+    try:
+        return get_data_version(db, user_uuid)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Could not read data version: {e}")
+        return None
+
+
+async def _get_data_version_async(db: AsyncSession, user_uuid: UUIDType) -> Optional[int]:
+    """_get_data_version() on an async session."""
+    try:
+        return await get_data_version_async(db, user_uuid)
+    except Exception as e:
+        await db.rollback()
+        print(f"⚠️ Could not read data version: {e}")
+        return None
+
+
 def get_mcc_simple_from_category(category_name: str, db: Session) -> int:
     """
     Get mcc_simple (MCC code % 100) from category name.
@@ -66,11 +102,14 @@ def get_mcc_simple_from_category(category_name: str, db: Session) -> int:
     """
     if not category_name:
         return 0
-    
-    category = db.query(Category).filter(Category.name == category_name).first()
-    if category and category.mcc_code:
+    return _mcc_simple(category_cache.get_category(category_name, db))
+
+
+def _mcc_simple(category: Optional[dict]) -> int:
+    """mcc_simple of a category_cache entry (0 if missing or without a usable MCC code)."""
+    if category and category["mcc_code"]:
         try:
-            mcc_code = int(category.mcc_code)
+            mcc_code = int(category["mcc_code"])
             # Use modulo 100 to get simplified MCC code
             return mcc_code % 100
         except (ValueError, TypeError):
@@ -90,6 +129,18 @@ def get_payment_code_from_use_chip(use_chip: str) -> int:
     return PAYMENT_CODE_MAP.get(use_chip, DEFAULT_PAYMENT_CODE)
 
 
+def _std_from_sums(count, total, total_sq):
+    """
+    Population standard deviation (np.std) from count, sum and sum of squares.
+    Works element-wise on arrays. A relative tolerance absorbs the cancellation
+    error that would otherwise turn a constant history into a tiny non-zero std.
+    """
+    mean = total / np.maximum(count, 1)
+    variance = np.maximum(total_sq / np.maximum(count, 1) - mean * mean, 0.0)
+    variance = np.where(variance > 1e-12 * mean * mean, variance, 0.0)
+    return np.sqrt(variance)
+
+
 def calculate_engineered_features(
     user_uuid: UUIDType,
     amount_log: float,
@@ -108,29 +159,27 @@ def calculate_engineered_features(
     - mcc_rarity (float64): Rarity score of MCC code (0-1)
     - is_unusual_hour (int64): 1 if hour is unusual (22-5), 0 otherwise
     """
-    # Get user's transaction history from finance_data table
-    user_history = db.query(FinancialData).filter(
-        FinancialData.user_id == user_uuid,
-        FinancialData.date < transaction_date
-    ).order_by(desc(FinancialData.date)).all()
+    # User's history aggregate (count, sum, sum of squares, last date) from
+    # user_transaction_stats; O(1) unless the transaction is backdated
+    history_count, history_sum, history_sum_sq, last_tx_date = get_history_before(
+        db, user_uuid, transaction_date
+    )
     
     # 1. hours_since_last_tx
-    if user_history:
-        last_tx = user_history[0]
-        time_diff = transaction_date - last_tx.date
+    if history_count > 0 and last_tx_date is not None:
+        time_diff = transaction_date - last_tx_date
         hours_since_last_tx = time_diff.total_seconds() / 3600.0
     else:
         # Default for first transaction (24 hours as a reasonable default)
         hours_since_last_tx = 24.0
     
     # 2. client_total_tx
-    client_total_tx = len(user_history)
+    client_total_tx = history_count
     
     # 3. amount_zscore (use abs() to match training)
-    if user_history and len(user_history) >= 2:
-        amounts = [float(tx.amount) for tx in user_history]
-        mean_amount = np.mean(amounts)
-        std_amount = np.std(amounts)
+    if history_count >= 2:
+        mean_amount = history_sum / history_count
+        std_amount = _std_from_sums(history_count, history_sum, history_sum_sq)
         if std_amount > 0:
             # Convert from log back to amount for comparison (using expm1 for log1p inverse)
             current_amount = np.expm1(amount_log)
@@ -141,31 +190,9 @@ def calculate_engineered_features(
         # Default for new users or insufficient history
         amount_zscore = 0.0
     
-    # 4. mcc_rarity - Calculate based on frequency in all transactions
-    # Get all categories and their counts
-    total_tx_count = db.query(func.count(FinancialData.id)).scalar() or 1
-    
-    # Count transactions with same MCC code (by looking up category)
-    # For simplicity, we'll use the mcc_simple directly
-    if mcc_simple > 0:
-        # Find categories with this MCC code
-        categories_with_mcc = db.query(Category.name).filter(Category.mcc_code == str(mcc_simple)).all()
-        category_names = [c[0] for c in categories_with_mcc]
-        
-        if category_names:
-            mcc_count = db.query(func.count(FinancialData.id)).filter(
-                FinancialData.category.in_(category_names)
-            ).scalar() or 0
-        else:
-            mcc_count = 0
-    else:
-        mcc_count = db.query(func.count(FinancialData.id)).filter(
-            FinancialData.category.is_(None)
-        ).scalar() or 0
-    
-    # mcc_rarity = frequency (how common this merchant type is, matching training)
-    mcc_frequency = mcc_count / total_tx_count
-    mcc_rarity = mcc_frequency
+    # 4. mcc_rarity = frequency (how common this merchant type is, matching training),
+    # served from the in-process category frequency cache
+    mcc_rarity = mcc_frequency.mcc_rarity(mcc_simple, db)
     
     # 5. is_unusual_hour (early morning: 00:00 - 05:00, matching training)
     is_unusual_hour = 1 if (hour >= 0 and hour <= 5) else 0
@@ -272,11 +299,7 @@ def check_transaction_for_fraud_internal(
             engineered_features['amount_zscore'],
             engineered_features['mcc_rarity'],
             engineered_features['is_unusual_hour']
-        ]], columns=[
-            'amount_log', 'hour', 'is_weekend', 'payment_code', 'mcc_simple',
-            'hours_since_last_tx', 'client_total_tx', 'amount_zscore',
-            'mcc_rarity', 'is_unusual_hour'
-        ])
+        ]], columns=FEATURE_COLUMNS)
         
         # Convert to XGBoost DMatrix for prediction
         dmatrix = xgb.DMatrix(features)
@@ -297,36 +320,224 @@ def check_transaction_for_fraud_internal(
         return (0, 0.0)
 
 
+def _load_history_window(
+    user_uuid: UUIDType,
+    window_start: datetime,
+    window_end: datetime,
+    db: Session
+) -> tuple:
+    """
+    Load the user's history needed to score transactions dated in [window_start, window_end].
+
+    Returns (base, window_dates, window_amounts) where base is the
+    (count, sum, sum_of_squares, last_date) aggregate of every transaction before
+    window_start (see get_history_before), and the arrays hold the transactions inside the window sorted by date.
+    Only the window rows are materialized, so memory is bounded by the chunk's date span.
+    """
+    base = get_history_before(db, user_uuid, window_start)
+
+    window_rows = db.query(FinancialData.date, FinancialData.amount).filter(
+        FinancialData.user_id == user_uuid,
+        FinancialData.date >= window_start,
+        FinancialData.date < window_end
+    ).order_by(FinancialData.date).all()
+
+    window_dates = np.array([row[0] for row in window_rows], dtype='datetime64[us]')
+    window_amounts = np.array([float(row[1]) for row in window_rows], dtype=np.float64)
+
+    return base, window_dates, window_amounts
+
+
+def score_transactions_batch(
+    transactions: pd.DataFrame,
+    user_uuid: UUIDType,
+    db: Session
+) -> tuple:
+    """
+    Score a chunk of transactions for fraud with a single model call.
+
+    `transactions` needs 'date', 'amount', 'category' and 'use_chip' columns
+    (already cleaned, as they will be stored). Every row is scored against the
+    user's persisted history dated strictly before it - the same history
+    check_transaction_for_fraud_internal sees - so rows of the chunk itself do not
+    influence each other, while rows from earlier, already committed chunks do.
+
+    Returns (is_fraud, fraud_probability) arrays aligned with the input rows.
+    """
+    if len(transactions) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    dates = pd.to_datetime(transactions['date']).to_numpy(dtype='datetime64[us]')
+
+    # User history aggregates from prefix sums over the chunk's date window
+    base, window_dates, window_amounts = _load_history_window(
+        user_uuid, dates.min().item(), dates.max().item(), db
+    )
+    base_count, base_sum, base_sumsq, base_last = base
+    prefix_sum = np.concatenate(([0.0], np.cumsum(window_amounts)))
+    prefix_sumsq = np.concatenate(([0.0], np.cumsum(window_amounts * window_amounts)))
+
+    position = np.searchsorted(window_dates, dates, side='left')
+    client_total_tx = base_count + position
+    history_sum = base_sum + prefix_sum[position]
+    history_sumsq = base_sumsq + prefix_sumsq[position]
+
+    last_in_window = window_dates[np.maximum(position - 1, 0)] if len(window_dates) else dates
+    if base_last is not None:
+        fallback_last = np.datetime64(base_last, 'us')
+    else:
+        fallback_last = np.datetime64('NaT', 'us')
+    last_tx = np.where(position > 0, last_in_window, fallback_last)
+
+    return _score_with_history(
+        transactions, dates, client_total_tx, history_sum, history_sumsq, last_tx, db
+    )
+
+
+def score_stored_transactions(transactions: pd.DataFrame, db: Session) -> tuple:
+    """
+    Score transactions that are already stored (e.g. rows queued for asynchronous scoring).
+
+    `transactions` needs 'user_id', 'date', 'amount', 'category' and 'use_chip' columns and
+    may mix users. Each row's history is everything its user has dated strictly before it,
+    derived from the user's stats row with the row itself taken out (get_stored_histories,
+    one lookup per user); all rows are then scored with a single model call.
+
+    Returns (is_fraud, fraud_probability) arrays aligned with the input rows.
+    """
+    if len(transactions) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    dates = pd.to_datetime(transactions['date']).to_numpy(dtype='datetime64[us]')
+    histories = [None] * len(transactions)
+    for user_uuid, positions in transactions.groupby('user_id', sort=False, dropna=False).indices.items():
+        user_histories = get_stored_histories(db, user_uuid, [dates[i].item() for i in positions])
+        for i, history in zip(positions, user_histories):
+            histories[i] = history
+    client_total_tx = np.array([h[0] for h in histories], dtype=np.int64)
+    history_sum = np.array([h[1] for h in histories], dtype=np.float64)
+    history_sumsq = np.array([h[2] for h in histories], dtype=np.float64)
+    last_tx = np.array(
+        [h[3] if h[3] is not None else np.datetime64('NaT') for h in histories],
+        dtype='datetime64[us]'
+    )
+
+    return _score_with_history(
+        transactions, dates, client_total_tx, history_sum, history_sumsq, last_tx, db
+    )
+
+
+def _score_with_history(
+    transactions: pd.DataFrame,
+    dates: np.ndarray,
+    client_total_tx: np.ndarray,
+    history_sum: np.ndarray,
+    history_sumsq: np.ndarray,
+    last_tx: np.ndarray,
+    db: Session
+) -> tuple:
+    """
+    Vectorized counterpart of check_transaction_for_fraud_internal: build the ten model
+    features from each row's history aggregate (count, sum, sum of squares, last date;
+    NaT when there is no history) and score all rows with one DMatrix/predict call.
+    """
+    model = load_fraud_model()
+
+    amounts = transactions['amount'].astype(float).abs().to_numpy()
+
+    # Per-transaction features
+    amount_log = np.log1p(amounts)
+    date_index = pd.DatetimeIndex(dates)
+    hour = date_index.hour.to_numpy(dtype=np.int64)
+    is_weekend = (date_index.weekday.to_numpy() >= 5).astype(np.int64)
+    payment_code = np.array(
+        [get_payment_code_from_use_chip(u) for u in transactions['use_chip']], dtype=np.int64
+    )
+    mcc_by_category = {}
+    for category in transactions['category'].dropna().unique():
+        mcc_by_category[category] = get_mcc_simple_from_category(category, db)
+    mcc_simple = np.array(
+        [mcc_by_category.get(c, 0) if c else 0 for c in transactions['category']], dtype=np.int64
+    )
+
+    # Engineered features
+    has_history = client_total_tx > 0
+    hours_since_last_tx = np.where(
+        has_history,
+        (dates - last_tx) / np.timedelta64(1, 'h'),
+        24.0
+    ).astype(np.float64)
+
+    mean_amount = history_sum / np.maximum(client_total_tx, 1)
+    std_amount = _std_from_sums(client_total_tx, history_sum, history_sumsq)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = np.abs((np.expm1(amount_log) - mean_amount) / std_amount)
+    amount_zscore = np.where((client_total_tx >= 2) & (std_amount > 0), zscore, 0.0)
+
+    rarity_by_mcc = {int(m): mcc_frequency.mcc_rarity(int(m), db) for m in np.unique(mcc_simple)}
+    mcc_rarity = np.array([rarity_by_mcc[int(m)] for m in mcc_simple], dtype=np.float64)
+    is_unusual_hour = ((hour >= 0) & (hour <= 5)).astype(np.int64)
+
+    features = pd.DataFrame({
+        'amount_log': amount_log.astype(np.float64),
+        'hour': hour,
+        'is_weekend': is_weekend,
+        'payment_code': payment_code,
+        'mcc_simple': mcc_simple,
+        'hours_since_last_tx': hours_since_last_tx,
+        'client_total_tx': client_total_tx.astype(np.int64),
+        'amount_zscore': amount_zscore.astype(np.float64),
+        'mcc_rarity': mcc_rarity,
+        'is_unusual_hour': is_unusual_hour
+    }, columns=FEATURE_COLUMNS)
+
+    fraud_probability = model.predict(xgb.DMatrix(features)).astype(np.float64)
+    is_fraud = (fraud_probability > FRAUD_THRESHOLD).astype(np.int64)
+
+    print(f"✅ Batch fraud check: {len(features)} transactions, {int(is_fraud.sum())} flagged")
+
+    return is_fraud, fraud_probability
+
+
 @router.get("/fraud/history")
-def get_fraud_detection_history(
+async def get_fraud_detection_history(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     is_fraud: Optional[int] = None,  # 0 or 1
     limit: int = 100,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,  # "exact", "estimate" or "none"
+    db: AsyncSession = Depends(get_async_db),
     user_id: str = Depends(get_user_id_from_token)
 ):
     """
     Get fraud detection history for the authenticated user from FinancialData table.
     Optional filters: start_date, end_date (format: YYYY-MM-DD), is_fraud (0 or 1)
+    Pagination as in GET /finance/data: `cursor` = previous next_cursor, `total` mode.
+    Responses are cached for FRAUD_HISTORY_CACHE_TTL_SECONDS (X-Fraud-History-Cache HIT/MISS).
     """
     try:
         user_uuid = UUIDType(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
+
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+    total_mode = total or ("none" if cursor else "exact")
+    if total_mode not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail=f"total must be one of: {', '.join(TOTAL_MODES)}")
     
-    # Query financial data with fraud detection results
-    query = db.query(FinancialData).filter(
-        FinancialData.user_id == user_uuid,
-        FinancialData.is_fraud.isnot(None)  # Only include transactions that have been checked
-    )
+    # Only transactions that have been checked
+    checked = (FinancialData.user_id == user_uuid, FinancialData.is_fraud.isnot(None))
+    filters = []
     
     # Apply date filters
     if start_date:
         try:
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            query = query.filter(FinancialData.date >= start_dt)
+            filters.append(FinancialData.date >= start_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
     
@@ -334,41 +545,55 @@ def get_fraud_detection_history(
         try:
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
             end_dt = end_dt.replace(hour=23, minute=59, second=59)
-            query = query.filter(FinancialData.date <= end_dt)
+            filters.append(FinancialData.date <= end_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
     
     # Apply fraud filter
     if is_fraud is not None:
-        query = query.filter(FinancialData.is_fraud == is_fraud)
-    
-    # Order by date descending
-    query = query.order_by(desc(FinancialData.date))
-    
-    # Get total count
-    total_count = query.count()
-    
-    # Apply pagination
-    transactions = query.offset(offset).limit(limit).all()
-    
-    # Calculate summary statistics
-    fraud_count = db.query(FinancialData).filter(
-        FinancialData.user_id == user_uuid,
-        FinancialData.is_fraud == 1
-    ).count()
-    
-    legitimate_count = db.query(FinancialData).filter(
-        FinancialData.user_id == user_uuid,
-        FinancialData.is_fraud == 0
-    ).count()
+        filters.append(FinancialData.is_fraud == is_fraud)
+
+    # Polling dashboards: identical requests within the TTL are served from memory.
+    # New inserts change the key; async scoring results show up once the entry expires.
+    cache_key = None
+    if FRAUD_HISTORY_CACHE_TTL_SECONDS > 0:
+        cache_key = (user_uuid, start_date, end_date, is_fraud, limit, offset, cursor, total_mode,
+                     await _get_data_version_async(db, user_uuid))
+        cached = _history_cache.get(cache_key)
+        if cached is not None:
+            response.headers["X-Fraud-History-Cache"] = "HIT"
+            return copy.deepcopy(cached)
+        response.headers["X-Fraud-History-Cache"] = "MISS"
+
+    query = select(FinancialData).where(*checked, *filters)
+
+    # Newest first, one (date, id) index range per page
+    try:
+        transactions, next_cursor = await keyset_page(
+            db, query, FinancialData.date, FinancialData.id, limit, cursor=cursor, offset=offset
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Filtered total and summary statistics in one pass over the user's checked rows
+    filtered_count, fraud_count, legitimate_count = (await db.execute(select(
+        func.count().filter(and_(*filters)) if filters else func.count(),
+        func.count().filter(FinancialData.is_fraud == 1),
+        func.count().filter(FinancialData.is_fraud == 0),
+    ).where(*checked))).one()
+    total_count = filtered_count if total_mode == "exact" else await count_rows(db, query, total_mode)
+    categories_by_name = await category_cache.get_categories_by_name_async(db)
     
-    return {
+    result = {
         "status": "success",
         "total_count": total_count,
+        "total_estimated": total_mode == "estimate",
         "fraud_count": fraud_count,
         "legitimate_count": legitimate_count,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
         "data": [
             {
                 "id": tx.id,
@@ -380,10 +605,54 @@ def get_fraud_detection_history(
                 "category": tx.category,
                 "use_chip": tx.use_chip,
                 "payment_code": get_payment_code_from_use_chip(tx.use_chip),
-                "mcc_simple": get_mcc_simple_from_category(tx.category, db),
+                "mcc_simple": _mcc_simple(categories_by_name.get(tx.category)),
                 "transaction_date": tx.date.isoformat(),
                 "created_at": tx.created_at.isoformat() if tx.created_at else None
             }
             for tx in transactions
         ]
     }
+    if cache_key is not None:
+        _history_cache.set(cache_key, copy.deepcopy(result))
+    return result
+
+
+@router.get("/fraud/pending")
+def get_pending_fraud_checks(
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    List the authenticated user's transactions still waiting for asynchronous fraud scoring
+    (added with async_fraud_check). Scored rows move to /fraud/history.
+    """
+    try:
+        user_uuid = UUIDType(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
+
+    query = db.query(FinancialData).filter(
+        FinancialData.user_id == user_uuid,
+        FinancialData.fraud_check_status == fraud_queue.STATUS_PENDING
+    )
+    pending_count = query.count()
+    pending = query.order_by(FinancialData.id).limit(limit).all()
+
+    return {
+        "status": "success",
+        "pending_count": pending_count,
+        "queue_running": fraud_queue.is_running(),
+        "queue_depth": fraud_queue.queue_depth(),
+        "data": [
+            {
+                "id": tx.id,
+                "amount": float(tx.amount),
+                "category": tx.category,
+                "transaction_date": tx.date.isoformat(),
+                "fraud_status": tx.fraud_check_status,
+                "created_at": tx.created_at.isoformat() if tx.created_at else None
+            }
+            for tx in pending
+        ]
+    }
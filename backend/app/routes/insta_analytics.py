@@ -1,30 +1,149 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-import requests
-from requests.exceptions import RequestException, Timeout
+import asyncio
+import functools
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import httpx
 from uuid import UUID as UUIDType
 
-from app.database import get_db
-from app.models import User
+from app import meta_accounts
+from app.database import get_async_db
+from app.models import SocialPostSnapshot, User
 from app.auth import get_user_id_from_token
 
 router = APIRouter()
 
+GRAPH_API_URL = "https://graph.facebook.com/v24.0"
+
+# Per-post insights/comments calls in flight at once (per request), and the time
+# budget of each of those calls; a post whose call fails or overruns is returned partial
+INSTAGRAM_GRAPH_CONCURRENCY = int(os.getenv("INSTAGRAM_GRAPH_CONCURRENCY", "8"))
+INSTAGRAM_GRAPH_CALL_TIMEOUT_SECONDS = float(os.getenv("INSTAGRAM_GRAPH_CALL_TIMEOUT_SECONDS", "10"))
+
+# Media listing: posts per Graph page, the posts listed without `limit` or `since`
+# (Graph's default first page), and the most posts one call lists
+INSTAGRAM_MEDIA_PAGE_SIZE = int(os.getenv("INSTAGRAM_MEDIA_PAGE_SIZE", "50"))
+INSTAGRAM_MEDIA_DEFAULT_POSTS = int(os.getenv("INSTAGRAM_MEDIA_DEFAULT_POSTS", "25"))
+INSTAGRAM_MEDIA_MAX_POSTS = int(os.getenv("INSTAGRAM_MEDIA_MAX_POSTS", "500"))
+
+# Posts published more than this many days ago reuse the stats and comments of the
+# latest snapshot (app.social_snapshots) if it is at most INSTAGRAM_SNAPSHOT_MAX_AGE_SECONDS
+# old, instead of two Graph calls each; 0 always queries every post
+INSTAGRAM_INSIGHTS_REFRESH_DAYS = float(os.getenv("INSTAGRAM_INSIGHTS_REFRESH_DAYS", "7"))
+INSTAGRAM_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("INSTAGRAM_SNAPSHOT_MAX_AGE_SECONDS", "86400"))
+
+# Shared by all requests for keep-alive; created on first use, closed on shutdown (app.main)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=30)
+    return _client
 
-def _graph_get(url: str, params: dict, timeout: int = 30):
+
+async def close_client() -> None:
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+async def _graph_get(url: str, params: dict, timeout: float = 30,
+                     client: Optional[httpx.AsyncClient] = None):
+    """GET a Graph API URL; client defaults to the shared one, which belongs to the server's event loop."""
+    client = client or _get_client()
     try:
-        response = requests.get(url, params=params, timeout=timeout)
+        # wait_for bounds the whole call; httpx timeouts apply per connect/read
+        response = await asyncio.wait_for(client.get(url, params=params, timeout=timeout), timeout)
         response.raise_for_status()
         return response.json()
-    except Timeout:
+    except (asyncio.TimeoutError, httpx.TimeoutException):
         raise HTTPException(status_code=504, detail="Instagram Graph API request timed out.")
-    except RequestException as exc:
+    except httpx.HTTPStatusError as exc:
+        # Graph's own message; str(exc) would include the URL and its access_token
+        try:
+            message = exc.response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = exc.response.reason_phrase
+        raise HTTPException(
+            status_code=502,
+            detail=f"Instagram Graph API request failed: HTTP {exc.response.status_code}: {message}"
+        )
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"Instagram Graph API request failed: {exc}")
 
 
+async def _post_call(semaphore: asyncio.Semaphore, url: str, params: dict,
+                     client: Optional[httpx.AsyncClient] = None) -> tuple:
+    """(response, error) of one per-post call; failures are returned, not raised."""
+    async with semaphore:
+        try:
+            return await _graph_get(url, params, timeout=INSTAGRAM_GRAPH_CALL_TIMEOUT_SECONDS, client=client), None
+        except HTTPException as exc:
+            return {}, exc.detail
+
+
+def _parse_since(value: str) -> datetime:
+    """Watermark as an aware UTC datetime: YYYY-MM-DD, an ISO datetime or unix seconds."""
+    try:
+        if value.isdigit():
+            return datetime.fromtimestamp(int(value), tz=timezone.utc)
+        moment = datetime.fromisoformat(value)
+    except (ValueError, OverflowError, OSError):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid since format. Use YYYY-MM-DD, an ISO 8601 datetime or unix seconds",
+        )
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _media_time(post: dict) -> Optional[datetime]:
+    try:
+        return datetime.strptime(post["timestamp"], "%Y-%m-%dT%H:%M:%S%z")  # e.g. 2024-05-01T12:00:00+0000
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def _snapshot_entries(db: AsyncSession, user_uuid: UUIDType) -> dict:
+    """
+    {post_id: (collected_at, post entry)} of the user's newest Instagram snapshot
+    (app.social_snapshots) if it is at most INSTAGRAM_SNAPSHOT_MAX_AGE_SECONDS old.
+    """
+    if INSTAGRAM_INSIGHTS_REFRESH_DAYS <= 0:
+        return {}
+    user_rows = (SocialPostSnapshot.user_id == user_uuid, SocialPostSnapshot.platform == "instagram")
+    bucket = await db.scalar(select(func.max(SocialPostSnapshot.bucket)).where(*user_rows))
+    if bucket is None:
+        return {}
+    rows = await db.execute(
+        select(SocialPostSnapshot.post_id, SocialPostSnapshot.collected_at, SocialPostSnapshot.payload)
+        .where(
+            *user_rows,
+            SocialPostSnapshot.bucket == bucket,
+            SocialPostSnapshot.collected_at >= datetime.utcnow() - timedelta(seconds=INSTAGRAM_SNAPSHOT_MAX_AGE_SECONDS),
+            SocialPostSnapshot.payload.isnot(None),
+        )
+    )
+    entries = {}
+    for post_id, collected_at, payload in rows:
+        entry = json.loads(payload)
+        if not entry.get("partial"):
+            entries[post_id] = (collected_at, entry)
+    return entries
+
+
 @router.get("/instagram/page-analytics")
-def get_instagram_post_analytics(
-    db: Session = Depends(get_db),
+async def get_instagram_post_analytics(
+    limit: Optional[int] = Query(None, ge=1, description="Newest posts to return (default 25, or all since `since`; at most INSTAGRAM_MEDIA_MAX_POSTS)"),
+    since: Optional[str] = Query(None, description="Only posts published since: YYYY-MM-DD, ISO 8601 datetime or unix seconds"),
+    db: AsyncSession = Depends(get_async_db),
     user_id: str = Depends(get_user_id_from_token)  # Get from JWT token
 ):
     # 1. Fetch user from DB by user_id (UUID from auth.users)
@@ -32,90 +151,164 @@ def get_instagram_post_analytics(
         user_uuid = UUIDType(user_id)
     except ValueError:
         return {"error": "Invalid user_id format. Expected UUID."}
-    
-    user = db.query(User).filter(User.user_id == user_uuid).first()
+
+    since_dt = _parse_since(since) if since else None
+
+    user = await db.scalar(select(User).where(User.user_id == user_uuid).limit(1))
     if not user:
         return {"error": "User not found"}
 
-    user_token = user.session_token
-
-    # 2. Get Pages the user manages
-    pages_resp = _graph_get(
-        "https://graph.facebook.com/v24.0/me/accounts",
-        params={"access_token": user_token}
+    return await fetch_instagram_post_analytics(
+        user_uuid, user.session_token, limit=limit, since=since_dt,
+        snapshots=await _snapshot_entries(db, user_uuid),
     )
 
-    if "data" not in pages_resp or not pages_resp["data"]:
-        return {"error": "No Facebook Pages found", "details": pages_resp}
 
-    # Pick first page (or filter here)
-    page_info = pages_resp["data"][0]
-    page_token = page_info["access_token"]
-    page_id = page_info["id"]
+async def _list_media(graph_get, ig_user_id: str, page_token: str, limit: int,
+                      since: Optional[datetime]) -> tuple:
+    """
+    (posts newest first, has_more, error) following paging.next until limit posts,
+    the since watermark or the last page. error is the first page's response when it
+    has no data (nothing listed), or the detail of a later page that failed.
+    """
+    url = f"{GRAPH_API_URL}/{ig_user_id}/media"
+    params = {
+        "fields": "id,caption,media_type,media_url,timestamp,permalink",
+        "limit": min(limit, INSTAGRAM_MEDIA_PAGE_SIZE),
+        "access_token": page_token
+    }
+    if since is not None:
+        params["since"] = int(since.timestamp())
 
-    # 3. Get Instagram Business Account linked to Page
-    ig_resp = _graph_get(
-        f"https://graph.facebook.com/v24.0/{page_id}",
-        params={
-            "fields": "instagram_business_account",
-            "access_token": page_token
-        }
-    )
+    posts = []
+    while True:
+        try:
+            media_resp = await graph_get(url, params)
+        except HTTPException as exc:
+            if not posts:
+                raise
+            return posts, True, exc.detail
+        if "data" not in media_resp:
+            return posts, bool(posts), media_resp if not posts else media_resp.get("error", media_resp)
 
-    if "instagram_business_account" not in ig_resp:
-        return {"error": "No Instagram business account linked", "details": ig_resp}
+        for index, post in enumerate(media_resp["data"]):
+            published = _media_time(post)
+            if since is not None and published is not None and published < since:
+                return posts, False, None  # newest first: the rest is older too
+            posts.append(post)
+            if len(posts) >= limit:
+                more = index + 1 < len(media_resp["data"]) or bool(media_resp.get("paging", {}).get("next"))
+                return posts, more, None
 
-    ig_user_id = ig_resp["instagram_business_account"]["id"]
+        next_url = media_resp.get("paging", {}).get("next")
+        if not next_url:
+            return posts, False, None
+        # The cursor URL carries every parameter (and the token); params={} would strip them
+        url, params = next_url, None
 
-    # 4. Get Instagram media (posts)
-    media_resp = _graph_get(
-        f"https://graph.facebook.com/v24.0/{ig_user_id}/media",
-        params={
-            "fields": "id,caption,media_type,media_url,timestamp,permalink",
-            "access_token": page_token
-        }
+
+def _media_fields(post: dict) -> dict:
+    return {
+        "post_id": post["id"],
+        "caption": post.get("caption"),
+        "media_type": post.get("media_type"),
+        "media_url": post.get("media_url"),
+        "timestamp": post.get("timestamp"),
+        "post_url": post.get("permalink"),
+    }
+
+
+async def fetch_instagram_post_analytics(user_uuid: UUIDType, session_token: str,
+                                         client: Optional[httpx.AsyncClient] = None,
+                                         limit: Optional[int] = None,
+                                         since: Optional[datetime] = None,
+                                         snapshots: Optional[dict] = None) -> dict:
+    """
+    Steps 2-5 of GET /instagram/page-analytics; also used by the snapshot collector
+    (app.social_snapshots), which runs its own event loop and passes its own client.
+
+    Lists up to limit posts (default INSTAGRAM_MEDIA_DEFAULT_POSTS, or every post
+    published since `since`; capped at INSTAGRAM_MEDIA_MAX_POSTS). Posts older than INSTAGRAM_INSIGHTS_REFRESH_DAYS that are in `snapshots`
+    (see _snapshot_entries) keep their snapshot stats and comments instead of being
+    queried again; their entries carry "snapshot_at".
+    """
+    graph_get = functools.partial(_graph_get, client=client)
+    if limit is None:
+        # Each listed post may cost two Graph calls: only page on when asked to
+        limit = INSTAGRAM_MEDIA_MAX_POSTS if since is not None else INSTAGRAM_MEDIA_DEFAULT_POSTS
+    limit = min(limit, INSTAGRAM_MEDIA_MAX_POSTS)
+    snapshots = snapshots or {}
+
+    # 2-3. First Page the user manages, its token and linked Instagram business account
+    # (cached per user, see app.meta_accounts)
+    account, pages_resp = await meta_accounts.resolve_async(
+        user_uuid, session_token, graph_get, instagram=True
     )
+    if account is None:
+        return {"error": "No Facebook Pages found", "details": pages_resp}
 
-    if "data" not in media_resp:
-        return {"error": "Failed to fetch Instagram posts", "details": media_resp}
+    page_token = account.page_token
+    if account.ig_error is not None:
+        # Expired token, missing permission...: Graph's error body, not "no account"
+        return {"error": "Failed to fetch Instagram business account", "details": account.ig_error}
+    if account.ig_user_id is None:
+        # What Graph returns for a Page without a linked account
+        return {"error": "No Instagram business account linked", "details": {"id": account.page_id}}
 
-    analytics = []
+    ig_user_id = account.ig_user_id
+
+    # 4. Get Instagram media (posts), following the cursor pages
+    posts, has_more, media_error = await _list_media(graph_get, ig_user_id, page_token, limit, since)
 
-    for post in media_resp["data"]:
+    if not posts and media_error is not None:
+        return {"error": "Failed to fetch Instagram posts", "details": media_error}
+
+    # 5. Insights and comments concurrently, for the posts not served from a snapshot
+    refresh_after = datetime.now(timezone.utc) - timedelta(days=INSTAGRAM_INSIGHTS_REFRESH_DAYS)
+    semaphore = asyncio.Semaphore(INSTAGRAM_GRAPH_CONCURRENCY)
+    calls = []
+    queried = []
+    for post in posts:
         post_id = post["id"]
+        published = _media_time(post)
+        if post_id in snapshots and published is not None and published < refresh_after:
+            continue
+        queried.append(post_id)
+        # Basic metrics (likes, comments, saves, shares, reach, impressions)
+        calls.append(_post_call(semaphore, f"{GRAPH_API_URL}/{post_id}/insights", {
+            "metric": "likes,comments,shares,saved,reach,impressions",
+            "access_token": page_token
+        }, client))
+        # Comments list
+        calls.append(_post_call(semaphore, f"{GRAPH_API_URL}/{post_id}/comments", {
+            "fields": "id,text,username,timestamp,like_count",
+            "access_token": page_token
+        }, client))
+    results = await asyncio.gather(*calls)
+    fetched = {post_id: results[2 * index:2 * index + 2] for index, post_id in enumerate(queried)}
 
-        # ----- Basic metrics (likes, comments, saves, shares, reach, impressions) -----
-        metrics_resp = _graph_get(
-            f"https://graph.facebook.com/v24.0/{post_id}/insights",
-            params={
-                "metric": "likes,comments,shares,saved,reach,impressions",
-                "access_token": page_token
-            }
-        )
+    analytics = []
+
+    for post in posts:
+        if post["id"] not in fetched:
+            collected_at, entry = snapshots[post["id"]]
+            # Fresh listing fields (media_url is a signed URL that expires) over the snapshot stats
+            analytics.append({**entry, **_media_fields(post), "snapshot_at": collected_at.isoformat()})
+            continue
+
+        (metrics_resp, metrics_error), (comments_resp, comments_error) = fetched[post["id"]]
 
         metrics_dict = {}
         if "data" in metrics_resp:
             for m in metrics_resp["data"]:
                 metrics_dict[m["name"]] = m.get("values", [{}])[0].get("value", 0)
 
-        # ----- Fetch comments list -----
-        comments_resp = _graph_get(
-            f"https://graph.facebook.com/v24.0/{post_id}/comments",
-            params={
-                "fields": "id,text,username,timestamp,like_count",
-                "access_token": page_token
-            }
-        )
-
         comments_list = comments_resp.get("data", [])
 
+        errors = {name: error for name, error in (("insights", metrics_error), ("comments", comments_error)) if error}
+
         analytics.append({
-            "post_id": post_id,
-            "caption": post.get("caption"),
-            "media_type": post.get("media_type"),
-            "media_url": post.get("media_url"),
-            "timestamp": post.get("timestamp"),
-            "post_url": post.get("permalink"),
+            **_media_fields(post),
 
             # Stats
             "likes": metrics_dict.get("likes", 0),
@@ -126,10 +319,18 @@ def get_instagram_post_analytics(
             "impressions": metrics_dict.get("impressions", 0),
 
             # Full comment list
-            "comments": comments_list
+            "comments": comments_list,
+
+            # Set when insights or comments could not be fetched in time; stats/comments are then defaults
+            "partial": bool(errors),
+            **({"errors": errors} if errors else {}),
         })
 
     return {
         "instagram_account": ig_user_id,
+        # A later media page failed: the listing stops early
+        "partial": media_error is not None or any(post["partial"] for post in analytics),
+        **({"media_error": media_error} if media_error is not None else {}),
+        "has_more": has_more,
         "analytics": analytics
     }
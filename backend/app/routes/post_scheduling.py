@@ -10,6 +10,7 @@ import time
 from fastapi import APIRouter, Depends, File, Form, UploadFile
 from sqlalchemy.orm import Session
 
+from app import meta_accounts
 from app.auth import get_user_id_from_token
 from app.database import get_db
 from app.linkedin_post import publish_member_post
@@ -84,24 +85,19 @@ def post_dynamic(
         if not user_token:
             return {"error": "Connect Facebook to post to Facebook or Instagram."}
 
-        pages = requests.get(
-            "https://graph.facebook.com/v24.0/me/accounts",
-            params={"access_token": user_token},
-            timeout=60,
-        ).json()
+        # First page, its token and Instagram account (cached per user, see app.meta_accounts)
+        account, pages = meta_accounts.resolve(
+            user_uuid, user_token,
+            lambda url, params: requests.get(url, params=params, timeout=60).json(),
+            instagram=post_to_instagram,
+        )
 
-        if "data" not in pages or not pages["data"]:
+        if account is None:
             return {"error": "No FB pages found", "details": pages}
 
-        page_id = pages["data"][0]["id"]
-        page_token = pages["data"][0]["access_token"]
-
-        ig_data = requests.get(
-            f"https://graph.facebook.com/v24.0/{page_id}",
-            params={"fields": "instagram_business_account", "access_token": page_token},
-            timeout=60,
-        ).json()
-        ig_user_id = ig_data.get("instagram_business_account", {}).get("id")
+        page_id = account.page_id
+        page_token = account.page_token
+        ig_user_id = account.ig_user_id
 
         if image_bytes:
             fb_upload = requests.post(
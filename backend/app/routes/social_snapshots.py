@@ -0,0 +1,173 @@
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID as UUIDType
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import social_snapshots
+from app.auth import get_user_id_from_token
+from app.database import get_async_db, get_db
+from app.models import SocialPostSnapshot, User
+
+router = APIRouter()
+
+# Default window of /social/snapshots/history when start_date is omitted
+HISTORY_DEFAULT_DAYS = 30
+
+
+def _user_uuid(user_id: str) -> UUIDType:
+    try:
+        return UUIDType(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format. Expected UUID.")
+
+
+def _check_platform(platform: str) -> None:
+    if platform not in social_snapshots.PLATFORMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid platform. Use one of: {', '.join(social_snapshots.PLATFORMS)}",
+        )
+
+
+def _parse_date(value: str, name: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} format. Use YYYY-MM-DD")
+
+
+def _metrics(row) -> dict:
+    return {metric: getattr(row, metric) for metric in social_snapshots.METRICS}
+
+
+@router.get("/social/snapshots/latest")
+async def get_latest_snapshot(
+    platform: str,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    Newest collected bucket of the user's posts on a platform (facebook, instagram).
+    The "analytics" entries are those of GET /facebook/page-analytics or
+    /instagram/page-analytics at collection time.
+    """
+    user_uuid = _user_uuid(user_id)
+    _check_platform(platform)
+
+    user_rows = (SocialPostSnapshot.user_id == user_uuid, SocialPostSnapshot.platform == platform)
+    bucket = await db.scalar(select(func.max(SocialPostSnapshot.bucket)).where(*user_rows))
+    if bucket is None:
+        raise HTTPException(status_code=404, detail="No snapshot collected yet")
+
+    rows = (await db.scalars(
+        select(SocialPostSnapshot)
+        .where(*user_rows, SocialPostSnapshot.bucket == bucket)
+        .order_by(SocialPostSnapshot.position)
+    )).all()
+
+    return {
+        "platform": platform,
+        "account_id": rows[0].account_id,
+        "bucket": bucket.isoformat(),
+        "collected_at": max(row.collected_at for row in rows).isoformat(),
+        "analytics": [
+            json.loads(row.payload) if row.payload else {"post_id": row.post_id, **_metrics(row)}
+            for row in rows
+        ],
+    }
+
+
+@router.get("/social/snapshots/history")
+async def get_snapshot_history(
+    platform: str,
+    post_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    Metrics over time, one point per bucket, oldest first.
+    With post_id: that post's metrics. Without: totals over the user's posts per bucket
+    ("measured_posts" counts the posts whose metrics were fetched and are in the sums).
+    Optional filters: start_date (default: 30 days ago), end_date (format: YYYY-MM-DD)
+    """
+    user_uuid = _user_uuid(user_id)
+    _check_platform(platform)
+
+    if start_date:
+        start_dt = _parse_date(start_date, "start_date")
+    else:
+        start_dt = datetime.utcnow() - timedelta(days=HISTORY_DEFAULT_DAYS)
+    filters = [
+        SocialPostSnapshot.user_id == user_uuid,
+        SocialPostSnapshot.platform == platform,
+        SocialPostSnapshot.bucket >= start_dt,
+    ]
+    if end_date:
+        filters.append(SocialPostSnapshot.bucket < _parse_date(end_date, "end_date") + timedelta(days=1))
+
+    if post_id is not None:
+        rows = (await db.execute(
+            select(SocialPostSnapshot.bucket, SocialPostSnapshot.collected_at,
+                   *(getattr(SocialPostSnapshot, metric) for metric in social_snapshots.METRICS))
+            .where(*filters, SocialPostSnapshot.post_id == post_id)
+            .order_by(SocialPostSnapshot.bucket)
+        )).all()
+        points = [
+            {"bucket": row.bucket.isoformat(), "collected_at": row.collected_at.isoformat(), **_metrics(row)}
+            for row in rows
+        ]
+    else:
+        rows = (await db.execute(
+            select(
+                SocialPostSnapshot.bucket,
+                func.count().label("posts"),
+                func.count(SocialPostSnapshot.likes).label("measured_posts"),
+                *(func.sum(getattr(SocialPostSnapshot, metric)).label(metric)
+                  for metric in social_snapshots.METRICS),
+            )
+            .where(*filters)
+            .group_by(SocialPostSnapshot.bucket)
+            .order_by(SocialPostSnapshot.bucket)
+        )).all()
+        points = [
+            {
+                "bucket": row.bucket.isoformat(),
+                "posts": row.posts,
+                "measured_posts": row.measured_posts,
+                # SUM is NULL when no post had the metric (e.g. reach on Facebook)
+                **{metric: None if value is None else int(value) for metric, value in _metrics(row).items()},
+            }
+            for row in rows
+        ]
+
+    return {
+        "platform": platform,
+        "post_id": post_id,
+        "bucket_seconds": social_snapshots.SOCIAL_SNAPSHOT_BUCKET_SECONDS,
+        "count": len(points),
+        "history": points,
+    }
+
+
+@router.post("/social/snapshots/collect")
+def collect_snapshot_now(
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_user_id_from_token)
+):
+    """Collect the user's Facebook and Instagram posts into the current bucket now."""
+    user_uuid = _user_uuid(user_id)
+
+    user = db.query(User).filter(User.user_id == user_uuid).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not user.session_token:
+        raise HTTPException(status_code=400, detail="Facebook account not connected")
+
+    return {"status": "success", "results": social_snapshots.collect_user(db, user_uuid, user.session_token)}
@@ -0,0 +1,252 @@
+"""
+Time-bucketed snapshots of per-post Facebook and Instagram metrics.
+
+GET /facebook/page-analytics and /instagram/page-analytics fetch every post's
+metrics live from the Graph API on each call. A scheduler job instead collects them
+for every connected user (users.session_token set) every
+SOCIAL_SNAPSHOT_INTERVAL_SECONDS and writes one social_post_snapshots row per post
+and time bucket. app.routes.social_snapshots serves the latest bucket and the
+history from the database:
+
+  GET  /social/snapshots/latest    newest bucket, same post entries as the live endpoint
+  GET  /social/snapshots/history   one post's metrics over time, or per-bucket totals
+  POST /social/snapshots/collect   collect the calling user now
+
+- Rows are upserted on (user, platform, post, bucket): collecting again within a
+  bucket overwrites instead of adding rows. With PostgreSQL an advisory lock keeps
+  the periodic collection to one app process at a time.
+- The full post entry (caption, URLs, comment list) is kept on the newest bucket
+  only; older rows keep just the metric columns for the time series.
+- Metrics that could not be fetched (an Instagram post whose insights call failed)
+  are stored as NULL rather than 0, so they do not show up as drops in the history.
+- Rows older than SOCIAL_SNAPSHOT_RETENTION_DAYS are deleted as each user is collected.
+- GET /instagram/page-analytics takes the stats of posts older than
+  INSTAGRAM_INSIGHTS_REFRESH_DAYS from the latest snapshot instead of querying them again.
+
+Create the table: python -m app.migrate_add_social_post_snapshots
+
+Config (env):
+  SOCIAL_SNAPSHOT_INTERVAL_SECONDS   collection interval (3600; 0 disables the job)
+  SOCIAL_SNAPSHOT_BUCKET_SECONDS     width of a time bucket (defaults to the interval)
+  SOCIAL_SNAPSHOT_RETENTION_DAYS     history kept per post (90)
+  SOCIAL_SNAPSHOT_MAX_POSTS          newest Instagram posts collected per user (100)
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+
+import httpx
+from fastapi import HTTPException
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.models import SocialPostSnapshot, User
+from app.routes import facebook_analytics, insta_analytics
+
+SOCIAL_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("SOCIAL_SNAPSHOT_INTERVAL_SECONDS", "3600"))
+SOCIAL_SNAPSHOT_BUCKET_SECONDS = int(
+    os.getenv("SOCIAL_SNAPSHOT_BUCKET_SECONDS", str(SOCIAL_SNAPSHOT_INTERVAL_SECONDS or 3600))
+)
+SOCIAL_SNAPSHOT_RETENTION_DAYS = int(os.getenv("SOCIAL_SNAPSHOT_RETENTION_DAYS", "90"))
+SOCIAL_SNAPSHOT_MAX_POSTS = int(os.getenv("SOCIAL_SNAPSHOT_MAX_POSTS", "100"))
+
+PLATFORMS = ("facebook", "instagram")
+METRICS = ("likes", "comments", "shares", "saved", "reach", "impressions")
+
+# metric column -> key of the live endpoint's post entry
+_POST_METRIC_KEYS = {
+    "facebook": {"likes": "likes", "comments": "comment_count", "shares": "shares"},
+    "instagram": {
+        "likes": "likes",
+        "comments": "comments_count",
+        "shares": "shares",
+        "saved": "saved",
+        "reach": "reach",
+        "impressions": "impressions",
+    },
+}
+
+_KEY_COLUMNS = ["user_id", "platform", "post_id", "bucket"]
+_UPDATED_COLUMNS = ["account_id", "position", "collected_at", *METRICS, "payload"]
+
+# pg_try_advisory_lock id of the periodic collection (any app-wide constant)
+_COLLECT_LOCK_ID = 7_301_024
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the SOCIAL_SNAPSHOT_BUCKET_SECONDS bucket containing a naive UTC datetime."""
+    seconds = int((moment - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % SOCIAL_SNAPSHOT_BUCKET_SECONDS)
+
+
+def _post_metrics(platform: str, post: dict) -> dict:
+    metrics = dict.fromkeys(METRICS)
+    if platform == "instagram" and "insights" in post.get("errors", {}):
+        return metrics  # the entry carries defaults (0), not the real values
+    for column, key in _POST_METRIC_KEYS[platform].items():
+        metrics[column] = post.get(key)
+    return metrics
+
+
+def store(db: Session, user_uuid: UUID, platform: str, account_id: str, analytics: list,
+          collected_at: Optional[datetime] = None) -> int:
+    """
+    Upsert one collection (the "analytics" list of the live endpoint) into its bucket
+    and prune the user's older rows. The caller commits. Returns the posts written.
+    """
+    collected_at = collected_at or datetime.utcnow()
+    bucket = bucket_start(collected_at)
+    rows = [
+        {
+            "user_id": user_uuid,
+            "platform": platform,
+            "post_id": str(post["post_id"]),
+            "bucket": bucket,
+            "account_id": str(account_id),
+            "position": position,
+            "collected_at": collected_at,
+            **_post_metrics(platform, post),
+            "payload": json.dumps(post),
+        }
+        for position, post in enumerate(analytics)
+    ]
+    if rows:
+        insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(SocialPostSnapshot).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=_KEY_COLUMNS,
+            set_={column: stmt.excluded[column] for column in _UPDATED_COLUMNS},
+        )
+        db.execute(stmt)
+
+    user_rows = (SocialPostSnapshot.user_id == user_uuid, SocialPostSnapshot.platform == platform)
+    db.execute(
+        update(SocialPostSnapshot)
+        .where(*user_rows, SocialPostSnapshot.bucket < bucket, SocialPostSnapshot.payload.isnot(None))
+        .values(payload=None)
+    )
+    db.execute(
+        delete(SocialPostSnapshot).where(
+            *user_rows,
+            SocialPostSnapshot.bucket < collected_at - timedelta(days=SOCIAL_SNAPSHOT_RETENTION_DAYS),
+        )
+    )
+    return len(rows)
+
+
+async def _fetch_instagram(user_uuid: UUID, session_token: str) -> dict:
+    # Own client: the shared one in insta_analytics belongs to the server's event loop
+    async with httpx.AsyncClient(timeout=30) as client:
+        # Every listed post is queried: snapshots are not fed back into themselves
+        return await insta_analytics.fetch_instagram_post_analytics(
+            user_uuid, session_token, client=client, limit=SOCIAL_SNAPSHOT_MAX_POSTS
+        )
+
+
+def _fetch(platform: str, user_uuid: UUID, session_token: str) -> tuple:
+    """(account_id, analytics) of one platform, or (None, error) when Graph had none to give."""
+    try:
+        if platform == "facebook":
+            data = facebook_analytics.fetch_page_post_analytics(user_uuid, session_token)
+        else:
+            data = asyncio.run(_fetch_instagram(user_uuid, session_token))
+    except HTTPException as e:
+        return None, e.detail
+    if "error" in data:
+        return None, data["error"]
+    if platform == "facebook":
+        return data["page"]["id"], data["analytics"]
+    return data["instagram_account"], data["analytics"]
+
+
+def collect_user(db: Session, user_uuid: UUID, session_token: str) -> dict:
+    """
+    Snapshot one user's Facebook and Instagram posts and commit each platform.
+    Must not run on an event loop (Instagram is fetched with asyncio.run).
+    Returns {platform: {"posts": n, "bucket": ...} or {"error": ...}}.
+    """
+    results = {}
+    for platform in PLATFORMS:
+        account_id, analytics = _fetch(platform, user_uuid, session_token)
+        if account_id is None:
+            results[platform] = {"error": analytics}
+            continue
+        collected_at = datetime.utcnow()
+        posts = store(db, user_uuid, platform, account_id, analytics, collected_at)
+        db.commit()
+        results[platform] = {"posts": posts, "bucket": bucket_start(collected_at).isoformat()}
+    return results
+
+
+def _try_lock(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return True
+    locked = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": _COLLECT_LOCK_ID}).scalar()
+    conn.commit()  # session-level lock: held until unlocked, not just for this transaction
+    return bool(locked)
+
+
+def _unlock(conn) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _COLLECT_LOCK_ID})
+        conn.commit()
+
+
+def collect_all() -> int:
+    """Scheduler job: snapshot every user with a Meta session token. Returns users collected."""
+    # The lock lives on its own connection; the session below returns its connection
+    # to the pool on every commit
+    with engine.connect() as lock_conn:
+        if not _try_lock(lock_conn):
+            print("⏭️ Social snapshots: collection already running in another process")
+            return 0
+        try:
+            db = SessionLocal()
+            try:
+                users = db.execute(
+                    select(User.user_id, User.session_token)
+                    .where(User.user_id.isnot(None), User.session_token.isnot(None))
+                ).all()
+                collected = 0
+                for user_uuid, session_token in users:
+                    try:
+                        collect_user(db, user_uuid, session_token)
+                        collected += 1
+                    except Exception as e:
+                        db.rollback()
+                        print(f"❌ Social snapshot for user {user_uuid} failed: {e}")
+                print(f"✅ Social snapshots: collected {collected}/{len(users)} user(s)")
+                return collected
+            finally:
+                db.close()
+        finally:
+            _unlock(lock_conn)
+
+
+def start() -> None:
+    """Schedule the periodic collection."""
+    if SOCIAL_SNAPSHOT_INTERVAL_SECONDS > 0:
+        from app.scheduler_app import scheduler
+
+        scheduler.add_job(
+            collect_all,
+            "interval",
+            seconds=SOCIAL_SNAPSHOT_INTERVAL_SECONDS,
+            id="social_snapshots_collect",
+            replace_existing=True,
+        )
+
+
+def stop() -> None:
+    from app.scheduler_app import scheduler
+
+    if scheduler.get_job("social_snapshots_collect"):
+        scheduler.remove_job("social_snapshots_collect")
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark: filling future regressors for /finance/forecast.
+
+Compares the former per-cell loop (future.loc[idx, regressor] = ... for every future
+month x regressor) with build_future_regressors() for 12-, 36- and 120-month horizons,
+and checks that both produce the same values.
+
+Usage (from backend/):
+    python -m benchmarks.bench_forecast_regressors [--repeat 20]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.routes.finance_forecasting import build_future_regressors
+
+HORIZONS = [12, 36, 120]
+HISTORY_MONTHS = 36
+
+# Regressors of the shipped model plus the calendar features the loop also handles
+REGRESSORS = [
+    'transaction_count', 'ma_3_month', 'ma_6_month', 'ma_12_month', 'mom_growth',
+    'mom_growth_3m_avg', 'volatility_3m', 'online_ratio', 'category_diversity', 'index',
+    'avg_transaction_amount', 'median_transaction_amount', 'online_transaction_count',
+    'is_month_end', 'transaction_count_ma3', 'month', 'quarter', 'year',
+    'month_start_dow', 'is_holiday_season', 'is_year_end', 'is_quarter_end',
+]
+
+
+def make_history(n_months: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range("2021-01-31", periods=n_months, freq="ME")
+    history = pd.DataFrame({"ds": ds, "y": rng.gamma(5.0, 400.0, n_months)})
+    history["month"] = ds.month
+    history["quarter"] = ds.quarter
+    history["year"] = ds.year
+    history["index"] = range(1, n_months + 1)
+    for regressor in REGRESSORS:
+        if regressor not in history.columns:
+            history[regressor] = rng.random(n_months)
+    return history
+
+
+def make_future(history: pd.DataFrame, months: int) -> pd.DataFrame:
+    start = history["ds"].max().replace(day=1) + pd.DateOffset(months=1)
+    future = pd.DataFrame({"ds": pd.date_range(start=start, periods=months, freq="ME")})
+    for regressor in REGRESSORS:
+        future[regressor] = np.nan  # what the left merge with history leaves for future months
+    return future
+
+
+def legacy_fill(future: pd.DataFrame, history: pd.DataFrame) -> pd.DataFrame:
+    """The loop build_future_regressors replaced."""
+    future = future.copy()
+    future_period_mask = future['ds'] > history['ds'].max()
+    last_values = {r: history[r].iloc[-1] if r in history.columns else 0 for r in REGRESSORS}
+
+    for idx in future[future_period_mask].index:
+        date_val = future.loc[idx, 'ds']
+        for regressor in REGRESSORS:
+            if regressor == 'index':
+                last_index = last_values.get('index', len(history))
+                last_year = last_values.get('year', history.iloc[-1]['year'])
+                last_month = last_values.get('month', history.iloc[-1]['month'])
+                months_ahead = (date_val.year - last_year) * 12 + (date_val.month - last_month)
+                future.loc[idx, regressor] = last_index + months_ahead
+            elif regressor == 'month':
+                future.loc[idx, regressor] = date_val.month
+            elif regressor == 'quarter':
+                future.loc[idx, regressor] = date_val.quarter
+            elif regressor == 'year':
+                future.loc[idx, regressor] = date_val.year
+            elif regressor == 'is_month_end':
+                future.loc[idx, regressor] = 1 if date_val.day >= 28 else 0
+            elif regressor == 'month_start_dow':
+                future.loc[idx, regressor] = date_val.dayofweek
+            elif regressor == 'is_holiday_season':
+                future.loc[idx, regressor] = 1 if date_val.month in [11, 12] else 0
+            elif regressor == 'is_year_end':
+                future.loc[idx, regressor] = 1 if date_val.month == 12 else 0
+            elif regressor == 'is_quarter_end':
+                future.loc[idx, regressor] = 1 if date_val.month in [3, 6, 9, 12] else 0
+            elif 'ma_' in regressor or '_ma' in regressor:
+                future.loc[idx, regressor] = last_values.get(regressor, 0)
+            elif 'growth' in regressor or 'mom_' in regressor:
+                future.loc[idx, regressor] = last_values.get(regressor, 0)
+            elif 'volatility' in regressor:
+                future.loc[idx, regressor] = last_values.get(regressor, 0)
+            elif 'ratio' in regressor:
+                val = last_values.get(regressor, 0.5)
+                future.loc[idx, regressor] = val if not pd.isna(val) else 0.5
+            else:
+                val = last_values.get(regressor, 0)
+                future.loc[idx, regressor] = val if not pd.isna(val) else 0
+    return future
+
+
+def vectorized_fill(future: pd.DataFrame, history: pd.DataFrame) -> pd.DataFrame:
+    """What the forecast endpoint does now."""
+    future = future.copy()
+    mask = (future['ds'] > history['ds'].max()).to_numpy()
+    future_regressors = build_future_regressors(future['ds'], REGRESSORS, history)
+    values = future[REGRESSORS].to_numpy(dtype=float, copy=True)
+    values[mask] = future_regressors.to_numpy(dtype=float)[mask]
+    future[REGRESSORS] = values
+    return future
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    history = make_history(HISTORY_MONTHS)
+    print(f"{len(REGRESSORS)} regressors, best of {args.repeat} runs")
+    print(f"{'horizon':>8} {'loop (ms)':>12} {'vectorized (ms)':>16} {'speedup':>9}")
+    for months in HORIZONS:
+        future = make_future(history, months)
+
+        expected = legacy_fill(future, history)
+        actual = vectorized_fill(future, history)
+        pd.testing.assert_frame_equal(
+            expected[REGRESSORS].astype(float), actual[REGRESSORS].astype(float), check_exact=True
+        )
+
+        loop = best_of(lambda: legacy_fill(future, history), args.repeat)
+        vectorized = best_of(lambda: vectorized_fill(future, history), args.repeat)
+        print(f"{months:>8} {loop * 1000:>12.2f} {vectorized * 1000:>16.2f} {loop / vectorized:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
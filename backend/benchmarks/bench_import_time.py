@@ -0,0 +1,82 @@
+"""
+Cold-start import cost of the backend: `python -X importtime -c "import app.main"`.
+
+Runs the import in fresh interpreters, reports the best wall time, the cumulative
+import time of app.main and the heaviest top-level packages, and which ML packages
+were imported. Compare against another checkout with --root, e.g. the commit before
+lazy ML imports:
+
+    git worktree add /tmp/before <commit>
+    python -m benchmarks.bench_import_time --root /tmp/before/backend
+
+Measured on the dev container (best of 5, sqlite DATABASE_URL):
+    before (eager pandas/numpy/xgboost/joblib)   app.main 1.83 s cumulative, 2.19 s wall
+    after  (app.lazy_imports)                    app.main 0.68 s cumulative, 0.86 s wall
+
+Usage (from backend/):
+    python -m benchmarks.bench_import_time [--repeat 5] [--root PATH] [--module app.main]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ML_PACKAGES = ["numpy", "pandas", "joblib", "xgboost", "sklearn", "scipy", "prophet"]
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def run_once(root: Path, module: str):
+    """Import `module` in a fresh interpreter; returns (wall seconds, {name: (self_us, cumulative_us)})."""
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql://localhost/opsly")  # engines are created, never connected
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].strip()
+        timings[name] = (int(parts[0]), int(parts[1]))
+    return wall, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--root", type=Path, default=BACKEND_DIR, help="backend/ directory to measure")
+    parser.add_argument("--module", default="app.main")
+    args = parser.parse_args()
+
+    runs = [run_once(args.root, args.module) for _ in range(args.repeat)]
+    wall, timings = min(runs, key=lambda run: run[0])
+
+    print(f"{args.root} ({args.module}), best of {args.repeat}")
+    print(f"  interpreter + import wall time: {wall:.3f} s")
+    print(f"  {args.module} cumulative:       {timings[args.module][1] / 1e6:.3f} s")
+
+    top_level = sorted(
+        ((name, cumulative) for name, (_, cumulative) in timings.items() if "." not in name),
+        key=lambda item: item[1], reverse=True,
+    )[:8]
+    print("  heaviest top-level packages:")
+    for name, cumulative in top_level:
+        print(f"    {name:<20} {cumulative / 1e6:.3f} s")
+
+    imported = [name for name in ML_PACKAGES if name in timings]
+    print(f"  ML packages imported: {', '.join(imported) if imported else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
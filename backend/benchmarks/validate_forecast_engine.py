@@ -0,0 +1,112 @@
+"""
+Validate the NumPy forecast engine (app.forecast_engine) against Prophet.predict.
+
+1. Raw model output on the model's own training history plus 36 future months:
+   max relative yhat error, interval width ratio (numpy / prophet), timings.
+2. The /finance/forecast pipeline (_run_forecast) with both engines on
+   samples/transactions_import_template.csv and on a synthetic 4-year history:
+   differences of the returned forecast amounts and bounds.
+
+Usage (from backend/):
+    python -m benchmarks.validate_forecast_engine
+"""
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.forecast_engine import compile_prophet
+from app.routes.finance_forecasting import (
+    _clean_csv_chunk,
+    _run_forecast,
+    aggregate_monthly_expenses,
+    load_model,
+)
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "samples" / "transactions_import_template.csv"
+
+
+def timed(fn, repeat: int = 5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def validate_raw(model, compiled) -> None:
+    history = model.history
+    regressors = list(model.extra_regressors)
+    future = pd.DataFrame({"ds": pd.date_range(history["ds"].max(), periods=37, freq="ME")[1:]})
+    for regressor in regressors:
+        future[regressor] = history[regressor].iloc[-1]
+    if "index" in regressors:
+        future["index"] = history["index"].iloc[-1] + np.arange(1, len(future) + 1)
+    frame = pd.concat([history[["ds"] + regressors], future], ignore_index=True)
+
+    expected, prophet_seconds = timed(lambda: model.predict(frame))
+    actual, numpy_seconds = timed(lambda: compiled.predict(frame))
+
+    rel_error = np.max(np.abs(actual["yhat"] - expected["yhat"]) / np.abs(expected["yhat"]))
+    width_ratio = (actual["yhat_upper"] - actual["yhat_lower"]) / (expected["yhat_upper"] - expected["yhat_lower"])
+    n_history = len(history)
+
+    print(f"Raw predict on {n_history} history + {len(future)} future months")
+    print(f"  yhat max relative error:        {rel_error:.2e}")
+    print(f"  interval width ratio (history): mean {width_ratio[:n_history].mean():.3f}, "
+          f"range {width_ratio[:n_history].min():.3f}-{width_ratio[:n_history].max():.3f}")
+    print(f"  interval width ratio (future):  mean {width_ratio[n_history:].mean():.3f}, "
+          f"range {width_ratio[n_history:].min():.3f}-{width_ratio[n_history:].max():.3f}")
+    print(f"  prophet {prophet_seconds * 1000:.1f} ms, numpy {numpy_seconds * 1000:.2f} ms")
+
+
+def sample_expenses() -> pd.DataFrame:
+    raw = pd.read_csv(SAMPLE_CSV, dtype={"amount": str, "category": object, "use_chip": object})
+    cleaned = _clean_csv_chunk(raw, 1, "category" in raw.columns, "use_chip" in raw.columns, [])
+    return cleaned.assign(
+        category=cleaned["category"].fillna("Unknown"),
+        use_chip=cleaned["use_chip"].fillna("Unknown"),
+    )[["date", "amount", "category", "use_chip"]]
+
+
+def synthetic_expenses(months: int = 48, seed: int = 11) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n_rows = months * 60
+    start = pd.Timestamp("2020-01-01")
+    dates = start + pd.to_timedelta(rng.integers(0, months * 30, n_rows), unit="D")
+    seasonal = 1 + 0.3 * np.sin(2 * np.pi * dates.month.to_numpy() / 12)
+    return pd.DataFrame({
+        "date": dates,
+        "amount": (rng.gamma(2.0, 30.0, n_rows) * seasonal).round(2),
+        "category": rng.choice(["Groceries", "Restaurants", "Gas Stations", "Unknown"], n_rows),
+        "use_chip": rng.choice(["Chip Transaction", "Online Transaction", "Swipe Transaction"], n_rows),
+    })
+
+
+def validate_pipeline(name: str, expenses: pd.DataFrame, model, compiled, metadata) -> None:
+    monthly = aggregate_monthly_expenses(expenses)
+    print(f"\n/finance/forecast pipeline, {name} ({len(expenses)} rows, {len(monthly)} months)")
+    for days in (90, 365):
+        expected = _run_forecast(monthly.copy(), days, model, metadata)["forecast"]
+        actual = _run_forecast(monthly.copy(), days, compiled, metadata)["forecast"]
+        diffs = {
+            key: max(abs(a[key] - e[key]) for a, e in zip(actual, expected))
+            for key in ("forecasted_amount", "lower_bound", "upper_bound")
+        }
+        print(f"  {days:>3} days: max |diff| amount {diffs['forecasted_amount']:.2f}, "
+              f"lower {diffs['lower_bound']:.2f}, upper {diffs['upper_bound']:.2f}")
+
+
+def main():
+    model, metadata = load_model()
+    compiled = compile_prophet(model)
+
+    validate_raw(model, compiled)
+    validate_pipeline("sample CSV", sample_expenses(), model, compiled, metadata)
+    validate_pipeline("synthetic 4 years", synthetic_expenses(), model, compiled, metadata)
+
+
+if __name__ == "__main__":
+    main()